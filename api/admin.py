@@ -1,8 +1,11 @@
 from flask import Blueprint
 
-from controllers.user import login
-from controllers.company import create_company, update_company, del_company, get_company_info
-from util.validation import CreateCompany, EditCompany, GetCompany
+from controllers.user import login, logout
+from controllers.company import create_company, update_company, del_company, get_company_info, \
+    export_company_feedbacks
+from controllers.feedback import change_feedback_status
+from models.main_models import FeedbackType
+from util.validation import ChangeFeedbackStatus, CreateCompany, EditCompany, ExportFeedbacks, GetCompany
 from util.api_process import validate_and_json_response
 from util.validation import Login
 
@@ -18,7 +21,7 @@ def admin_login(email:str, password:str):
 @admin_blueprint.route('/logout', methods=['GET'])
 @validate_and_json_response(validator_cls=None, access_cookie='unset')
 def admin_logout():
-    return {}
+    return logout()
 
 @admin_blueprint.route('/company/create', methods=['POST'])
 @validate_and_json_response(validator_cls=CreateCompany)
@@ -40,4 +43,14 @@ def get_company(company_id:int):
 @admin_blueprint.route('/company/<int:company_id>/get', methods=['GET'])
 @validate_and_json_response(validator_cls=GetCompany)
 def del_company(company_id:int):
-    return del_company(company_id=company_id)
\ No newline at end of file
+    return del_company(company_id=company_id)
+
+@admin_blueprint.route('/company/<int:company_id>/<feedback_type>/export', methods=['GET'])
+@validate_and_json_response(validator_cls=ExportFeedbacks, stream=True)
+def export_feedbacks(company_id:int, feedback_type:FeedbackType):
+    return export_company_feedbacks(company_id=company_id, feedback_type=feedback_type)
+
+@admin_blueprint.route('/feedback/<int:feedback_id>/status', methods=['POST'])
+@validate_and_json_response(validator_cls=ChangeFeedbackStatus)
+def set_feedback_status(**sanitized):
+    return change_feedback_status(**sanitized)
@@ -1,4 +1,4 @@
-import re
+from typing import Callable, Dict, Optional
 from flask_jwt_extended.exceptions import UserLookupError, WrongTokenError, NoAuthorizationError
 from flask import request
 
@@ -8,6 +8,7 @@ from .user import user_blueprint
 from .admin import admin_blueprint
 from .feedback import feedback_blueprint
 from util.exceptions import NotAuthorized
+from util.rate_limit import login_limiters
 
 def admin_check():
     try:
@@ -25,44 +26,70 @@ def employee_check():
     except UserLookupError or WrongTokenError or NoAuthorizationError:
         raise NotAuthorized
 
+def login_throttle(**limits) -> Callable:
+    """Limits the login attempts per client IP and per email before any query or hash work is done. See
+    'login_limiters' for the limits"""
+    email_limiter, ip_limiter = login_limiters(**limits)
+    def throttle():
+        ip_limiter.check(str(request.remote_addr))
+        params = request.get_json(silent=True)
+        email = params.get("email") if type(params) == dict else None
+        if type(email) == str:
+            email_limiter.check(email.strip().lower())
+    return throttle
+
 mapper = {
         user_blueprint.url_prefix[1:]: {
             "middleware_func": None,
+            "login": {
+                "middleware_func": login_throttle()
+            }
         },
         admin_blueprint.url_prefix[1:]: {
             "middleware_func": admin_check,
-            "login": None
+            "login": {
+                "middleware_func": login_throttle(per_email=3, namespace="admin_login")
+            }
         },
         feedback_blueprint.url_prefix[1:]: {
             "middleware_func": employee_check,
         }
     }
 
-def __get_middleware_func(path:str):
-        mid_dict = mapper
-        p_list = re.findall(r"([^\/]+)", path)
-        l = len(p_list)
-        for i in range(0,l):
-            mid_dict = mid_dict.get(p_list[i])
-            if mid_dict is None:
-                return None
-            if i < l -1 and p_list[i+1] in mid_dict and type(mid_dict) == dict:
-                continue
-            elif "middleware_func" not in mid_dict:
-                raise Exception(f"Missing the key 'middleware_func' in the middleware mapper definition for {path}")
-            else:
-                return mid_dict["middleware_func"]
-
+class MiddlewareNode():
+    """A node of the compiled mapper. 'children' are keyed by the next segment of the path"""
+    __slots__ = ('func', 'children')
 
-def get_middleware():
-    # path = parse.urlparse(url).path
-    path = request.path
-    return __get_middleware_func(path=path)
+    def __init__(self, func: Optional[Callable], children: Dict[str, 'MiddlewareNode']) -> None:
+        self.func = func
+        self.children = children
 
 
+def compile_mapper(mid_dict: Optional[dict], path: str = "") -> MiddlewareNode:
+    """Compiles a (nested) mapper definition into a prefix trie. An entry that is None turns the middleware
+    off for its path"""
+    if mid_dict is None:
+        return MiddlewareNode(None, {})
+    if "middleware_func" not in mid_dict:
+        raise Exception(f"Missing the key 'middleware_func' in the middleware mapper definition for {path}")
+    children = {key: compile_mapper(value, f"{path}/{key}") for key, value in mid_dict.items() if key != "middleware_func"}
+    return MiddlewareNode(mid_dict["middleware_func"], children)
 
 
+trie = MiddlewareNode(None, {prefix: compile_mapper(mid_dict, prefix) for prefix, mid_dict in mapper.items()})
 
 
+def __get_middleware_func(path:str) -> Optional[Callable]:
+    node = trie
+    for segment in path.split("/"):
+        if segment == "":
+            continue
+        child = node.children.get(segment)
+        if child is None:
+            break
+        node = child
+    return node.func
 
 
+def get_middleware():
+    return __get_middleware_func(path=request.path)
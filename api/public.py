@@ -1,9 +1,9 @@
 from typing import Literal, Optional
 from flask import Blueprint, jsonify, request
 
-from controllers.company import get_company_info, get_company_feedback_info
+from controllers.company import get_company_info, get_company_feedback_info, search_companies
 from models.main_models import FeedbackType
-from util.validation import GetCompany, GetFeedbacks
+from util.validation import GetCompany, GetFeedbacks, QueryCompanies
 from util.api_process import validate_and_json_response
 
 
@@ -14,10 +14,13 @@ public_blueprint = Blueprint('public', __name__, url_prefix='/')
 # json_response
 # Validation decorator -> innermoset
 
+@validate_and_json_response(validator_cls=QueryCompanies)
+def search(**sanitized):
+    return search_companies(**sanitized)
+
 @public_blueprint.route('/companies/query', methods=['GET'])
 def query_companies():
-    print(request.args.to_dict())
-    return jsonify({'msg':'ok'})
+    return search(**request.args.to_dict())
 
 
 @public_blueprint.route('/companies/<int:company_id>', methods=['GET'])
@@ -26,14 +29,17 @@ def get_company(company_id:int):
     return get_company_info(company_id=company_id)
 
 @validate_and_json_response(validator_cls=GetFeedbacks)
-def get_feedbacks(company_id:int, feedback_type:Optional[FeedbackType], sequence: Optional[int] = None):
-    return get_company_feedback_info(company_id=company_id, feedback_type=feedback_type, offset=sequence)
+def get_feedbacks(company_id:int, feedback_type:Optional[FeedbackType], offset: Optional[int] = None,
+cursor: Optional[str] = None, limit: Optional[int] = None):
+    return get_company_feedback_info(company_id=company_id, feedback_type=feedback_type, offset=offset, cursor=cursor,
+    limit=limit)
 
 @public_blueprint.route('/companies/<int:company_id>/<string:feedback_type>', methods=['GET'])
 def get_company_feedback(company_id:int, feedback_type:Literal['interviews','reviews']):
-    return get_feedbacks(company_id=company_id, feedback_type=feedback_type)
+    return get_feedbacks(company_id=company_id, feedback_type=feedback_type, cursor=request.args.get('cursor'),
+    limit=request.args.get('limit'))
 
 
 @public_blueprint.route('/companies/<int:company_id>/<string:feedback_type>/<int:sequence>', methods=['GET'])
 def get_single_company_feedback(company_id:int, feedback_type:Literal['interviews','reviews'], sequence:int):
-    return get_feedbacks(company_id=company_id, feedback_type=feedback_type, sequence=sequence)
+    return get_feedbacks(company_id=company_id, feedback_type=feedback_type, offset=sequence)
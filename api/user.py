@@ -1,5 +1,5 @@
 from flask import Blueprint
-from controllers.user import get_user_info, create_user, del_user, update_user, login
+from controllers.user import get_user_info, create_user, del_user, update_user, login, logout
 
 from util.validation import CreateUser, EditUser, Login
 from util.api_process import validate_and_json_response
@@ -14,7 +14,7 @@ def login_user(email, password):
 @user_blueprint.route('/logout', methods=['GET'])
 @validate_and_json_response(validator_cls=None, access_cookie='unset')
 def user_logout():
-    return {}
+    return logout()
    
 @user_blueprint.route('/add', methods=['POST'])
 @validate_and_json_response(validator_cls=CreateUser, access_cookie='set')
@@ -20,9 +20,52 @@ class BaseConfig(metaclass=ABCMeta):
     REDIS_HOST = 'localhost'
     REDIS_PORT = 6379
     REDIS_URI = f'redis://{REDIS_HOST}:{REDIS_PORT}'
+
+    # Read-through cache TTLs (seconds), see util/cache.py
+    CACHE_TTL_COMPANY = 300
+    CACHE_TTL_FEEDBACKS = 60
+
+    # Cache of the users of the JWTs: 'memory' (per worker LRU), 'redis' or None to query them on every request
+    USER_CACHE = 'memory'
+    USER_CACHE_TTL = 30
+    USER_CACHE_SIZE = 10000
     
     LOG_DIR = "logs"
 
+    # Encoder of the API responses: 'orjson' or 'std' (flask's json). 'orjson' falls back to 'std' when it is not installed
+    JSON_ENCODER = 'orjson'
+
+    # Argon2 costs of the password hashes (see util/passwords.py). Hashes with other costs are upgraded on login
+    ARGON2_TIME_COST = 3
+    ARGON2_MEMORY_COST = 65536 # KiB
+    ARGON2_PARALLELISM = 4
+    ARGON2_HASH_LEN = 32
+    ARGON2_SALT_LEN = 16
+    # Hashing runs on PASSWORD_HASH_WORKERS threads (per process). At most PASSWORD_HASH_QUEUE more hashes may
+    # wait for a thread, the requests after that get a 503
+    PASSWORD_HASH_WORKERS = 4
+    PASSWORD_HASH_QUEUE = 32
+    PASSWORD_HASH_TIMEOUT = 10 # seconds
+
+    # Sliding window limits of the login routes, per email and per client IP (see util/rate_limit.py).
+    # 'memory' keeps the windows per process, for tests
+    RATE_LIMIT_BACKEND = 'redis'
+    LOGIN_LIMIT_WINDOW = 300 # seconds
+    LOGIN_LIMIT_PER_EMAIL = 5
+    LOGIN_LIMIT_PER_IP = 30
+
+    # Revoked JWTs (see util/token_blocklist.py). Each worker syncs its bloom filter of the revocations every
+    # TOKEN_BLOCKLIST_SYNC_INTERVAL seconds
+    TOKEN_BLOCKLIST_SYNC_INTERVAL = 1
+    TOKEN_BLOCKLIST_CAPACITY = 100000
+    TOKEN_BLOCKLIST_ERROR_RATE = 0.001
+
+    # SQLAlchemy engine pool (per process)
+    SQLALCHEMY_POOL_SIZE = 10
+    SQLALCHEMY_MAX_OVERFLOW = 20
+    SQLALCHEMY_POOL_PRE_PING = True
+    SQLALCHEMY_POOL_RECYCLE = 1800 # seconds
+
     # The following is called for the celery config
     broker_url = REDIS_URI
     result_serializer = 'pickle'
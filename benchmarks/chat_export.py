@@ -0,0 +1,106 @@
+"""Compares the old parsing of a chat export (the whole page as a DOM, a DataFrame grown by a row per message)
+with the streaming lxml parser of services/process_chats.py on a synthetic export of 100k messages. The
+browser of the old path can't run here, so its DOM is built with lxml.html, which only makes the old path look
+faster than it is. Both must produce the same rows.
+
+Run from the project root: python -m benchmarks.chat_export [--messages 100000] [--per-page 1000]
+"""
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+from time import perf_counter
+
+import pandas as pd
+from lxml import html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+from process_chats import COLUMNS, MESSAGE_PATTERN, export_pages, parse_export  # noqa: E402
+
+MESSAGE = """
+   <div class="message default clearfix" id="message{id}">
+    <div class="pull_left userpic_wrap"><div class="userpic userpic2" style="width: 42px; height: 42px"></div></div>
+    <div class="body">
+     <div class="pull_right date details" title="{date}">{time}</div>
+     <div class="from_name">Jobguy</div>
+     <div class="text">
+{title}، تجربه مصاحبه را در جاب‌گای بخوانید:<br>https://jobguy.work/{type}/{slug}
+     </div>
+    </div>
+   </div>
+"""
+SERVICE = """
+   <div class="message service" id="message-{id}"><div class="body details">{date}</div></div>
+"""
+
+
+def write_export(path: str, messages: int, per_page: int):
+    for page in range(0, messages // per_page):
+        parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"/><title>Exported Data</title></head><body>'
+                 '<div class="page_wrap"><div class="page_body chat_page"><div class="history">']
+        for i in range(page * per_page + 1, (page + 1) * per_page + 1):
+            if i % 500 == 0:
+                parts.append(SERVICE.format(id=i, date="19 August 2021"))
+            parts.append(MESSAGE.format(id=i, date=f"19.08.2021 12:{i % 60:02d}:00", time=f"12:{i % 60:02d}",
+                                        title=f"شرکت {i}", type="interview" if i % 3 else "review", slug=i))
+        parts.append('</div></div></div></body></html>')
+        name = "messages.html" if page == 0 else f"messages{page + 1}.html"
+        with open(os.path.join(path, name), "w", encoding="utf-8") as h:
+            h.write("".join(parts))
+
+
+def append_row(df: pd.DataFrame, row: dict) -> pd.DataFrame:
+    # DataFrame.append is gone in pandas 2, concat copies the frame the same way
+    if hasattr(df, "append"):
+        return df.append(row, ignore_index=True)
+    return pd.concat([df, pd.DataFrame([row], columns=COLUMNS)], ignore_index=True)
+
+
+def old_parse(export_dir: str) -> pd.DataFrame:
+    frames = []
+    for page in export_pages(export_dir):
+        with open(page, "rb") as h:
+            document = html.fromstring(h.read())
+        df = pd.DataFrame(columns=COLUMNS)
+        for el in document.find_class("message"):
+            id_name = el.get("id")
+            if "default" not in el.get("class").split() or id_name.startswith("message-"):
+                continue
+            raw_text = el.find_class("text")[0].text_content().strip().replace("\n", "")
+            timestamp = el.find_class("date")[0].get("title")
+            title, feedback_type, slug = MESSAGE_PATTERN.findall(raw_text)[0]
+            df = append_row(df, {'raw_text': raw_text, 'title': title, 'type': feedback_type, 'slug': slug,
+                                 'timestamp': timestamp})
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run(messages: int, per_page: int):
+    with tempfile.TemporaryDirectory() as path:
+        write_export(path, messages, per_page)
+        start = perf_counter()
+        old = old_parse(path)
+        old_time = perf_counter() - start
+        start = perf_counter()
+        new, errors, last_id, _ = parse_export(path)
+        new_time = perf_counter() - start
+        assert not errors, errors[:3]
+        assert old.values.tolist() == new.values.tolist()
+
+        start = perf_counter()
+        nothing_new, _, _, _ = parse_export(path, after_id=last_id)
+        incremental_time = perf_counter() - start
+        assert len(nothing_new) == 0
+
+    print(f"{len(new)} messages in {messages // per_page} pages")
+    print(f"{'old (dom + append)':<28}{old_time:>8.2f}s")
+    print(f"{'new (iterparse + columns)':<28}{new_time:>8.2f}s")
+    print(f"{'new, nothing new to parse':<28}{incremental_time:>8.2f}s")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--per-page", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.messages, args.per_page)
@@ -0,0 +1,91 @@
+"""Compares the old per-id existence audit of services/main.py (a read of the whole pickle, an isfile and two
+DataFrame scans per id) with the set/index audit over the type and slug columns of the Parquet dataset, on
+synthetic data and crawl directories. Both must report the same ids.
+
+Run from the project root: python -m benchmarks.existence_audit [--rows 1000000]
+"""
+import atexit
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+from os.path import isfile
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+import main  # noqa: E402
+from main import check_all  # noqa: E402
+from dataset import migrate  # noqa: E402
+
+atexit.unregister(main.shutdown) # No driver is started here
+
+RANGES = {"review": (1, 2804, 522), "interview": (1, 1184, 133)}
+
+
+def old_check_existence(file_type, start, end, channel_start, path):
+    missing_files = []
+    missing_in_df = []
+    existing_files = []
+    df = pd.read_pickle(path)
+    filt = df[df['type'] == file_type]
+    for i in range(start, end + 1):
+        file_exists = isfile(f"{file_type}s/{i}.html")
+        if not file_exists:
+            if not filt[filt['slug'] == str(i)].empty or i < channel_start:
+                missing_files.append(i)
+        else:
+            existing_files.append(i)
+            if i >= channel_start and filt[filt['slug'] == str(i)].empty:
+                missing_in_df.append(i)
+    return {
+        'type': file_type,
+        'missing_files': missing_files,
+        'missing_in_df': missing_in_df,
+        'existing_files': existing_files,
+        'total': len(filt) + len(missing_in_df) + channel_start - 1
+    }
+
+
+def make_data(path: str, rows: int):
+    rng = np.random.default_rng(0)
+    for file_type, (start, end, _) in RANGES.items():
+        os.makedirs(os.path.join(path, f"{file_type}s"))
+        for i in range(start, end + 1):
+            if rng.random() < 0.9:
+                open(os.path.join(path, f"{file_type}s", f"{i}.html"), "w").close()
+    types = rng.choice(list(RANGES), size=rows)
+    slugs = rng.integers(1, 3000, size=rows).astype(str)
+    pd.DataFrame({'raw_text': "", 'title': "", 'type': types, 'slug': slugs, 'timestamp': ""}) \
+        .to_pickle(os.path.join(path, "processed_all.p"))
+    migrate(os.path.join(path, "processed_all.p"), os.path.join(path, "processed_all"))
+
+
+def run(rows: int):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        make_data(path, rows)
+        os.chdir(path)
+        try:
+            start = perf_counter()
+            old = {file_type: old_check_existence(file_type, *args, path="processed_all.p")
+                   for file_type, args in RANGES.items()}
+            old_time = perf_counter() - start
+            start = perf_counter()
+            new = check_all(RANGES)
+            new_time = perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    assert old == new
+    print(f"{rows} rows, {sum(end - start + 1 for start, end, _ in RANGES.values())} ids")
+    print(f"{'old (per id scans)':<24}{old_time:>8.2f}s")
+    print(f"{'new (sets and isin)':<24}{new_time:>8.2f}s")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+    run(args.rows)
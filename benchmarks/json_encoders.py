@@ -0,0 +1,65 @@
+"""Compares the response encoders (BaseConfig.JSON_ENCODER) on the payloads of the company and feedback
+endpoints. Both encoders must produce the same JSON.
+
+Run from the project root: python -m benchmarks.json_encoders
+"""
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from random import randint, random
+from timeit import timeit
+
+from wsgi import FlaskApp
+from models.main_models import Company, FeedbackStatus, FeedbackType, Review
+from util.json_encoder import dumps, orjson
+from util.pagination import MAX_PAGE_SIZE
+
+NUMBER = 200
+
+
+def company(i: int) -> dict:
+    now = datetime.now()
+    return Company(id=i, fa_name=f"شرکت نمونه {i}", en_name=f"company-{i}", dirname=f"company-{i}", email=None,
+    website=f"https://company-{i}.ir", phone=None, city_id=randint(1, 400), industry_id=1, score=randint(1, 10),
+    is_verified=True, created_at=now, updated_at=now).to_dict()
+
+
+def feedback(i: int) -> dict:
+    now = datetime.now()
+    return {**Review(id=i, title=f"title {i}", body="متن نظر " * 40, job_title="developer", user_id=i,
+    company_id=1, score=randint(1, 10), salary=random() * 30, type=FeedbackType.review, status=FeedbackStatus.show,
+    start_ts=now - timedelta(days=400), end_ts=now, created_at=now, updated_at=now).to_dict(), 'response': None}
+
+
+PAYLOADS = {
+    'company profile': {'msg': 'OK', 'body': company(1)},
+    'company search': {'msg': 'OK', 'body': {'companies': [company(i) for i in range(MAX_PAGE_SIZE)],
+    'next_cursor': 'MTIzNDU'}},
+    'feedback page': {'msg': 'OK', 'body': {'feedbacks': [feedback(i) for i in range(MAX_PAGE_SIZE)],
+    'next_cursor': None}},
+    # Raw values that the encoders convert themselves
+    'raw values': {'msg': 'OK', 'body': [{'at': datetime.now(), 'type': FeedbackType.review, 'amount': Decimal("12.5")}
+    for _ in range(MAX_PAGE_SIZE)]},
+}
+
+
+def run():
+    app = FlaskApp.instance()
+    encoders = ['std'] + (['orjson'] if orjson is not None else [])
+    print(f"{'payload':<18}" + "".join(f"{f'{encoder} (us)':>14}" for encoder in encoders))
+    with app.app_context():
+        for name, payload in PAYLOADS.items():
+            times = []
+            outputs = []
+            for encoder in encoders:
+                app.config['JSON_ENCODER'] = encoder
+                outputs.append(json.loads(dumps(payload)))
+                times.append(timeit(lambda: dumps(payload), number=NUMBER) / NUMBER * 1e6)
+            assert all(output == outputs[0] for output in outputs), f"The encoders differ for {name}"
+            print(f"{name:<18}" + "".join(f"{t:>14.1f}" for t in times))
+    if orjson is None:
+        print("orjson is not installed")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,56 @@
+"""Throughput of the password checks of the login with an increasing number of request threads. The hashes run
+in the bounded pool of util.passwords, so past its capacity the extra logins are rejected with a 503 instead
+of queueing up. Also compares the time of a login with a known and an unknown email.
+
+Uses the argon2 costs of the config. Run from the project root: python -m benchmarks.login_throughput
+"""
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from time import perf_counter
+
+from wsgi import FlaskApp
+from util.exceptions import Overloaded
+from util.passwords import dummy_verify, hash_password, verify_password
+
+LOGINS = 64
+THREADS = [1, 4, 16, 64]
+PASSWORD = "12345678"
+
+
+def login(stored_hash) -> bool:
+    try:
+        if stored_hash is None:
+            dummy_verify(PASSWORD)
+        else:
+            verify_password(stored_hash, PASSWORD)
+        return True
+    except Overloaded:
+        return False
+
+
+def timed(stored_hash) -> float:
+    start = perf_counter()
+    login(stored_hash)
+    return perf_counter() - start
+
+
+def run():
+    config = FlaskApp.instance().config
+    print(f"workers: {config['PASSWORD_HASH_WORKERS']}, queue: {config['PASSWORD_HASH_QUEUE']}, "
+    f"time_cost: {config['ARGON2_TIME_COST']}, memory_cost: {config['ARGON2_MEMORY_COST']}")
+    stored_hash = hash_password(PASSWORD)
+    known = median(timed(stored_hash) for _ in range(10)) * 1000
+    unknown = median(timed(None) for _ in range(10)) * 1000
+    print(f"known email: {known:.1f}ms, unknown email: {unknown:.1f}ms")
+    print(f"{'threads':>8}{'logins/s':>10}{'rejected':>10}")
+    for threads in THREADS:
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(login, [stored_hash] * LOGINS))
+        elapsed = perf_counter() - start
+        accepted = len([result for result in results if result])
+        print(f"{threads:>8}{accepted / elapsed:>10.1f}{LOGINS - accepted:>10}")
+
+
+if __name__ == '__main__':
+    run()
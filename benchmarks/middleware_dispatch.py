@@ -0,0 +1,48 @@
+"""Compares the regex walk of the middleware mapper (the old path) with the compiled trie on a path of every
+registered route. Both must pick the same middleware.
+
+Run from the project root: python -m benchmarks.middleware_dispatch
+"""
+import re
+from timeit import timeit
+
+from wsgi import create_app
+
+NUMBER = 20000
+
+
+def old_get_middleware_func(mapper: dict, path: str):
+    mid_dict = mapper
+    p_list = re.findall(r"([^\/]+)", path)
+    l = len(p_list)
+    for i in range(0,l):
+        mid_dict = mid_dict.get(p_list[i])
+        if mid_dict is None:
+            return None
+        if i < l -1 and p_list[i+1] in mid_dict and type(mid_dict) == dict:
+            continue
+        elif "middleware_func" not in mid_dict:
+            raise Exception(f"Missing the key 'middleware_func' in the middleware mapper definition for {path}")
+        else:
+            return mid_dict["middleware_func"]
+
+
+def sample_path(rule) -> str:
+    return re.sub(r"<(?:[^:>]+:)?([^>]+)>", "1", rule.rule)
+
+
+def run():
+    app = create_app()
+    from api import middleware
+    new_get_middleware_func = getattr(middleware, "__get_middleware_func")
+    print(f"{'route':<46}{'old (us)':>10}{'new (us)':>10}")
+    for rule in app.url_map.iter_rules():
+        path = sample_path(rule)
+        assert old_get_middleware_func(middleware.mapper, path) == new_get_middleware_func(path), path
+        old = timeit(lambda: old_get_middleware_func(middleware.mapper, path), number=NUMBER) / NUMBER * 1e6
+        new = timeit(lambda: new_get_middleware_func(path), number=NUMBER) / NUMBER * 1e6
+        print(f"{path:<46}{old:>10.2f}{new:>10.2f}")
+
+
+if __name__ == '__main__':
+    run()
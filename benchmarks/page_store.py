@@ -0,0 +1,85 @@
+"""Compares an {id}.html file per crawled page (the old layout) with services/page_store.py on synthetic feedback
+pages, some crawled twice: disk usage, number of files and the time of a full re-parse with lxml.
+
+Run from the project root: python -m benchmarks.page_store [--pages 5000]
+"""
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+from lxml import html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+from page_store import PageStore  # noqa: E402
+
+# The shell of a rendered page: the same styles and scripts around every feedback
+SHELL = ("<!DOCTYPE html><html><head><title>{title}</title><style>"
+         + "".join(f".c{i}{{{{margin:{i}px;padding:{i % 7}px;color:#{i:06x}}}}}" for i in range(1500))
+         + "</style></head><body><div id='__nuxt'><a class='nuxt-link-active' href='/'>jobguy</a>"
+         "<div class='feedback'><h1>{title}</h1><p>{body}</p></div></div><script>window.__NUXT__={state}</script>"
+         + "".join(f"<script src='/_nuxt/{i:04x}.js'></script>" for i in range(60)) + "</body></html>")
+WORDS = "شرکت مصاحبه حقوق تیم فنی سوال الگوریتم مدیر پروژه قرارداد تجربه خوب بد جلسه".split()
+
+
+def make_pages(pages: int):
+    rng = Random(0)
+    for i in range(1, pages + 1):
+        body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 400)))
+        state = '{"id":%d,"score":%d}' % (i, rng.randint(1, 10))
+        yield i, SHELL.format(title=f"interview {i}", body=body, state=state)
+
+
+def disk_usage(path: str):
+    files = 0
+    size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.stat(os.path.join(root, name)).st_blocks * 512
+    return files, size
+
+
+def feedback_text(source: str) -> str:
+    return html.fromstring(source).find_class("feedback")[0].text_content()
+
+
+def run(pages: int):
+    with tempfile.TemporaryDirectory() as path:
+        files_dir = os.path.join(path, "interviews")
+        os.makedirs(files_dir)
+        store = PageStore(os.path.join(path, "interviews_store"))
+        for page_id, source in make_pages(pages):
+            with open(os.path.join(files_dir, f"{page_id}.html"), "w") as h:
+                h.write(source)
+            store.put(page_id, source)
+            if page_id % 10 == 0: # A retried page, stored again
+                store.put(page_id, source)
+
+        start = perf_counter()
+        old = {}
+        for name in os.listdir(files_dir):
+            with open(os.path.join(files_dir, name), "r") as h:
+                old[int(name.split(".")[0])] = feedback_text(h.read())
+        old_time = perf_counter() - start
+        start = perf_counter()
+        new = {page_id: feedback_text(source) for page_id, source in store.iter_pages()}
+        new_time = perf_counter() - start
+        assert old == new
+
+        old_files, old_size = disk_usage(files_dir)
+        new_files, new_size = disk_usage(os.path.join(path, "interviews_store"))
+        print(f"{pages} pages, codec {store.codec}, {store.stats()}")
+        store.close()
+    print(f"{'':<14}{'files':>8}{'disk (MB)':>12}{'re-parse (s)':>14}")
+    print(f"{'old (files)':<14}{old_files:>8}{old_size / 2 ** 20:>12.1f}{old_time:>14.2f}")
+    print(f"{'new (store)':<14}{new_files:>8}{new_size / 2 ** 20:>12.1f}{new_time:>14.2f}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.pages)
@@ -0,0 +1,41 @@
+"""Compares building a schema's fields on every request (the old path) with binding the inputs
+to the compiled plan of the schema class.
+
+Run from the project root: python -m benchmarks.schema_plans
+"""
+from timeit import timeit
+
+from wsgi import FlaskApp
+from util.validation import BaseParamsSchema
+
+FlaskApp.instance()
+import models.schema # noqa: E402 # registers the import schemas as subclasses of BaseParamsSchema
+
+NUMBER = 10000
+
+
+def all_schemas(cls=BaseParamsSchema):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from all_schemas(subclass)
+
+
+def old_path(schema):
+    instance = type.__call__(schema, id=1)
+    return list(instance.get_fields())
+
+
+def new_path(schema):
+    return schema(id=1).plan
+
+
+def run():
+    print(f"{'schema':<20}{'old (us)':>12}{'new (us)':>12}{'speedup':>10}")
+    for schema in all_schemas():
+        old = timeit(lambda: old_path(schema), number=NUMBER) / NUMBER * 1e6
+        new = timeit(lambda: new_path(schema), number=NUMBER) / NUMBER * 1e6
+        print(f"{schema.__name__:<20}{old:>12.2f}{new:>12.2f}{old / new:>9.1f}x")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,77 @@
+"""Compares the reflective to_dict (the old path) with the compiled serializers of the models on 10k
+Review/Interview instances, and serialize_many on the row tuples of a column query. The outputs must be equal.
+
+Run from the project root: python -m benchmarks.serializers
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+from enum import Enum
+from random import choice, randint, random
+from time import perf_counter
+
+from models.main_models import Feedback, FeedbackStatus, FeedbackType, Interview, InterviewResult, Review
+from util import BaseEnum
+
+ROWS = 10000
+REPEAT = 5
+
+
+def reflective_to_dict(self, ignore_keys=None, timestamp=True):
+    """BaseMixin.to_dict before the compiled serializers"""
+    accepted_serialization_types = [str,dict,list,int,float,bool,datetime, type(None)]
+    res = {}
+    ignore = self.dict_ignore if ignore_keys is None else ignore_keys
+    for key, value in self.__dict__.items():
+        key_is_valid = not (key.startswith("__") or key.startswith("_") or key in ignore)
+        value_is_valid = type(value) in accepted_serialization_types or issubclass(type(value), Enum)
+        if key_is_valid and value_is_valid:
+            if type(value) == datetime and timestamp:
+                value = value.timestamp()
+            if issubclass(type(value), BaseEnum):
+                value = str(value)
+            res[key] = value
+    return res
+
+
+def feedbacks():
+    now = datetime.now()
+    res = []
+    for i in range(ROWS):
+        common = dict(id=i, title=f"title {i}", body="body " * 50, job_title=None, user_id=randint(1, 1000),
+        company_id=randint(1, 100), score=randint(1, 10), salary=random() * 30, status=FeedbackStatus.show,
+        details={"source": "benchmark"}, created_at=now - timedelta(minutes=i), updated_at=now)
+        if i % 2 == 0:
+            res.append(Review(type=FeedbackType.review, start_ts=now - timedelta(days=400), end_ts=now, **common))
+        else:
+            res.append(Interview(type=FeedbackType.interview, int_ts=now, expected_salary=20.0,
+            result=choice(list(InterviewResult)), **common))
+    return res
+
+
+def measure(func) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best * 1000
+
+
+def run():
+    instances = feedbacks()
+    old = [reflective_to_dict(feedback) for feedback in instances]
+    assert old == Feedback.serialize_many(instances), "The compiled serializers changed the output"
+    columns = [column.key for column in Review.serialized_columns()]
+    Row = namedtuple("Row", columns)
+    rows = [Row(*(review.__dict__[key] for key in columns)) for review in instances if type(review) == Review]
+    assert Review.serialize_many(rows) == [reflective_to_dict(review) for review in instances if type(review) == Review]
+
+    print(f"{'path':<28}{'ms / 10k':>10}")
+    print(f"{'reflective to_dict':<28}{measure(lambda: [reflective_to_dict(f) for f in instances]):>10.1f}")
+    print(f"{'compiled to_dict':<28}{measure(lambda: [f.to_dict() for f in instances]):>10.1f}")
+    print(f"{'serialize_many (instances)':<28}{measure(lambda: Feedback.serialize_many(instances)):>10.1f}")
+    print(f"{'serialize_many (rows, 5k)':<28}{measure(lambda: Review.serialize_many(rows)):>10.1f}")
+
+
+if __name__ == '__main__':
+    run()
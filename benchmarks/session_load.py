@@ -0,0 +1,36 @@
+"""Throughput of a public read endpoint with an increasing number of worker threads. Every thread gets its own
+scoped session and pooled connection, so the throughput should scale until the pool or the database saturates.
+
+Needs a seeded database (see util.seeding). Run from the project root: python -m benchmarks.session_load
+"""
+from concurrent.futures import ThreadPoolExecutor
+from random import randint
+from time import perf_counter
+
+from wsgi import create_app
+
+REQUESTS = 2000
+THREADS = [1, 2, 4, 8, 16]
+COMPANIES = 90
+
+
+def request(client):
+    response = client.get(f"/companies/{randint(1, COMPANIES)}")
+    return response.status_code
+
+
+def run():
+    app = create_app()
+    print(f"{'threads':>8}{'req/s':>10}{'errors':>8}")
+    for threads in THREADS:
+        clients = [app.test_client() for _ in range(threads)]
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            codes = list(executor.map(request, (clients[i % threads] for i in range(REQUESTS))))
+        elapsed = perf_counter() - start
+        errors = len([code for code in codes if code != 200])
+        print(f"{threads:>8}{REQUESTS / elapsed:>10.0f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    run()
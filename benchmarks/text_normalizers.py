@@ -0,0 +1,106 @@
+"""Per-call latency of the text normalizers and validators before and after precompiling their patterns,
+over a corpus of real company names.
+
+Run from the project root: python -m benchmarks.text_normalizers
+"""
+import re
+from timeit import timeit
+
+from wsgi import FlaskApp
+
+FlaskApp.instance()
+from util.validation import Validators, remove_bad_persian_letters, remove_inside_parantheses, \
+    create_dir_name, create_en_name # noqa: E402
+
+NUMBER = 20
+
+
+def old_remove_bad_persian_letters(strx:str) -> str:
+    bad_reg = re.compile(r"[ؤئًٌٍَِّْ»ة»ءٰٔٓأأإأ\u200f]")
+    s = bad_reg.sub("",strx)
+    s = re.sub(r"[\u200c]"," ",s)
+    return s
+
+def old_remove_inside_parantheses(strx:str) -> str:
+    reg1 = re.compile(r"\s*\(.*\)")
+    reg2 = re.compile(r"\s*\(.*\(")
+    reg3 = re.compile(r"\s*\).*\)")
+    s = reg1.sub("",strx)
+    s = reg2.sub("",s)
+    s = reg3.sub("",s)
+    return s
+
+def old_create_dir_name(strx:str):
+    s = strx.lower()
+    s = re.sub(r"[\s\-]","_",s)
+    s = re.sub(r"[\\\/\r\+@^&%$#!]","",s)
+    return s
+
+def old_create_en_name(strx:str):
+    s = re.sub(r"[\-\_]"," ",strx)
+    s = re.sub(r"[\\\/\r\+@^&%$#!]","",s)
+    s = re.sub(r"\s{2,}"," ",s)
+    s = s.split(" ")
+    s = " ".join([st.capitalize() for st in s])
+    return s
+
+def old_fa_text(x):
+    regex = re.compile(r"^[۱-۹آ-ی\s\d\.]+$")
+    if not regex.match(x):
+        return "Text must only contain farsi letters, digits, space and english digits"
+    return None
+
+def old_en_company_name(x):
+    regex = re.compile(r"^[A-Za-z\s\d\-.&!',@]+$")
+    if not regex.match(x):
+        return "Text must only contain english letters, digits, space and dash"
+    return None
+
+
+FA_NAMES = [
+    "دیجی\u200cکالا", "کافه\u200cبازار", "اسنپ", "تپسی", "علی\u200cبابا", "دیوار", "شیپور", "آپارات",
+    "ایران\u200cخودرو (سهامی عام)", "سایپا (سهامی عام)", "همراه اول", "ایرانسل", "رایتل", "بانک ملت", "بانک پاسارگاد",
+    "بانک سامان", "فولاد مبارکه اصفهان", "ملی صنایع مس ایران", "پتروشیمی جم", "گلرنگ", "سن\u200cایچ", "کاله",
+    "فرادرس", "ایرانسرور", "پارس\u200cپک", "ابر\u200cآروان", "سرآوا", "فیلیمو", "نماوا", "اسنپ\u200cفود",
+    "زودفود", "تخفیفان", "اسنپ\u200cتریپ", "جاباما", "کارنامه", "همکاران سیستم", "راهکاران سیستم", "مپنا (سهامی عام)",
+    "شرکت ملی نفت ایران", "مؤسسه\u200cی رایان\u200cپرداز", "تجارت الکترونیک پارسیان", "آسان\u200cپرداخت", "سامان کیش",
+    "به\u200cپرداخت ملت", "ایزایران", "پیشگامان توسعه ارتباطات", "شاتل", "مبین\u200cنت", "های\u200cوب", "آسیاتک",
+]
+
+EN_NAMES = [
+    "Digikala", "Cafe-Bazaar", "Snapp", "Tapsi", "Alibaba_travels", "Divar", "Sheypoor", "Aparat", "Iran-Khodro",
+    "Saipa", "Hamrah Aval", "Irancell", "Rightel", "Mellat Bank", "Pasargad Bank", "Saman Bank", "Mobarakeh Steel",
+    "NICICO", "Jam Petrochemical", "Golrang", "Kalleh", "Faradars", "ParsPack", "ArvanCloud", "Sarava", "Filimo",
+    "Namava", "SnappFood", "Zoodfood", "Takhfifan", "Jabama", "Karnameh", "Hamkaran System", "MAPNA Group", "NIOC",
+    "Asan Pardakht", "Saman Kish", "Behpardakht Mellat", "Shatel", "Mobinnet", "HiWEB", "Asiatech",
+]
+
+
+def load_corpus(repeat=50):
+    # Diacritics, hamzas and parantheses are added so that the normalizers have something to do
+    fa_names = [name + extra for name in FA_NAMES for extra in ["", " (سهامی خاص)", "ً", "\u200f"]] * repeat
+    en_names = [name + extra for name in EN_NAMES for extra in ["", " Co.", " & Sons!", "  Ltd"]] * repeat
+    return fa_names, en_names
+
+
+def run():
+    fa_names, en_names = load_corpus()
+    cases = [
+        ("remove_bad_persian_letters", old_remove_bad_persian_letters, remove_bad_persian_letters, fa_names),
+        ("remove_inside_parantheses", old_remove_inside_parantheses, remove_inside_parantheses, fa_names),
+        ("create_dir_name", old_create_dir_name, create_dir_name, en_names),
+        ("create_en_name", old_create_en_name, create_en_name, en_names),
+        ("Validators.fa_text", old_fa_text, Validators.fa_text, fa_names),
+        ("Validators.en_company_name", old_en_company_name, Validators.en_company_name, en_names),
+    ]
+    print(f"{'function':<28}{'old (ns)':>10}{'new (ns)':>10}{'speedup':>10}")
+    for name, old, new, corpus in cases:
+        assert [old(x) for x in corpus] == [new(x) for x in corpus], name
+        calls = NUMBER * len(corpus)
+        old_ns = timeit(lambda: [old(x) for x in corpus], number=NUMBER) / calls * 1e9
+        new_ns = timeit(lambda: [new(x) for x in corpus], number=NUMBER) / calls * 1e9
+        print(f"{name:<28}{old_ns:>10.0f}{new_ns:>10.0f}{old_ns / new_ns:>9.1f}x")
+
+
+if __name__ == '__main__':
+    run()
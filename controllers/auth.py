@@ -2,14 +2,53 @@
 # DONOT use this module directly in the routes!
 # TODO See if you can trun this module to a middleware
 
-from flask_jwt_extended import jwt_required, current_user, create_access_token
-from typing import Optional
-from models.main_models import User
+from dataclasses import dataclass
+from flask import g
+from flask_jwt_extended import jwt_required, current_user, create_access_token, get_jwt, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from typing import Optional, Union
+from models.main_models import User, UserType
 from wsgi import FlaskApp
+from util.cache import user_cache
+from util.token_blocklist import token_blocklist
+from util.exceptions import ResponseException
 
 db_session = FlaskApp.db_session()
 jwt = FlaskApp.get_jwt()
-q = db_session.query(User)
+
+
+@dataclass(frozen=True)
+class SlimUser():
+    """The columns of the user that the authenticated requests need. It may come from the user cache, so the
+    controllers that change the user must use 'get_current_user_model'"""
+    id: int
+    name: str
+    email: str
+    is_verified: bool
+    type: UserType
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'SlimUser':
+        return cls(**{**record, 'type': UserType[record['type']]})
+
+    def to_dict(self) -> dict:
+        # Same keys as User.to_dict
+        return {'name': self.name, 'email': self.email, 'is_verified': self.is_verified, 'type': str(self.type)}
+
+
+def load_user_record(user_id: int) -> Optional[dict]:
+    user: Optional[User] = db_session.query(User).get(user_id)
+    if user is None:
+        return None
+    return {'id': user.id, 'name': user.name, 'email': user.email, 'is_verified': user.is_verified,
+    'type': str(user.type)}
+
+
+def invalidate_user(user_id: int):
+    g.pop('_current_user', None)
+    if user_cache is not None:
+        user_cache.invalidate(user_id)
 
 
 # Register a callback function that takes whatever object is passed in as the
@@ -23,20 +62,55 @@ def user_identity_lookup(user):
 # a protected route is accessed. This should return any python object on a
 # successful lookup, or None if the lookup failed for any reason (for example
 # if the user has been deleted from the database).
+# The user is memoized for the request (the middleware and the view both ask for it) and cached between
+# requests in 'user_cache'
 @jwt.user_lookup_loader
-def user_lookup_callback(_jwt_header, jwt_data):
+def user_lookup_callback(_jwt_header, jwt_data) -> Optional[SlimUser]:
     identity = jwt_data["sub"]
-    return q.get(identity)
+    user: Optional[SlimUser] = g.get('_current_user')
+    if user is not None and user.id == identity:
+        return user
+    if user_cache is None:
+        record = load_user_record(identity)
+    else:
+        record = user_cache.get_or_load(identity, lambda: load_user_record(identity))
+    user = None if record is None else SlimUser.from_record(record)
+    g._current_user = user
+    return user
+
+
+# Tokens revoked by logout are refused in every protected route
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(_jwt_header, jwt_payload) -> bool:
+    return token_blocklist.is_revoked(jwt_payload["jti"])
+
+
+def revoke_current_token():
+    """Revokes the token of the request if it has a valid one"""
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return # Expired or invalid tokens are refused anyway
+    claims = get_jwt()
+    if "jti" in claims:
+        token_blocklist.revoke(claims["jti"], claims.get("exp"))
 
 
 # This method get user by callbacks from jwt operations (see above functinos decorated with @jwt)
 # also see: https://flask-jwt-extended.readthedocs.io/en/stable/automatic_user_loading
 @jwt_required()
-def get_current_user() -> User:
+def get_current_user() -> SlimUser:
     """Gets current user object automatically using 'current_user' functionality of flask_jwt_extended
     """
-    user: User = current_user # type: ignore # ignoring access error to current_user
+    user: SlimUser = current_user # type: ignore # ignoring access error to current_user
+    return user
+
+def get_current_user_model() -> User:
+    """The persistent user of the request, for the controllers that change it"""
+    user: Optional[User] = db_session.query(User).get(get_current_user().id)
+    if user is None:
+        raise ResponseException(code=400, message="User not found")
     return user
 
-def generate_auth_token(identity:User):
+def generate_auth_token(identity:Union[User, SlimUser]):
     return create_access_token(identity=identity)
\ No newline at end of file
@@ -1,34 +1,94 @@
-from typing import List, Optional, Union
-from models.main_models import Company, Feedback, FeedbackType, Interview, Review
-from copy import copy
-from sqlalchemy.orm import Query, with_polymorphic
-from sqlalchemy import desc
+from datetime import datetime
+from typing import Iterator, List, Literal, Optional, Union
+from models.main_models import City, Company, CompanyResponse, Feedback, FeedbackType, Interview, Review
+from sqlalchemy.orm import Query, defer, joinedload, selectinload, with_polymorphic
+from sqlalchemy import asc, desc, func, or_, select, tuple_
 from random import randint
 
 from .auth import db_session
+from .stats import company_feedback_stats
+from util.cache import company_cache, company_feedbacks_cache
 from util.db_operations import add_to_db, del_from_db, safe_commit
-from util.validation import create_dir_name
+from util.exceptions import InternalException, ResponseException
+from util.validation import create_dir_name, remove_bad_persian_letters
+from util.pagination import DEFAULT_PAGE_SIZE, decode_cursor, decode_datetime_cursor, encode_cursor
 
-q = db_session.query(Company)
 
 def create_unqiue_dirname(en_name):
     """Since we may later edit company's en_name, we need to make sure that dir name is always unique"""
     alt_dir_name = dir_name = create_dir_name(en_name)
-    c = q.filter(Company.dirname == dir_name).count()
+    c = db_session.query(Company).filter(Company.dirname == dir_name).count()
     while c > 1:
         alt_dir_name = dir_name + "_" + str(randint(0,10000))
-        c = q.filter(Company.dirname == alt_dir_name).count()
+        c = db_session.query(Company).filter(Company.dirname == alt_dir_name).count()
     return alt_dir_name
 
 
 def query_companies(**kwargs) -> Query:
-    qe = copy(q)
+    qe = db_session.query(Company)
     for attr,val in kwargs.items():
         qe = qe.where(getattr(Company,attr) == val)
     return qe
 
+# sort name -> (sort key, is descending). Every sort key is paired with the id for keyset pagination
+company_sorts = {
+    'newest': (Company.created_at, True),
+    'score': (func.coalesce(Company.score, -1), True),
+    'name': (Company.fa_name, False),
+}
+
+def escape_like(strx:str) -> str:
+    return strx.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_companies(name: Optional[str] = None, city_id: Optional[int] = None, province_id: Optional[int] = None,
+industry_id: Optional[int] = None, is_verified: Optional[bool] = None, min_score: Optional[int] = None,
+max_score: Optional[int] = None, sort: Literal['newest', 'score', 'name'] = 'newest', cursor: Optional[str] = None,
+limit: Optional[int] = None):
+    """Filters the companies and matches 'name' with the start of or the trigram similarity to their names.
+    Every filter is backed by an index of the companies table (see Company.__table_args__)"""
+    filters = {key: value for key, value in {'city_id': city_id, 'industry_id': industry_id, 'is_verified': is_verified}.items()
+    if value is not None}
+    qe = query_companies(**filters)
+    if province_id is not None:
+        qe = qe.where(Company.city_id.in_(select(City.id).where(City.province_id == province_id)))
+    if min_score is not None:
+        qe = qe.where(Company.score >= min_score)
+    if max_score is not None:
+        qe = qe.where(Company.score <= max_score)
+    if name is not None:
+        name = remove_bad_persian_letters(name).strip()
+        prefix = escape_like(name) + "%"
+        qe = qe.where(or_(Company.fa_name.ilike(prefix), Company.en_name.ilike(prefix),
+        Company.fa_name.op("%")(name), Company.en_name.op("%")(name)))
+
+    sort_key, descending = company_sorts[sort]
+    if cursor is not None:
+        try:
+            [value, last_id] = decode_cursor(cursor, 2)
+            if sort == 'newest':
+                value = datetime.fromisoformat(value)
+        except (InternalException, ValueError, TypeError):
+            raise ResponseException(code=400, message="Invalid cursor")
+        page_key, page_cursor = tuple_(sort_key, Company.id), tuple_(value, last_id)
+        qe = qe.where(page_key < page_cursor if descending else page_key > page_cursor)
+    order = desc if descending else asc
+    qe = qe.order_by(order(sort_key), order(Company.id))
+
+    limit = DEFAULT_PAGE_SIZE if limit is None else limit
+    companies = qe.limit(limit + 1).all()
+    next_cursor = None
+    if len(companies) > limit:
+        companies = companies[:limit]
+        last = companies[-1]
+        sort_values = {'newest': last.created_at, 'score': -1 if last.score is None else last.score, 'name': last.fa_name}
+        next_cursor = encode_cursor(sort_values[sort], last.id)
+    return {
+        'companies': Company.serialize_many(companies),
+        'next_cursor': next_cursor
+    }
+
 def get_company(company_id:int) -> Company:
-    company:Optional[Company] = q.get(company_id)
+    company:Optional[Company] = db_session.query(Company).get(company_id)
     if company is not None:
         return company
     else:
@@ -44,7 +104,7 @@ city_id: int, is_verified:bool = False, info:dict=None):
     return company.to_dict()
 
 def update_company(company_id:int,**kwargs):
-    company:Optional[Company] = q.get(company_id) 
+    company:Optional[Company] = db_session.query(Company).get(company_id) 
     if company is None:
         return None
     if len(kwargs) < 1:
@@ -53,22 +113,52 @@ def update_company(company_id:int,**kwargs):
         setattr(company,key,value)
     db_session.merge(company)
     safe_commit(session=db_session)
+    company_cache.invalidate(company_id)
     company.id # TEMP This is used to refresh the instance. Need to find a proper way to refresh
     return company.to_dict()
 
 def del_company(company_id:int):
-    company:Optional[Company] = q.get(company_id)
+    company:Optional[Company] = db_session.query(Company).get(company_id)
     if company is not None:
         del_from_db(session=db_session, model=company)
+        company_cache.invalidate(company_id)
+        company_feedbacks_cache.invalidate(company_id)
         return True
     else:
         return "Company not found"
 
 def get_company_info(company_id:int):
-    company:Company = get_company(company_id=company_id)
-    return company.to_dict()
+    return company_cache.get_or_load(company_id, lambda: {
+        **get_company(company_id=company_id).to_dict(),
+        'feedback_stats': company_feedback_stats(company_id)
+    })
+
+# Loader strategies of the feedback endpoints. Every relationship that is serialized must be loaded here, so
+# a page of feedbacks costs a constant number of queries (see util.db_operations.assert_max_queries)
+RESPONSE_COLUMNS = (CompanyResponse.body, CompanyResponse.type, CompanyResponse.timestamp, CompanyResponse.feedback_id)
+
+def feedback_list_options(wpm):
+    """List views skip the JSONB details and get the company responses of the whole page in one extra query"""
+    return (defer(wpm.details), selectinload(wpm.response).load_only(*RESPONSE_COLUMNS))
 
-def get_company_feedback_info(company_id:int, feedback_type: Optional[FeedbackType] = None, offset: Optional[int] = None) -> Optional[Union[dict, List[dict]]]:
+def feedback_single_options(wpm):
+    return (defer(wpm.details), joinedload(wpm.response).load_only(*RESPONSE_COLUMNS))
+
+def feedback_to_dict(feedback: Feedback) -> dict:
+    response: Optional[CompanyResponse] = feedback.response
+    return {**feedback.to_dict(), 'response': None if response is None else response.to_dict()}
+
+def get_company_feedback_info(company_id:int, feedback_type: Optional[FeedbackType] = None, offset: Optional[int] = None,
+cursor: Optional[str] = None, limit: Optional[int] = None) -> Optional[dict]:
+    """Read-through cached version of 'query_company_feedback_info'"""
+    page = f"{feedback_type}:{offset}:{cursor}:{limit}"
+    return company_feedbacks_cache.get_or_load(company_id, page=page, loader=lambda: query_company_feedback_info(
+        company_id=company_id, feedback_type=feedback_type, offset=offset, cursor=cursor, limit=limit))
+
+def query_company_feedback_info(company_id:int, feedback_type: Optional[FeedbackType] = None, offset: Optional[int] = None,
+cursor: Optional[str] = None, limit: Optional[int] = None) -> Optional[dict]:
+    """Returns the feedback at 'offset' or a page of feedbacks. Pages are sorted by (created_at, id) and the
+    'next_cursor' of a page is used to get the next one, so every page costs the same regardless of its depth"""
     ftype = [feedback_type]
     if feedback_type is None:
         subclass = '*'
@@ -81,17 +171,38 @@ def get_company_feedback_info(company_id:int, feedback_type: Optional[FeedbackTy
         raise TypeError
 
     wpm = with_polymorphic(Feedback, subclass)
-    q = db_session.query(wpm).filter(Feedback.company_id == company_id, Feedback.type.in_(ftype)).order_by(desc(Feedback.created_at))
+    q = db_session.query(wpm).filter(Feedback.company_id == company_id, Feedback.type.in_(ftype))\
+    .order_by(desc(Feedback.created_at), desc(Feedback.id))
 
     if offset is not None:
         if offset < 1:
             raise ValueError
-        feedback: Optional[Feedback] = q.filter(wpm.id).offset(offset).first()
+        feedback: Optional[Feedback] = q.options(*feedback_single_options(wpm)).offset(offset).first()
         if feedback is None:
             return None
-        return feedback.to_dict()
-    else:
-        feedbacks = q.all()
-        if feedbacks is None:
-            return None
-        return [feedback.to_dict() for feedback in feedbacks]
+        return feedback_to_dict(feedback)
+    if cursor is not None:
+        created_at, last_id = decode_datetime_cursor(cursor)
+        q = q.filter(tuple_(Feedback.created_at, Feedback.id) < tuple_(created_at, last_id))
+    limit = DEFAULT_PAGE_SIZE if limit is None else limit
+    feedbacks = q.options(*feedback_list_options(wpm)).limit(limit + 1).all()
+    next_cursor = None
+    if len(feedbacks) > limit:
+        feedbacks = feedbacks[:limit]
+        next_cursor = encode_cursor(feedbacks[-1].created_at, feedbacks[-1].id)
+    return {
+        'feedbacks': [feedback_to_dict(feedback) for feedback in feedbacks],
+        'next_cursor': next_cursor
+    }
+
+EXPORT_CHUNK_SIZE = 1000
+
+def export_company_feedbacks(company_id:int, feedback_type:FeedbackType) -> Iterator[dict]:
+    """Yields every feedback of the company, newest first. The rows are fetched from a server-side cursor in
+    chunks, so the memory does not grow with the number of feedbacks"""
+    model = Interview if feedback_type == FeedbackType.interview else Review
+    statement = select(*model.serialized_columns()).select_from(model).where(model.company_id == company_id)\
+    .order_by(desc(model.created_at), desc(model.id))
+    result = db_session.execute(statement, execution_options={"stream_results": True})
+    for rows in result.partitions(EXPORT_CHUNK_SIZE):
+        yield from model.serialize_many(rows)
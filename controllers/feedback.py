@@ -4,7 +4,19 @@ from models.main_models import Feedback, FeedbackStatus, FeedbackType
 from .auth import get_current_user, db_session
 from models.main_models import Review, Interview
 from util.exceptions import ResponseException
-from util.db_operations import add_to_db
+from util.db_operations import safe_commit
+from util.cache import company_cache, company_feedbacks_cache
+from .stats import Contribution, apply_feedback_change, contribution
+
+def save_feedback(feedback: Feedback, before: Optional[Contribution] = None):
+    """Commits the feedback together with the change of its company's aggregates and invalidates the caches
+    of the company"""
+    db_session.add(feedback)
+    db_session.flush() # Column defaults (e.g. status) are set on flush
+    apply_feedback_change(before, contribution(feedback))
+    safe_commit(session=db_session)
+    company_cache.invalidate(feedback.company_id)
+    company_feedbacks_cache.invalidate(feedback.company_id)
 
 def register_feedback(type:FeedbackType, **kwargs):
     user = get_current_user()
@@ -24,7 +36,7 @@ def register_feedback(type:FeedbackType, **kwargs):
     feedback = feeback_model(type=type, user_id=user.id)
     for col, value in kwargs.items():
         setattr(feedback,col,value)
-    add_to_db(db_session, feedback)
+    save_feedback(feedback)
     feedback.id
     return feedback.to_dict()
 
@@ -46,9 +58,20 @@ def edit_feedback(type:FeedbackType, id:int, **kwargs):
         raise ResponseException(code=400, message="User is not authorized to edit this feedback")
     if feedback.created_at is not None and feedback.created_at < datetime.now() - timedelta(days=1):
         raise ResponseException(code=400, message="Feedback edit time window is expired")
+    before = contribution(feedback)
     for key, value in kwargs.items():
         setattr(feedback, key, value)
-    add_to_db(db_session, feedback)
+    save_feedback(feedback, before)
+    feedback.id
+    return feedback.to_dict()
+
+def change_feedback_status(feedback_id:int, status:FeedbackStatus):
+    feedback: Optional[Feedback] = db_session.query(Feedback).get(feedback_id)
+    if feedback is None:
+        raise ResponseException(code=400, message="Feedback not found")
+    before = contribution(feedback)
+    feedback.status = status # type: ignore # column assignment
+    save_feedback(feedback, before)
     feedback.id
     return feedback.to_dict()
 
@@ -0,0 +1,126 @@
+from argparse import ArgumentParser
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from models.main_models import Company, CompanyFeedbackStat, Feedback, FeedbackStatus, FeedbackType, Interview, \
+    InterviewResult
+from util.db_operations import safe_commit
+from .auth import db_session
+
+# Only the feedbacks with these statuses are counted in the aggregates (same as the 'unique_shown_feedback' index)
+COUNTED_STATUSES = [FeedbackStatus.waiting, FeedbackStatus.show]
+STAT_COLUMNS = ['count', 'score_sum', 'salary_sum', 'salary_count'] + [f"result_{name}" for name in InterviewResult.names()]
+
+Contribution = Tuple[int, FeedbackType, Dict[str, float]] # (company_id, type, column deltas)
+
+
+def contribution(feedback: Feedback) -> Optional[Contribution]:
+    """What the feedback adds to the aggregates of its company in its current state"""
+    status = FeedbackStatus.waiting if feedback.status is None else feedback.status
+    if status not in COUNTED_STATUSES:
+        return None
+    delta: Dict[str, float] = Counter({'count': 1, 'score_sum': feedback.score or 0})
+    if feedback.salary is not None:
+        delta['salary_sum'] = feedback.salary
+        delta['salary_count'] = 1
+    result: Optional[InterviewResult] = getattr(feedback, 'result', None)
+    if result is not None:
+        delta[f"result_{result.name}"] = 1
+    return feedback.company_id, feedback.type, delta # type: ignore # column attributes are values at this point
+
+
+def apply_feedback_change(before: Optional[Contribution], after: Optional[Contribution]):
+    """Applies the difference of two contributions of a feedback with atomic upserts. Must be called inside
+    the transaction that changes the feedback"""
+    deltas: Dict[Tuple[int, FeedbackType], Counter] = {}
+    for sign, change in [(-1, before), (1, after)]:
+        if change is None:
+            continue
+        company_id, feedback_type, delta = change
+        total = deltas.setdefault((company_id, feedback_type), Counter())
+        for column, value in delta.items():
+            total[column] += sign * value
+    for (company_id, feedback_type), delta in deltas.items():
+        delta = Counter({column: value for column, value in delta.items() if value != 0})
+        if len(delta) > 0:
+            upsert_stat(company_id, feedback_type, delta)
+
+
+def upsert_stat(company_id: int, feedback_type: FeedbackType, delta: Dict[str, float]):
+    table = CompanyFeedbackStat.__table__
+    statement = insert(table).values(company_id=company_id, type=feedback_type, **{column: delta.get(column, 0)
+    for column in STAT_COLUMNS})
+    statement = statement.on_conflict_do_update(index_elements=[table.c.company_id, table.c.type],
+    set_={column: table.c[column] + statement.excluded[column] for column in delta})\
+        .returning(table.c['count'], table.c.score_sum)
+    count, score_sum = db_session.execute(statement).one()
+    if feedback_type == FeedbackType.review:
+        update_company_score(company_id, count, score_sum)
+
+
+def update_company_score(company_id: int, count: int, score_sum: int):
+    """The score of a company is the average score of its counted reviews"""
+    score = round(score_sum / count) if count > 0 else None
+    db_session.query(Company).filter(Company.id == company_id).update({Company.score: score}, synchronize_session=False)
+
+
+def company_feedback_stats(company_id: int) -> Dict[str, dict]:
+    stats = db_session.query(CompanyFeedbackStat).filter(CompanyFeedbackStat.company_id == company_id).all()
+    res = {}
+    for stat in stats:
+        res[stat.type.name] = {
+            **stat.to_dict(),
+            'avg_score': stat.score_sum / stat.count if stat.count > 0 else None,
+            'avg_salary': stat.salary_sum / stat.salary_count if stat.salary_count > 0 else None
+        }
+    return res
+
+
+def compute_feedback_stats() -> Dict[Tuple[int, FeedbackType], Dict[str, float]]:
+    """Computes the aggregates from scratch by scanning the feedbacks"""
+    interviews = Interview.__table__ # Already outer joined, feedbacks are loaded with their subtypes inline
+    results = [func.count(interviews.c.result).filter(interviews.c.result == result) for result in InterviewResult]
+    q = db_session.query(Feedback.company_id, Feedback.type, func.count(Feedback.id), func.coalesce(func.sum(Feedback.score), 0),
+    func.coalesce(func.sum(Feedback.salary), 0), func.count(Feedback.salary), *results)\
+        .filter(Feedback.status.in_(COUNTED_STATUSES))\
+        .group_by(Feedback.company_id, Feedback.type)
+    return {(row[0], row[1]): dict(zip(STAT_COLUMNS, row[2:])) for row in q}
+
+
+def rebuild_feedback_stats(fix: bool = False) -> List[dict]:
+    """Compares the aggregates with a full recomputation and returns the drifted entries. With 'fix', the table
+    and the company scores are replaced with the recomputed values"""
+    expected = compute_feedback_stats()
+    current = {(stat.company_id, stat.type): {column: getattr(stat, column) for column in STAT_COLUMNS}
+    for stat in db_session.query(CompanyFeedbackStat)}
+    drift = []
+    for key in set(expected) | set(current):
+        exp = expected.get(key, dict.fromkeys(STAT_COLUMNS, 0))
+        cur = current.get(key, dict.fromkeys(STAT_COLUMNS, 0))
+        if any(abs(exp[column] - cur[column]) > 1e-6 for column in STAT_COLUMNS):
+            drift.append({'company_id': key[0], 'type': str(key[1]), 'expected': exp, 'current': cur})
+    if fix and len(drift) > 0:
+        db_session.query(CompanyFeedbackStat).delete(synchronize_session=False)
+        rows = [{'company_id': company_id, 'type': feedback_type, **values}
+        for (company_id, feedback_type), values in expected.items()]
+        if len(rows) > 0:
+            db_session.execute(insert(CompanyFeedbackStat.__table__).values(rows))
+        db_session.query(Company).update({Company.score: None}, synchronize_session=False)
+        for (company_id, feedback_type), values in expected.items():
+            if feedback_type == FeedbackType.review:
+                update_company_score(company_id, values['count'], values['score_sum'])
+        safe_commit(session=db_session)
+    return drift
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Verifies the company feedback aggregates against the feedbacks")
+    parser.add_argument("--fix", action="store_true", help="Replace the aggregates with the recomputed values")
+    args = parser.parse_args()
+    drifted = rebuild_feedback_stats(fix=args.fix)
+    for entry in drifted:
+        print(entry)
+    print(f"{len(drifted)} drifted entries" + (" fixed" if args.fix else ""))
@@ -2,13 +2,12 @@ from typing import Optional
 
 from jwt import ExpiredSignatureError
 from models.main_models import User, UserType
-from argon2 import PasswordHasher
 
 from util.exceptions import ResponseException
-from .auth import generate_auth_token, get_current_user, db_session, q
+from .auth import generate_auth_token, get_current_user, get_current_user_model, invalidate_user, revoke_current_token, \
+    db_session
 from util.db_operations import add_to_db, del_from_db, safe_commit
-
-# TODO Add logout functionality and add token invalidator to it
+from util.passwords import dummy_verify, hash_password, needs_rehash, verify_password
 
 def login(email, password):
     try:
@@ -17,12 +16,22 @@ def login(email, password):
     except ValueError:
         raise ResponseException(code=400,message="User or password is incorrect")
 
+def logout():
+    revoke_current_token()
+    return {}
+
 def find_user(email, password) -> Optional[User]:
-    user:Optional[User] = q.where(User.email == email).first()
-    ph = PasswordHasher()
-    if user is not None and ph.verify(hash = str(user.password), password=password):
-        return user
-    return None
+    user:Optional[User] = db_session.query(User).where(User.email == email).first()
+    if user is None:
+        dummy_verify(password)
+        return None
+    if not verify_password(str(user.password), password):
+        return None
+    if needs_rehash(str(user.password)):
+        # The password is only known here, so the hashes are upgraded to the configured costs on login
+        user.password = hash_password(password) # type: ignore # column assignment
+        safe_commit(session=db_session)
+    return user
 
 def authenticate_user(email, password):
     user = find_user(email, password)
@@ -32,29 +41,31 @@ def authenticate_user(email, password):
         raise ValueError
 
 def create_user(user_name:str, password:str, email:str, type:str = UserType.employee.name):
-    ph = PasswordHasher()
-    user = User(name=user_name, password=ph.hash(password), email=email,type=UserType[type])
+    user = User(name=user_name, password=hash_password(password), email=email,type=UserType[type])
     add_to_db(session=db_session,models=user)
     return {'token': generate_auth_token(identity=user)}
 
 def update_user(**kwargs):
-    user:User = get_current_user()
+    user:User = get_current_user_model()
     if len(kwargs) < 1:
         raise ValueError("At least one entry is needed to update user. Zero given")
     for key,value in kwargs.items():
         setattr(user,key,value)
     safe_commit(session=db_session)
+    invalidate_user(user.id) # type: ignore # column value
     user.id
     return user.to_dict()
 
 def del_user():
-    user:User =  get_current_user()
+    user:User =  get_current_user_model()
+    user_id = user.id
     del_from_db(session=db_session, model=user)
+    invalidate_user(user_id) # type: ignore # column value
     return True
 
 def get_user_info():
     try:
-        user: User = get_current_user()
+        user = get_current_user()
         return user.to_dict()
     except ExpiredSignatureError:
         raise ResponseException(code=400, message='User session expired')
\ No newline at end of file
@@ -1,10 +1,10 @@
-from enum import Enum
-from typing import List, Optional, Type
+from typing import Any, Callable, Iterable, List, Optional, Tuple
 
 from pytz import timezone
+from sqlalchemy import inspect
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.schema import Column
-from sqlalchemy.sql.sqltypes import DateTime, Integer
+from sqlalchemy.sql.sqltypes import JSON, DateTime, Enum as SQLEnum, Integer
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 from sqlalchemy.orm import registry
 from datetime import datetime
@@ -30,8 +30,6 @@ class BaseMixin(object):
     """ Base class for all models
     This is used to define constant columns for all models as well as some ancillary functions
     """
-    accepted_serialization_types = [str,dict,list,int,float,bool,datetime, type(None)]
-    accepted_serialization_classes = [Enum]
     dict_ignore: list = []
     col_ignore: list = []
 
@@ -53,28 +51,80 @@ class BaseMixin(object):
     def updated_at(cls):
         return None if 'updated_at' in cls.col_ignore else Column(DateTime, default=datetime.now(tehran), onupdate=datetime.now(tehran))
     
-    @staticmethod
-    def is_subclass(value, accepted_classes:list):
-        for a_class in accepted_classes:
-            if issubclass(type(value), a_class):
-                return True
-        return False
+    @classmethod
+    def serializer(cls, ignore_keys:Optional[List[str]] = None, timestamp = True) -> Callable[[Any], dict]:
+        """ Returns the serializer of the model. It is compiled once per model and options from the column list
+            of the mapper, so serializing an instance is a single pass over the loaded columns
+        """
+        options = (None if ignore_keys is None else tuple(ignore_keys), timestamp)
+        serializers = cls.__dict__.get('_serializers')
+        if serializers is None:
+            serializers = {}
+            setattr(cls, '_serializers', serializers)
+        serializer = serializers.get(options)
+        if serializer is None:
+            fields = cls.serialized_fields(ignore_keys, timestamp)
+
+            def serializer(instance) -> dict:
+                state = instance.__dict__
+                res = {}
+                # Columns that are not loaded (deferred or expired) are left out instead of being lazy loaded
+                for key, convert in fields:
+                    if key in state:
+                        value = state[key]
+                        res[key] = value if convert is None or value is None else convert(value)
+                return res
+            serializers[options] = serializer
+        return serializer
+
+    @classmethod
+    def serialized_fields(cls, ignore_keys:Optional[List[str]] = None, timestamp = True) -> List[Tuple[str, Optional[Callable]]]:
+        """ (key, converter) of the serialized columns. JSONB columns hold MutableDicts and are not serialized """
+        ignore = cls.dict_ignore if ignore_keys is None else ignore_keys
+        fields: List[Tuple[str, Optional[Callable]]] = []
+        for attr in inspect(cls).column_attrs:
+            column_type = attr.columns[0].type
+            if attr.key.startswith("_") or attr.key in ignore or isinstance(column_type, JSON):
+                continue
+            convert = None
+            if isinstance(column_type, DateTime) and timestamp:
+                convert = datetime.timestamp
+            elif isinstance(column_type, SQLEnum) and column_type.enum_class is not None \
+            and issubclass(column_type.enum_class, BaseEnum):
+                convert = str
+            fields.append((attr.key, convert))
+        return fields
+
+    @classmethod
+    def serialized_columns(cls, ignore_keys:Optional[List[str]] = None) -> list:
+        """ The columns to query for 'serialize_many' when the full instances are not needed """
+        keys = [key for key, _ in cls.serialized_fields(ignore_keys)]
+        return [getattr(cls, key) for key in keys]
+
+    @classmethod
+    def serialize_many(cls, rows:Iterable, ignore_keys:Optional[List[str]] = None, timestamp = True) -> List[dict]:
+        """ Serializes instances of the model, or the row tuples of a query over (some of) 'serialized_columns' """
+        rows = list(rows)
+        if len(rows) == 0:
+            return []
+        if isinstance(rows[0], cls):
+            # A polymorphic query returns instances of several subclasses
+            serializers = {}
+            res = []
+            for row in rows:
+                serializer = serializers.get(type(row))
+                if serializer is None:
+                    serializer = serializers[type(row)] = type(row).serializer(ignore_keys, timestamp)
+                res.append(serializer(row))
+            return res
+        converters = dict(cls.serialized_fields(ignore_keys, timestamp))
+        fields = [(key, converters.get(key)) for key in rows[0]._fields]
+        return [{key: value if convert is None or value is None else convert(value)
+        for (key, convert), value in zip(fields, row)} for row in rows]
 
     def to_dict(self, ignore_keys:Optional[List[str]]= None, timestamp = True):
-        """ Reflects the attributes and values of current instance of model
+        """ Reflects the loaded columns and values of current instance of model
             This class is used for declaration of base model for sqlalchemy models. It is directly referenced
             when initializing db in wsgi package
         """
-        res = {}
-        ignore = self.dict_ignore if ignore_keys is None else ignore_keys
-        
-        for key, value in self.__dict__.items():
-            key_is_valid = not (key.startswith("__") or key.startswith("_") or key in ignore)
-            value_is_valid = type(value) in self.accepted_serialization_types or self.is_subclass(value, self.accepted_serialization_classes)
-            if key_is_valid and value_is_valid:
-                if type(value) == datetime and timestamp:
-                    value = value.timestamp()
-                if issubclass(type(value), BaseEnum):
-                    value = str(value)
-                res[key] = value
-        return res
+        return self.serializer(ignore_keys, timestamp)(self)
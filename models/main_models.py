@@ -1,5 +1,5 @@
 import email
-from sqlalchemy import String, Integer, Enum, Column, TIMESTAMP, ForeignKey, Index, Float
+from sqlalchemy import String, Integer, Enum, Column, TIMESTAMP, ForeignKey, Index, Float, DDL, event, func
 from sqlalchemy.dialects.postgresql import JSONB, BOOLEAN, TEXT
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import relationship
@@ -7,6 +7,9 @@ from sqlalchemy.orm import relationship
 from .base_model import BaseMixin, Base
 from util import BaseEnum
 
+# The trigram indexes of the company names need the pg_trgm extension
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 # from sqlalchemy_json import mutable_json_type --> if you ever wanted to modify nested json keys
 class UserType(BaseEnum):
     admin = 'admin'
@@ -101,6 +104,18 @@ class Company(Base, BaseMixin):
     city = relationship(City, back_populates="companies")
     industry = relationship(Industry, back_populates="companies")
 
+    # The indexes of the company search (see controllers.company.search_companies)
+    __table_args__ = (
+        Index("companies_fa_name_trgm", fa_name, postgresql_using="gin", postgresql_ops={"fa_name": "gin_trgm_ops"}),
+        Index("companies_en_name_trgm", en_name, postgresql_using="gin", postgresql_ops={"en_name": "gin_trgm_ops"}),
+        Index("companies_city", city_id),
+        Index("companies_industry", industry_id),
+        Index("companies_verified", is_verified),
+        Index("companies_score_page", func.coalesce(score, -1), "id"),
+        Index("companies_newest_page", "created_at", "id"),
+        Index("companies_name_page", fa_name, "id"),
+    )
+
 class Feedback(Base, BaseMixin):
 
     title = Column(String(80), unique=False, nullable=False)
@@ -123,8 +138,10 @@ class Feedback(Base, BaseMixin):
         'polymorphic_on':type
     }
     # We only index uniqueness for the feedbacks that have the satatus of 'show' or 'waiting'
+    # The company_feedback_pages index backs the keyset pagination of the feedbacks of a company
     __table_args__ = (Index("unique_shown_feedback",user_id, company_id, type, status, 
-    unique=True, postgresql_where=(status.in_([FeedbackStatus.show, FeedbackStatus.waiting]))),)
+    unique=True, postgresql_where=(status.in_([FeedbackStatus.show, FeedbackStatus.waiting]))),
+    Index("company_feedback_pages", company_id, type, "created_at", "id"),)
 
 class Review(Feedback):
     col_ignore = ['id']
@@ -151,6 +168,25 @@ class Interview(Feedback):
         'polymorphic_load': 'inline'
     }
 
+class CompanyFeedbackStat(Base, BaseMixin):
+    """Running aggregates of the counted feedbacks (see controllers/stats.py) of a company per feedback type.
+    They are updated in the same transaction as the feedbacks, so reading them never scans the feedbacks"""
+    col_ignore = ['id','created_at']
+    dict_ignore = ['company_id','updated_at']
+
+    company_id = Column(Integer, ForeignKey('companies.id', ondelete="CASCADE"), primary_key=True)
+    type = Column(Enum(FeedbackType), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+    salary_sum = Column(Float, nullable=False, default=0)
+    salary_count = Column(Integer, nullable=False, default=0)
+    # Histogram of InterviewResult for interviews
+    result_accepted = Column(Integer, nullable=False, default=0)
+    result_rejected = Column(Integer, nullable=False, default=0)
+    result_failed = Column(Integer, nullable=False, default=0)
+    result_cancelled = Column(Integer, nullable=False, default=0)
+    result_ghosted = Column(Integer, nullable=False, default=0)
+
 class CompanyResponse(Base, BaseMixin):
 
     body = Column(TEXT, nullable=False)
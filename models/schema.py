@@ -114,7 +114,7 @@ class CompanyInfo(BaseParamsSchema):
             optional= True,
             eval={
                 "_order": lambda x: "The salary must be btween 1 and 100 million tomans" if x < 1 or x > 100 else None,
-                "_check_calc": lambda x: "Wrong avg salary amount" if x < self.inputs.get('min_salary',0) or x > self.inputs.get('max_salary',100) else None
+                "_check_calc": lambda x, inputs: "Wrong avg salary amount" if x < inputs.get('min_salary',0) or x > inputs.get('max_salary',100) else None
             },
             preconverter= lambda x: round(float(x),2)
         )
@@ -124,7 +124,7 @@ class CompanyInfo(BaseParamsSchema):
             optional= True,
             eval={
                 "_order": lambda x: "The salary must be btween 1 and 100 million tomans" if x < 1 or x > 100 else None,
-                "_check_calc": lambda x: "Wrong min salary amount" if x > self.inputs.get('avg_salary',100) or x > self.inputs.get('max_salary',100) else None
+                "_check_calc": lambda x, inputs: "Wrong min salary amount" if x > inputs.get('avg_salary',100) or x > inputs.get('max_salary',100) else None
             },
             preconverter= lambda x: round(float(x),2)      
         )
@@ -134,7 +134,7 @@ class CompanyInfo(BaseParamsSchema):
             optional= True,
             eval={
                 "_order": lambda x: "The salary must be btween 1 and 100 million tomans" if x < 1 or x > 100 else None,
-                "_check_calc": lambda x: "Wrong max salary amount" if x < self.inputs.get('avg_salary',0) or x < self.inputs.get('min_salary',0) else None
+                "_check_calc": lambda x, inputs: "Wrong max salary amount" if x < inputs.get('avg_salary',0) or x < inputs.get('min_salary',0) else None
             },
             preconverter= lambda x: round(float(x),2)           
         )
@@ -288,7 +288,7 @@ class CompanyInfoImport(BaseParamsSchema):
             optional= True,
             eval={
                 "_order": lambda x: "The salary must be btween 1 and 100 million tomans" if x < 1 or x > 100 else None,
-                "_check_calc": lambda x: "Wrong avg salary amount" if x < self.inputs['min_salary'] or x > self.inputs['max_salary'] else None
+                "_check_calc": lambda x, inputs: "Wrong avg salary amount" if x < inputs['min_salary'] or x > inputs['max_salary'] else None
             },
             preconverter= lambda x: round(float(x),2)
         )
@@ -298,7 +298,7 @@ class CompanyInfoImport(BaseParamsSchema):
             optional= True,
             eval={
                 "_order": lambda x: "The salary must be btween 1 and 100 million tomans" if x < 1 or x > 100 else None,
-                "_check_calc": lambda x: "Wrong min salary amount" if x > self.inputs['avg_salary'] or x > self.inputs['max_salary'] else None
+                "_check_calc": lambda x, inputs: "Wrong min salary amount" if x > inputs['avg_salary'] or x > inputs['max_salary'] else None
             },
             preconverter= lambda x: round(float(x),2)      
         )
@@ -308,7 +308,7 @@ class CompanyInfoImport(BaseParamsSchema):
             optional= True,
             eval={
                 "_order": lambda x: "The salary must be btween 1 and 100 million tomans" if x < 1 or x > 100 else None,
-                "_check_calc": lambda x: "Wrong max salary amount" if x < self.inputs['avg_salary'] or x < self.inputs['min_salary'] else None
+                "_check_calc": lambda x, inputs: "Wrong max salary amount" if x < inputs['avg_salary'] or x < inputs['min_salary'] else None
             },
             preconverter= lambda x: round(float(x),2)           
         )
@@ -372,3 +372,6 @@ class CompanyInfoImport(BaseParamsSchema):
                 "_bigger": lambda x: "The count must be bigger than zero" if x < 0 else None
             }            
         )
+
+
+BaseParamsSchema.compile_subclasses()
@@ -1,12 +1,30 @@
 import os
-from time import sleep
-from random import randint
-from typing import Optional
+import traceback
+from argparse import ArgumentParser
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+from random import randint, uniform
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 import json
 
+from page_store import PageStore
+
+CACHE_URL = "http://webcache.googleusercontent.com/search?q=cache:https://jobguy.work/{type}/{id}"
+DETECTED_TEXT = "Our systems have detected"
+LOADED_CLASS = "nuxt-link-active" # Only the pages of existing feedbacks have it
+
+
+def write_page(path: str, source: str):
+    """Writes the page to a temporary file first and renames it, so a page is either complete or absent"""
+    with open(path + ".tmp", "w", encoding="utf-8") as h:
+        h.write(source)
+    os.replace(path + ".tmp", path)
+
 
 class Crawler:
     __driver: Optional[webdriver.Chrome] = None
@@ -82,7 +100,7 @@ class Crawler:
             return False
 
     @classmethod
-    def run(cls, start, end=2800):
+    def run(cls, start, end=2800, store: Optional[PageStore] = None):
         # start from 502
         failed = []
         i = start - 1
@@ -92,9 +110,11 @@ class Crawler:
             url = "http://webcache.googleusercontent.com/search?q=cache:https://jobguy.work/interview/" + str(i)
             cls.__driver.get(url)
             try:
-                cls.__driver.find_element_by_class_name("nuxt-link-active")
-                with open(f"interviews/{i}.html", "a+") as h:
-                    h.write(cls.__driver.page_source)
+                cls.__driver.find_element_by_class_name(LOADED_CLASS)
+                if store is not None:
+                    store.put(i, cls.__driver.page_source)
+                else:
+                    write_page(f"interviews/{i}.html", cls.__driver.page_source)
             except:
                 if cls.is_detected():
                     print(f"detected! -> {i}")
@@ -128,3 +148,224 @@ class Crawler:
                 s = randint(1, 1000) / 1000 * 2
                 sleep(s)
         cls.__driver.close()
+
+
+class Ledger():
+    """Persistent progress of a crawl. Every finished id is appended as a JSON line, so a restarted crawl skips
+    exactly the ids that are done. A line cut by a crash is ignored"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.status: Dict[int, str] = {}
+        self.__lock = Lock()
+        line = "\n"
+        if os.path.isfile(path):
+            with open(path, "r") as h:
+                for line in h:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.status[entry["id"]] = entry["status"]
+        self.__file = open(path, "a")
+        if not line.endswith("\n"): # The cut line is ended, or the next record would be lost with it
+            self.__file.write("\n")
+
+    def record(self, page_id: int, status: str):
+        with self.__lock:
+            self.status[page_id] = status
+            self.__file.write(json.dumps({"id": page_id, "status": status}) + "\n")
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def pending(self, ids: Iterable[int], retry_failed: bool = False) -> List[int]:
+        finished = ['done', 'missing'] if retry_failed else ['done', 'missing', 'failed']
+        return [i for i in ids if self.status.get(i) not in finished]
+
+    def close(self):
+        self.__file.close()
+
+
+class HttpFetcher():
+    """Fetches the pages without a browser, for the sources that don't need javascript"""
+
+    def __init__(self, timeout: int = 30) -> None:
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def fetch(self, url: str) -> Tuple[Optional[int], str]:
+        res = self.session.get(url, timeout=self.timeout)
+        return res.status_code, res.text
+
+    def close(self):
+        self.session.close()
+
+
+class BrowserFetcher():
+    """A Chrome driver of its own for every worker"""
+
+    def __init__(self, headless: bool = True) -> None:
+        options = Options()
+        options.headless = headless
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        self.driver = webdriver.Chrome(executable_path="resources/chromedriver-92", options=options)
+
+    def fetch(self, url: str) -> Tuple[Optional[int], str]:
+        self.driver.get(url)
+        return None, self.driver.page_source
+
+    def close(self):
+        self.driver.quit()
+
+
+def page_status(code: Optional[int], source: str) -> str:
+    if source.find(DETECTED_TEXT) != -1 or code == 429:
+        return 'blocked'
+    if source.find(LOADED_CLASS) != -1:
+        return 'done'
+    if code == 404:
+        return 'missing'
+    return 'failed'
+
+
+class ParallelCrawler():
+    """Crawls an id range with a work queue shared by 'workers' fetchers. Each worker waits between
+    'min_delay' and 'max_delay' seconds between its requests. A block makes all the workers back off for
+    'backoff' seconds times the blocks in a row (10s, 20s, ...) and the whole crawl stops after 'max_blocked'
+    blocks in a row, to be resumed from the ledger later. With a 'store', the pages go into it instead of an {id}.html file each"""
+
+    def __init__(self, url: str, out_dir: str, fetcher_factory: Callable, workers: int = 4, ledger_path: Optional[str] = None,
+    min_delay: float = 1, max_delay: float = 3, max_attempts: int = 3, max_blocked: int = 20,
+    store: Optional[PageStore] = None, backoff: float = 10) -> None:
+        self.url = url
+        self.out_dir = out_dir
+        self.fetcher_factory = fetcher_factory
+        self.workers = workers
+        self.store = store
+        os.makedirs(out_dir, exist_ok=True)
+        self.ledger = Ledger(ledger_path or f"{out_dir.rstrip('/')}_ledger.jsonl")
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.max_blocked = max_blocked
+        self.backoff = backoff
+        self.queue: Queue = Queue()
+        self.stopped = Event()
+        self.__blocked = 0
+        self.__blocked_at = 0.0 # monotonic() of the last block
+        self.__resume_at = 0.0 # No worker sends a request before it
+        self.__lock = Lock()
+
+    def save(self, page_id: int, source: str):
+        if self.store is not None:
+            self.store.put(page_id, source)
+            return
+        write_page(os.path.join(self.out_dir, f"{page_id}.html"), source)
+
+    def __blocked_backoff(self, sent_at: float) -> Optional[float]:
+        """Starts the backoff of all the workers. Returns it, 0 for a request that was sent before the last block
+        (already covered by its backoff) or None when the crawl is stopped"""
+        with self.__lock:
+            if sent_at < self.__blocked_at:
+                return 0
+            self.__blocked += 1
+            self.__blocked_at = monotonic()
+            if self.__blocked > self.max_blocked:
+                self.stopped.set()
+                return None
+            backoff = self.__blocked * self.backoff
+            self.__resume_at = self.__blocked_at + backoff
+            return backoff
+
+    def __wait_backoff(self) -> bool:
+        """Waits until the backoff is over. False when the crawl is stopped meanwhile"""
+        while not self.stopped.is_set():
+            with self.__lock:
+                wait = self.__resume_at - monotonic()
+            if wait <= 0:
+                return True
+            self.stopped.wait(wait)
+        return False
+
+    def __work(self):
+        fetcher = self.fetcher_factory()
+        last_request = 0.0
+        try:
+            while not self.stopped.is_set():
+                try:
+                    page_id, attempt = self.queue.get(timeout=0.5)
+                except Empty:
+                    return
+                # Politeness: a random pause since the previous request of this worker
+                wait = last_request + uniform(self.min_delay, self.max_delay) - monotonic()
+                if wait > 0:
+                    sleep(wait)
+                if not self.__wait_backoff():
+                    return
+                last_request = monotonic()
+                try:
+                    code, source = fetcher.fetch(self.url.format(id=page_id))
+                    status = page_status(code, source)
+                except Exception:
+                    print(f"failed: {page_id}, attempt {attempt + 1}")
+                    traceback.print_exc()
+                    status = 'failed'
+                if status == 'done':
+                    self.save(page_id, source)
+                    with self.__lock:
+                        self.__blocked = 0
+                if status == 'blocked':
+                    backoff = self.__blocked_backoff(last_request)
+                    # Blocks are not the page's fault. It is fetched again after the backoff, like the others
+                    self.queue.put((page_id, attempt))
+                    if backoff is None:
+                        print(f"Stopped at {page_id}: blocked {self.max_blocked} times in a row")
+                    elif backoff > 0:
+                        print(f"detected! -> {page_id}, all workers wait {backoff}s")
+                elif status == 'failed' and attempt + 1 < self.max_attempts:
+                    self.queue.put((page_id, attempt + 1))
+                else:
+                    self.ledger.record(page_id, status)
+                self.queue.task_done()
+        finally:
+            fetcher.close()
+
+    def run(self, start: int, end: int, retry_failed: bool = False) -> Dict[str, int]:
+        pending = self.ledger.pending(range(start, end + 1), retry_failed=retry_failed)
+        print(f"{len(pending)} of {end - start + 1} pages to crawl")
+        for page_id in pending:
+            self.queue.put((page_id, 0))
+        threads = [Thread(target=self.__work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.ledger.close()
+        counts: Dict[str, int] = {}
+        for page_id in range(start, end + 1):
+            status = self.ledger.status.get(page_id, 'pending')
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Crawls the feedback pages of an id range with parallel workers")
+    parser.add_argument("type", choices=["interview", "review"])
+    parser.add_argument("start", type=int)
+    parser.add_argument("end", type=int)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--url", default=CACHE_URL, help="Page url with {type} and {id} placeholders")
+    parser.add_argument("--browser", action="store_true", help="Fetch with Chrome drivers instead of plain HTTP")
+    parser.add_argument("--min-delay", type=float, default=1)
+    parser.add_argument("--max-delay", type=float, default=3)
+    parser.add_argument("--retry-failed", action="store_true")
+    parser.add_argument("--files", action="store_true", help="Write an {id}.html file per page instead of the store")
+    args = parser.parse_args()
+    page_store = None if args.files else PageStore(f"{args.type}s_store")
+    crawler = ParallelCrawler(url=args.url.replace("{type}", args.type), out_dir=f"{args.type}s",
+    fetcher_factory=BrowserFetcher if args.browser else HttpFetcher, workers=args.workers,
+    ledger_path=f"{args.type}s_ledger.jsonl", min_delay=args.min_delay, max_delay=args.max_delay, store=page_store)
+    print(crawler.run(args.start, args.end, retry_failed=args.retry_failed))
+    if page_store is not None:
+        print(page_store.stats())
+        page_store.close()
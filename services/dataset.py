@@ -0,0 +1,88 @@
+import os
+import shutil
+from argparse import ArgumentParser
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATASET_DIR = "processed_all"
+PICKLE_FILE = "processed_all.p"
+PARTITION = "type"
+TIMESTAMP_FORMAT = "%d.%m.%Y %H:%M:%S"
+# Without the partition column, which is stored in the directory names (type=review/...)
+SCHEMA = pa.schema([
+    ("raw_text", pa.string()),
+    ("title", pa.string()),
+    ("slug", pa.int64()),
+    ("timestamp", pa.timestamp("s")),
+])
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """The chat DataFrame with its real dtypes: int slug, datetime timestamp and categorical type. Slugs and
+    timestamps that don't parse become nulls"""
+    df = df.copy()
+    df["slug"] = pd.to_numeric(df["slug"], errors="coerce").astype("Int64")
+    if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        # Newer exports add the offset, like '19.08.2021 12:34:56 UTC+04:30'
+        df["timestamp"] = pd.to_datetime(df["timestamp"].astype("string").str.slice(0, 19), format=TIMESTAMP_FORMAT,
+                                         errors="coerce")
+    df[PARTITION] = df[PARTITION].astype("category")
+    return df
+
+
+def write_dataset(df: pd.DataFrame, path: str = DATASET_DIR, append: bool = False) -> int:
+    """Writes the DataFrame as Parquet partitioned by type. Unless 'append' is set, the dataset is replaced.
+    Appended messages whose (type, slug) is already in the dataset are skipped, so parsing an export again,
+    like the first run after a migration, adds no duplicates. Messages without a slug are compared by their
+    text. Returns the number of rows written"""
+    if not append and os.path.isdir(path):
+        shutil.rmtree(path)
+    df = normalize(df)
+    if append and os.path.isdir(path):
+        no_slug = df["slug"].isna().to_numpy()
+        columns = [PARTITION, "slug", "raw_text"] if no_slug.any() else [PARTITION, "slug"]
+        existing = read_dataset(path, columns=columns)
+        existing_no_slug = existing["slug"].isna().to_numpy()
+        keys = pd.MultiIndex.from_arrays([df[PARTITION].astype(str), df["slug"]])
+        existing_keys = pd.MultiIndex.from_arrays([existing[PARTITION].astype(str), existing["slug"].astype("Int64")])
+        is_new = ~keys.isin(existing_keys[~existing_no_slug])
+        if no_slug.any():
+            texts = pd.MultiIndex.from_arrays([df[PARTITION].astype(str), df["raw_text"]])
+            existing_texts = pd.MultiIndex.from_arrays([existing[PARTITION].astype(str)[existing_no_slug],
+                                                        existing["raw_text"][existing_no_slug]])
+            is_new[no_slug] = ~texts[no_slug].isin(existing_texts)
+        df = df[is_new]
+    if len(df) == 0:
+        return 0
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False) \
+        .append_column(PARTITION, pa.array(df[PARTITION].astype(str), pa.string()))
+    pq.write_to_dataset(table, path, partition_cols=[PARTITION])
+    return len(df)
+
+
+def read_dataset(path: str = DATASET_DIR, columns: Optional[List[str]] = None, types: Optional[List[str]] = None,
+                 filters: Optional[list] = None) -> pd.DataFrame:
+    """Reads only the 'columns' of the partitions of 'types'. 'filters' are pyarrow predicates like
+    [('slug', '>=', 502)], pushed down to the row groups"""
+    filters = list(filters or [])
+    if types is not None:
+        filters.append((PARTITION, "in", types))
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters or None)
+
+
+def migrate(pickle_path: str = PICKLE_FILE, path: str = DATASET_DIR) -> int:
+    """Converts the old pickle of the chat messages to the dataset. Returns the number of rows"""
+    df = pd.read_pickle(pickle_path)
+    write_dataset(df, path)
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Converts the pickle of the chat messages to the Parquet dataset")
+    parser.add_argument("pickle", nargs="?", default=PICKLE_FILE)
+    parser.add_argument("dataset", nargs="?", default=DATASET_DIR)
+    args = parser.parse_args()
+    print(f"{migrate(args.pickle, args.dataset)} rows written to {args.dataset}")
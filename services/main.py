@@ -1,8 +1,12 @@
-from os.path import isfile
-from typing import Literal
+from os import listdir
+from os.path import isdir
+from typing import Dict, Literal, Optional, Set, Tuple
 
 from crawler import Crawler
+from dataset import DATASET_DIR, read_dataset
+from page_store import PageStore
 from process_chats import check_integrity, run
+import numpy as np
 import pandas as pd
 from random import randint
 import atexit
@@ -21,30 +25,64 @@ def crawler_load():
     return Crawler.get_driver()
 
 
-def check_existence(file_type: Literal["review", "interview"], start=1, end=1000, channel_start=502):
-    missing_files = []
-    missing_in_df = []
-    existing_files = []
-    df = pd.read_pickle("processed_all.p")
-    filt = df[df['type'] == file_type]
-    for i in range(start, end + 1):
-        file_exists = isfile(f"{file_type}s/{i}.html")
-        if not file_exists:
-            if not filt[filt['slug'] == str(i)].empty or i < channel_start:
-                missing_files.append(i)
-        else:
-            existing_files.append(i)
-            if i >= channel_start and filt[filt['slug'] == str(i)].empty:
-                missing_in_df.append(i)
+def file_ids(directory: str) -> Set[int]:
+    """The ids of the crawled pages, from a single listing of the directory"""
+    if not isdir(directory):
+        return set()
+    ids = set()
+    for name in listdir(directory):
+        stem, _, ext = name.partition(".")
+        if ext == "html" and stem.isdigit():
+            ids.add(int(stem))
+    return ids
+
+
+def crawled_ids(file_type: str) -> Set[int]:
+    """The ids in the page store of the type ({type}s_store, where the crawler writes by default) and in its
+    directory of {id}.html files, from older or --files crawls"""
+    ids = file_ids(f"{file_type}s")
+    if isdir(f"{file_type}s_store"):
+        store = PageStore(f"{file_type}s_store")
+        ids.update(store.ids())
+        store.close()
+    return ids
+
+
+def slug_index(df: pd.DataFrame) -> Dict[str, Tuple[np.ndarray, int]]:
+    """The sorted unique numeric slugs and the row count of every feedback type, in one pass over the DataFrame"""
+    slugs = pd.to_numeric(df['slug'], errors='coerce')
+    index = {}
+    for file_type, group in slugs.groupby(df['type'].astype(str), sort=False):
+        index[file_type] = (np.unique(group.dropna().to_numpy(dtype=np.int64)), len(group))
+    return index
+
+
+def check_existence(file_type: Literal["review", "interview"], start=1, end=1000, channel_start=502,
+                    index: Optional[Dict[str, Tuple[np.ndarray, int]]] = None):
+    if index is None:
+        index = slug_index(read_dataset(columns=['type', 'slug'], types=[file_type]))
+    slugs, rows = index.get(file_type, (np.array([], dtype=np.int64), 0))
+    ids = np.arange(start, end + 1)
+    in_df = np.isin(ids, slugs, assume_unique=True)
+    has_file = np.isin(ids, np.fromiter(crawled_ids(file_type), dtype=np.int64), assume_unique=True)
+    before_channel = ids < channel_start
+    missing_in_df = ids[has_file & ~before_channel & ~in_df]
     return {
         'type': file_type,
-        'missing_files': missing_files,
-        'missing_in_df': missing_in_df,
-        'existing_files': existing_files,
-        'total': len(filt) + len(missing_in_df) + channel_start - 1
+        'missing_files': ids[~has_file & (in_df | before_channel)].tolist(),
+        'missing_in_df': missing_in_df.tolist(),
+        'existing_files': ids[has_file].tolist(),
+        'total': rows + len(missing_in_df) + channel_start - 1
     }
 
 
+def check_all(ranges: Dict[str, Tuple[int, int, int]], path: str = DATASET_DIR):
+    """Audits every type of 'ranges' (type -> (start, end, channel_start)) with a single read of the dataset"""
+    index = slug_index(read_dataset(path, columns=['type', 'slug'], types=list(ranges)))
+    return {file_type: check_existence(file_type, start, end, channel_start, index=index)  # type: ignore
+            for file_type, (start, end, channel_start) in ranges.items()}
+
+
 def test():
     res = []
     for j in range(0, 1000000):
@@ -55,8 +93,7 @@ def test():
 
 if __name__ == '__main__':
     # test()
-    reviews = check_existence("review", 1, 2804, 522)
-    interviews = check_existence("interview", 1, 1184, 133)
+    report = check_all({"review": (1, 2804, 522), "interview": (1, 1184, 133)})
     # df = pd.read_pickle("processed_all.p")
     # df1:pd.DataFrame = df[df['type'] == 'review']
     # df2 = df1.sort_values(by='slug',axis=0)
@@ -0,0 +1,211 @@
+import os
+import gzip
+import mmap
+import sqlite3
+import hashlib
+from argparse import ArgumentParser
+from threading import Lock, local
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError: # zstandard is optional, the pages are gzipped without it
+    zstandard = None
+
+SEGMENT_SIZE = 64 * 1024 * 1024 # A new segment file is started past this size
+ZSTD_LEVEL = 9
+GZIP_LEVEL = 6
+# The pages share most of their markup. A zstd dictionary trained on the first pages stores it once
+DICTIONARY_SAMPLES = 100
+DICTIONARY_SIZE = 112 * 1024
+
+
+class PageStore():
+    """Crawled pages packed into append-only segment files. Every distinct page content is compressed and stored
+    once, under its sha256. A sqlite index maps the page ids to their content and the content to its
+    (segment, offset, length), so reading a page is one lookup and one positioned read"""
+
+    def __init__(self, path: str, codec: Optional[str] = None, segment_size: int = SEGMENT_SIZE) -> None:
+        self.path = path
+        self.codec = codec or ("zstd" if zstandard is not None else "gzip")
+        if self.codec == "zstd" and zstandard is None:
+            raise Exception("zstandard is not installed")
+        self.segment_size = segment_size
+        os.makedirs(path, exist_ok=True)
+        self.__lock = Lock()
+        self.__readers: Dict[int, int] = {}
+        self.__local = local() # zstd decompressors are not thread safe
+        self.__dictionary = None
+        self.__samples: Optional[list] = [] if self.codec == "zstd" else None
+        if os.path.isfile(self.__dictionary_path()):
+            with open(self.__dictionary_path(), "rb") as h:
+                self.__dictionary = zstandard.ZstdCompressionDict(h.read())
+            self.__samples = None
+        self.__compressor = self.__zstd_compressor() if self.codec == "zstd" else None
+        self.__db = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self.__db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, segment INTEGER, offset INTEGER,
+                length INTEGER, codec TEXT);
+            CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, hash TEXT REFERENCES blobs(hash));
+        """)
+        self.__segment = self.__db.execute("SELECT COALESCE(MAX(segment), 0) FROM blobs").fetchone()[0]
+        self.__writer = open(self.__segment_path(self.__segment), "ab")
+
+    def __segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:05d}.seg")
+
+    def __dictionary_path(self) -> str:
+        return os.path.join(self.path, "dictionary")
+
+    def __zstd_compressor(self):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self.__dictionary)
+
+    def __train_dictionary(self, data: bytes):
+        self.__samples.append(data) # type: ignore # only called while sampling
+        if len(self.__samples) < DICTIONARY_SAMPLES: # type: ignore
+            return
+        try:
+            dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, self.__samples)
+        except zstandard.ZstdError:
+            self.__samples = None # Pages too few or too small to gain from a dictionary
+            return
+        with open(self.__dictionary_path() + ".tmp", "wb") as h:
+            h.write(dictionary.as_bytes())
+            h.flush()
+            os.fsync(h.fileno())
+        os.replace(self.__dictionary_path() + ".tmp", self.__dictionary_path())
+        self.__dictionary = dictionary
+        self.__compressor = self.__zstd_compressor()
+        self.__samples = None
+
+    def __compress(self, data: bytes) -> Tuple[str, bytes]:
+        if self.codec == "gzip":
+            return "gzip", gzip.compress(data, compresslevel=GZIP_LEVEL)
+        codec = "zstd-dict" if self.__dictionary is not None else "zstd"
+        blob = self.__compressor.compress(data) # type: ignore # set for zstd
+        if self.__samples is not None:
+            self.__train_dictionary(data)
+        return codec, blob
+
+    def __decompress(self, codec: str, blob: bytes) -> bytes:
+        if codec == "gzip":
+            return gzip.decompress(blob)
+        if not hasattr(self.__local, codec):
+            setattr(self.__local, codec, zstandard.ZstdDecompressor(
+                dict_data=self.__dictionary if codec == "zstd-dict" else None))
+        return getattr(self.__local, codec).decompress(blob)
+
+    def put(self, page_id: int, source: str) -> bool:
+        """Stores the page. Returns False when the same content was already stored, for this id or another"""
+        data = source.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self.__lock:
+            is_new = self.__db.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None
+            if is_new:
+                codec, blob = self.__compress(data)
+                if self.__writer.tell() > 0 and self.__writer.tell() + len(blob) > self.segment_size:
+                    self.__writer.close()
+                    self.__segment += 1
+                    self.__writer = open(self.__segment_path(self.__segment), "ab")
+                offset = self.__writer.tell()
+                self.__writer.write(blob)
+                # The bytes are on disk before the index points at them, a crash only leaves unused bytes
+                self.__writer.flush()
+                os.fsync(self.__writer.fileno())
+                self.__db.execute("INSERT INTO blobs VALUES (?, ?, ?, ?, ?)",
+                                  (digest, self.__segment, offset, len(blob), codec))
+            self.__db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?)", (page_id, digest))
+            self.__db.commit()
+        return is_new
+
+    def __reader(self, segment: int) -> int:
+        if segment not in self.__readers:
+            self.__readers[segment] = os.open(self.__segment_path(segment), os.O_RDONLY)
+        return self.__readers[segment]
+
+    def get(self, page_id: int) -> Optional[str]:
+        with self.__lock:
+            row = self.__db.execute("SELECT b.segment, b.offset, b.length, b.codec FROM pages p "
+                                    "JOIN blobs b ON b.hash = p.hash WHERE p.id = ?", (page_id,)).fetchone()
+            if row is None:
+                return None
+            segment, offset, length, codec = row
+            blob = os.pread(self.__reader(segment), length, offset)
+        return self.__decompress(codec, blob).decode("utf-8")
+
+    def __contains__(self, page_id: int) -> bool:
+        with self.__lock:
+            return self.__db.execute("SELECT 1 FROM pages WHERE id = ?", (page_id,)).fetchone() is not None
+
+    def ids(self) -> Iterator[int]:
+        with self.__lock:
+            rows = self.__db.execute("SELECT id FROM pages ORDER BY id").fetchall()
+        return (row[0] for row in rows)
+
+    def iter_pages(self, ids: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, str]]:
+        """Yields (id, source) for all the pages, or for 'ids', in the order they lie on disk so every segment
+        is read sequentially through a memory map. Pages with the same content are decompressed once"""
+        with self.__lock:
+            self.__writer.flush()
+            rows = self.__db.execute("SELECT p.id, b.hash, b.segment, b.offset, b.length, b.codec FROM pages p "
+                                     "JOIN blobs b ON b.hash = p.hash ORDER BY b.segment, b.offset, p.id").fetchall()
+        wanted = set(ids) if ids is not None else None
+        segment_map = None
+        segment = None
+        last_hash = None
+        source = ""
+        try:
+            for page_id, digest, page_segment, offset, length, codec in rows:
+                if wanted is not None and page_id not in wanted:
+                    continue
+                if digest != last_hash:
+                    if page_segment != segment:
+                        if segment_map is not None:
+                            segment_map.close()
+                        with open(self.__segment_path(page_segment), "rb") as h:
+                            segment_map = mmap.mmap(h.fileno(), 0, access=mmap.ACCESS_READ)
+                        segment = page_segment
+                    source = self.__decompress(codec, segment_map[offset:offset + length]).decode("utf-8")
+                    last_hash = digest
+                yield page_id, source
+        finally:
+            if segment_map is not None:
+                segment_map.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self.__lock:
+            pages, = self.__db.execute("SELECT COUNT(*) FROM pages").fetchone()
+            blobs, stored = self.__db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM blobs").fetchone()
+        return {'pages': pages, 'blobs': blobs, 'stored_bytes': stored, 'segments': self.__segment + 1}
+
+    def close(self):
+        with self.__lock:
+            self.__writer.close()
+            for fd in self.__readers.values():
+                os.close(fd)
+            self.__readers = {}
+            self.__db.close()
+
+
+def import_dir(store: PageStore, directory: str) -> Dict[str, int]:
+    """Moves the pages of a crawl directory ({id}.html files) into the store. The files are left in place"""
+    counts = {'stored': 0, 'duplicates': 0}
+    for name in sorted(os.listdir(directory)):
+        stem, _, ext = name.partition(".")
+        if ext != "html" or not stem.isdigit():
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as h:
+            counts['stored' if store.put(int(stem), h.read()) else 'duplicates'] += 1
+    return counts
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Packs the crawled pages of a directory into a page store")
+    parser.add_argument("directory", help="Directory of {id}.html pages, like 'interviews'")
+    parser.add_argument("store", nargs="?", help="Store path, the directory name with '_store' by default")
+    parser.add_argument("--codec", choices=["zstd", "gzip"], default=None)
+    args = parser.parse_args()
+    page_store = PageStore(args.store or f"{args.directory.rstrip('/')}_store", codec=args.codec)
+    print(import_dir(page_store, args.directory), page_store.stats())
+    page_store.close()
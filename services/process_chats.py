@@ -1,7 +1,20 @@
+import os
 import re
+import json
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 
+from lxml import etree
 from pandas import DataFrame
 
+from dataset import DATASET_DIR, write_dataset
+
+COLUMNS = ['raw_text', 'title', 'type', 'slug', 'timestamp']
+MESSAGE_PATTERN = re.compile(r"(.*),?را.*http.*/(.*)/(\d+)")
+PAGE_PATTERN = re.compile(r"messages(\d*)\.html$")
+STATE_FILE = "process_chats_state.json"
+
 
 def check_integrity(driver):
     div_list = driver.find_elements_by_css_selector(".message.default.clearfix")
@@ -50,7 +63,7 @@ def run(driver, page):
 def add_to_df(el, df: DataFrame):
     raw_text = el.find_element_by_class_name("text").text.replace("\n", "")
     timestamp = el.find_element_by_css_selector(".pull_right.date.details").get_attribute("title")
-    match = re.findall(r"(.*),?را.*http.*/(.*)/(\d+)", raw_text)
+    match = MESSAGE_PATTERN.findall(raw_text)
     if len(match) != 1:
         raise Exception(match, raw_text, 'm')
     items = match[0]
@@ -65,7 +78,124 @@ def add_to_df(el, df: DataFrame):
     }, ignore_index=True)
 
 
+def has_class(el, name: str) -> bool:
+    return name in (el.get("class") or "").split()
+
+
+def visible_text(el) -> str:
+    """The text of the element like the driver's '.text' with the line breaks removed"""
+    return "".join(" ".join(line.split()) for line in "".join(el.itertext()).splitlines())
+
+
+def parse_message(el) -> Tuple[str, str, str, str, str]:
+    text_el = None
+    date_el = None
+    for child in el.iter("div"):
+        if text_el is None and has_class(child, "text"):
+            text_el = child
+        elif date_el is None and has_class(child, "date") and has_class(child, "details"):
+            date_el = child
+    if text_el is None or date_el is None:
+        raise Exception(el.get("id"), "missing text or date")
+    raw_text = visible_text(text_el)
+    match = MESSAGE_PATTERN.findall(raw_text)
+    if len(match) != 1:
+        raise Exception(match, raw_text, 'm')
+    title, feedback_type, slug = match[0]
+    return raw_text, title, feedback_type, slug, date_el.get("title")
+
+
+def parse_page(path: str, after_id: int = 0, retry_ids: FrozenSet[int] = frozenset()) \
+-> Tuple[Dict[str, list], list, int, List[int]]:
+    """Streams the messages of an export page whose id is bigger than 'after_id' or in 'retry_ids' into column
+    lists. Returns the columns, the errors, the biggest message id of the page and the ids that failed"""
+    columns: Dict[str, list] = {column: [] for column in COLUMNS}
+    errors = []
+    failed_ids = []
+    last_id = after_id
+    for _, el in etree.iterparse(path, events=("end",), tag="div", html=True, encoding="utf-8"):
+        if not (has_class(el, "message") and has_class(el, "default")):
+            continue
+        id_name: str = el.get("id") or ""
+        # Ids like 'message-1' are skipped, as in 'run'
+        if id_name.startswith("message") and not id_name.startswith("message-"):
+            msg_num = int(id_name[len("message"):])
+            if msg_num > after_id or msg_num in retry_ids:
+                last_id = max(last_id, msg_num)
+                try:
+                    values = parse_message(el)
+                except Exception as e:
+                    errors.append(e.args)
+                    failed_ids.append(msg_num)
+                else:
+                    for column, value in zip(COLUMNS, values):
+                        columns[column].append(value)
+        # The parsed messages are dropped so the memory doesn't grow with the page
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+    return columns, errors, last_id, failed_ids
+
+
+def export_pages(export_dir: str) -> List[str]:
+    """messages.html, messages2.html, ... in the order of the export"""
+    pages = []
+    for name in os.listdir(export_dir):
+        match = PAGE_PATTERN.search(name)
+        if match is not None:
+            pages.append((int(match.group(1) or 1), os.path.join(export_dir, name)))
+    return [path for _, path in sorted(pages)]
+
+
+def load_state(state_file: str) -> Tuple[int, List[int]]:
+    """The last parsed message id and the ids of the messages that failed, to be parsed again"""
+    if not os.path.isfile(state_file):
+        return 0, []
+    with open(state_file, "r") as h:
+        state = json.load(h)
+    return state.get("last_id", 0), state.get("failed_ids", [])
+
+
+def save_state(state_file: str, last_id: int, failed_ids: List[int]):
+    with open(state_file + ".tmp", "w") as h:
+        json.dump({"last_id": last_id, "failed_ids": sorted(failed_ids)}, h)
+    os.replace(state_file + ".tmp", state_file)
+
+
+def parse_export(export_dir: str, after_id: int = 0, retry_ids: Iterable[int] = (), workers: Optional[int] = None) \
+-> Tuple[DataFrame, list, int, List[int]]:
+    """Parses the pages of an export in parallel processes and builds the DataFrame once. Only the messages
+    after 'after_id' and the ones of 'retry_ids' are read. Returns the last message id and the ids that failed
+    too, to be saved once the messages are stored"""
+    pages = export_pages(export_dir)
+    columns: Dict[str, list] = {column: [] for column in COLUMNS}
+    errors = []
+    failed_ids = []
+    last_id = after_id
+    retry = frozenset(retry_ids)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for page_columns, page_errors, page_last_id, page_failed_ids in \
+                executor.map(parse_page, pages, [after_id] * len(pages), [retry] * len(pages)):
+            for column in COLUMNS:
+                columns[column].extend(page_columns[column])
+            errors.extend(page_errors)
+            failed_ids.extend(page_failed_ids)
+            last_id = max(last_id, page_last_id)
+    return DataFrame(columns, columns=COLUMNS), errors, last_id, failed_ids
+
+
 if __name__ == "__main__":
-    pass
-    # Crawler.shutdown()
-    # run(driver)
+    parser = ArgumentParser(description="Parses the feedback messages of a Telegram chat export")
+    parser.add_argument("export_dir", nargs="?", default="ChatExport_19_08_2021")
+    parser.add_argument("--output", default=DATASET_DIR, help="Parquet dataset the new messages are appended to")
+    parser.add_argument("--state", default=STATE_FILE, help="File of the last parsed message id and the failed ones")
+    parser.add_argument("--full", action="store_true", help="Parse every message, ignoring the last parsed id")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    after_id, retry_ids = (0, []) if args.full else load_state(args.state)
+    df, errors, last_id, failed_ids = parse_export(args.export_dir, after_id=after_id, retry_ids=retry_ids,
+                                                   workers=args.workers)
+    written = write_dataset(df, args.output, append=not args.full)
+    # Saved only now, a failed write is parsed again by the next run
+    save_state(args.state, last_id, failed_ids)
+    print(f"{len(df)} messages, {written} new, {len(errors)} errors")
@@ -1,26 +1,123 @@
 import os
-import shutil
 import json
-from typing import Optional
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Optional
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 DEFUALT_LOGO = ""
+BASE_URL = "https://media.jobguy.work"
+CHECKPOINT_FILE = "scrap_images_checkpoint.json"
+WORKERS = 16
+PER_HOST = 8 # Concurrent requests per host
+CHECKPOINT_EVERY = 50 # Downloads between two writes of the checkpoint
+TIMEOUT = 30
 
 
-def get_image(url, file_name):
+def make_session(pool_size: int = WORKERS, retries: int = 3) -> requests.Session:
+    """A session whose connections are reused by all the threads. Failed requests are retried with an
+    exponential backoff (0.5s, 1s, 2s, ...)"""
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["HEAD", "GET"], respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Checkpoint():
+    """The downloaded files with their size and ETag, so a restarted run skips them without a request"""
+
+    def __init__(self, path: str = CHECKPOINT_FILE) -> None:
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        self.__lock = Lock()
+        self.__unsaved = 0
+        if os.path.isfile(path):
+            with open(path, "r") as h:
+                self.files = json.load(h)
+
+    def get(self, file_name: str) -> Optional[dict]:
+        with self.__lock:
+            return self.files.get(file_name)
+
+    def done(self, file_name: str, size: int, etag: Optional[str]):
+        with self.__lock:
+            self.files[file_name] = {"size": size, "etag": etag}
+            self.__unsaved += 1
+            if self.__unsaved >= CHECKPOINT_EVERY:
+                self.__save()
+
+    def save(self):
+        with self.__lock:
+            self.__save()
+
+    def __save(self):
+        # Written to a temporary file first, so a crash never leaves a broken checkpoint
+        with open(self.path + ".tmp", "w") as h:
+            json.dump(self.files, h)
+        os.replace(self.path + ".tmp", self.path)
+        self.__unsaved = 0
+
+
+host_slots: Dict[str, BoundedSemaphore] = {}
+host_slots_lock = Lock()
+
+
+def host_slot(url: str, per_host: int = PER_HOST) -> BoundedSemaphore:
+    host = urlparse(url).netloc
+    with host_slots_lock:
+        if host not in host_slots:
+            host_slots[host] = BoundedSemaphore(per_host)
+        return host_slots[host]
+
+
+def get_image(url, file_name, session: Optional[requests.Session] = None, checkpoint: Optional[Checkpoint] = None,
+refresh: bool = False) -> str:
+    """Downloads the image unless the file on disk is already the same. Files of the checkpoint are skipped
+    without a request, or revalidated with their ETag when 'refresh' is set. Returns 'downloaded' or 'skipped'"""
     # url = "https://media.jobguy.work/company/22/d06e6600-4091-11e9-803e-b5a47c44fbbb.jpg"
-    res = requests.get(url, stream=True)
-    if res.status_code == 200:
-        with open(file_name, "wb") as h:
-            res.raw.decode_content = True
-            shutil.copyfileobj(res.raw, h)
-    else:
-        raise Exception('request_failed')
+    session = requests.Session() if session is None else session
+    saved = checkpoint.get(file_name) if checkpoint is not None else None
+    size = os.path.getsize(file_name) if os.path.isfile(file_name) else None
+    is_saved = saved is not None and saved["size"] == size
+    if is_saved and not (refresh and saved.get("etag")): # type: ignore # saved is not None here
+        return 'skipped'
+    headers = {}
+    with host_slot(url):
+        if is_saved:
+            headers["If-None-Match"] = saved["etag"] # type: ignore # saved is not None here
+        elif size is not None and saved is None:
+            # Downloaded before the checkpoint existed, it is the same if the sizes match
+            head = session.head(url, timeout=TIMEOUT, allow_redirects=True)
+            if head.status_code == 200 and head.headers.get("Content-Length") == str(size):
+                if checkpoint is not None:
+                    checkpoint.done(file_name, size, head.headers.get("ETag"))
+                return 'skipped'
+        # Streamed responses hold their connection until closed, the unread ones too
+        with session.get(url, stream=True, timeout=TIMEOUT, headers=headers) as res:
+            if res.status_code == 304 and is_saved:
+                return 'skipped'
+            if res.status_code != 200:
+                raise Exception('request_failed')
+            # A partial download never replaces a complete file
+            with open(file_name + ".part", "wb") as h:
+                for chunk in res.iter_content(chunk_size=64 * 1024):
+                    h.write(chunk)
+    os.replace(file_name + ".part", file_name)
+    if checkpoint is not None:
+        checkpoint.done(file_name, os.path.getsize(file_name), res.headers.get("ETag"))
+    return 'downloaded'
 
 
 def get_all_subdirs(path: str = "companies"):
-    return os.listdir(path)
+    return sorted(os.listdir(path))
 
 
 def get_image_links(path="companies/cafebazaar"):
@@ -57,32 +154,56 @@ def exists_or_none(url: Optional[str]):
         return url
 
 
-def run(start=0):
-    base_url = "https://media.jobguy.work"
-    sub_dirs = get_all_subdirs("companies")[start:-1]
+def run(start=0, path="companies", base_url=BASE_URL, workers=WORKERS, checkpoint_file=CHECKPOINT_FILE, refresh=False):
+    sub_dirs = get_all_subdirs(path)[start:]
     errors = {}
-    subdirs_number = len(sub_dirs)
-    for key, sub_dir in enumerate(sub_dirs):
-        print(f"Getting {sub_dir} ({key + 1} of {subdirs_number})")
+    jobs = {} # (sub_dir, name) -> (url, file_name)
+    for sub_dir in sub_dirs:
         try:
-            links = get_image_links(f"companies/{sub_dir}")
+            links = get_image_links(f"{path}/{sub_dir}")
         except Exception as e:
             message = e.args[0]
-            print(f"Error: {message}")
-            errors["sub_dir"] = message
+            print(f"Error: {sub_dir}: {message}")
+            errors[sub_dir] = message
             continue
-        error = {}
         for name, url in links.items():
-            if url is None:
-                continue
-            try:
-                get_image(url=base_url + url, file_name=f"companies/{sub_dir}/{name}.jpg")
-            except Exception as e:
-                message = e.args[0]
-                print(f"Error: {message}")
-                error[name] = message
-        if len(error) > 0:
-            errors[sub_dir] = error
+            if url is not None:
+                jobs[(sub_dir, name)] = (base_url + url, f"{path}/{sub_dir}/{name}.jpg")
+
+    session = make_session(pool_size=workers)
+    checkpoint = Checkpoint(checkpoint_file)
+    results = {'downloaded': 0, 'skipped': 0, 'failed': 0}
+    print(f"{len(jobs)} images in {len(sub_dirs)} companies")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(get_image, url, file_name, session, checkpoint, refresh): key
+            for key, (url, file_name) in jobs.items()}
+            for done, future in enumerate(as_completed(futures)):
+                sub_dir, name = futures[future]
+                try:
+                    results[future.result()] += 1
+                except Exception as e:
+                    message = e.args[0] if len(e.args) > 0 else str(e)
+                    errors.setdefault(sub_dir, {})[name] = str(message)
+                    results['failed'] += 1
+                if (done + 1) % 100 == 0:
+                    print(f"{done + 1} of {len(jobs)}: {results}")
+    finally:
+        checkpoint.save()
+    print(results)
     with open("output.json", "w+") as h:
         json.dump(errors, h)
     return errors
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Downloads the logos, covers and galleries of the scraped companies")
+    parser.add_argument("path", nargs="?", default="companies")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--refresh", action="store_true", help="Revalidate the downloaded images with their ETags")
+    args = parser.parse_args()
+    run(start=args.start, path=args.path, base_url=args.base_url, workers=args.workers, checkpoint_file=args.checkpoint,
+    refresh=args.refresh)
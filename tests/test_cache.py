@@ -0,0 +1,68 @@
+import fakeredis
+import pytest
+
+from util.cache import ReadThroughCache
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis(server):
+    return fakeredis.FakeRedis(server=server)
+
+
+class Loader():
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+
+def test_read_through(redis):
+    cache = ReadThroughCache("test_company", ttl=60, redis=redis)
+    loader = Loader()
+    assert cache.get_or_load(1, loader) == {"calls": 1}
+    assert cache.get_or_load(1, loader) == {"calls": 1}
+    assert cache.get_or_load(2, loader) == {"calls": 2}
+    assert loader.calls == 2
+    assert 0 < redis.ttl("cache:v1:test_company:1") <= 60
+
+
+def test_invalidate_deletes_the_entity(redis):
+    cache = ReadThroughCache("test_company", ttl=60, redis=redis)
+    loader = Loader()
+    cache.get_or_load(1, loader)
+    cache.invalidate(1)
+    assert cache.get_or_load(1, loader) == {"calls": 2}
+
+
+def test_invalidate_moves_the_pages_to_a_new_generation(redis):
+    cache = ReadThroughCache("test_feedbacks", ttl=60, pages=True, redis=redis)
+    loader = Loader()
+    cache.get_or_load(1, loader, page="a")
+    cache.get_or_load(1, loader, page="b")
+    cache.get_or_load(2, loader, page="a")
+    assert loader.calls == 3
+    cache.invalidate(1)
+    assert redis.get("cache:v1:test_feedbacks:1:generation") == b"1"
+    assert cache.get_or_load(1, loader, page="a") == {"calls": 4}
+    assert cache.get_or_load(1, loader, page="b") == {"calls": 5}
+    assert cache.get_or_load(2, loader, page="a") == {"calls": 3} # Other entities keep their pages
+
+
+def test_redis_down_falls_back_to_the_loader(server, redis):
+    cache = ReadThroughCache("test_down", ttl=60, pages=True, redis=redis)
+    loader = Loader()
+    cache.get_or_load(1, loader)
+    server.connected = False
+    assert cache.get_or_load(1, loader) == {"calls": 2}
+    assert cache.get_or_load(1, loader) == {"calls": 3}
+    cache.invalidate(1) # Doesn't raise
+    assert cache.stats()["error"] >= 3
+    server.connected = True
+    assert cache.get_or_load(1, loader) == {"calls": 1} # The entry of before the outage
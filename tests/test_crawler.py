@@ -0,0 +1,112 @@
+import json
+import os
+
+from crawler import LOADED_CLASS, HttpFetcher, Ledger, ParallelCrawler
+from page_store import PageStore
+
+
+def page(page_id: int) -> str:
+    return f"<html><body><a class='{LOADED_CLASS}' href='/'>jobguy</a><p>feedback {page_id}</p></body></html>"
+
+
+def make_crawler(http_server, tmp_path, **kwargs) -> ParallelCrawler:
+    options = {'workers': 2, 'min_delay': 0, 'max_delay': 0, 'backoff': 0.01, **kwargs}
+    return ParallelCrawler(url=http_server.url + "/{id}", out_dir=str(tmp_path / "interviews"),
+    fetcher_factory=HttpFetcher, **options)
+
+
+def read_ledger(tmp_path):
+    with open(tmp_path / "interviews_ledger.jsonl") as h:
+        return [json.loads(line) for line in h]
+
+
+def test_pages_are_written_atomically(http_server, tmp_path):
+    for i in range(1, 6):
+        http_server.route(f"/{i}", (200, {}, page(i)))
+    assert make_crawler(http_server, tmp_path).run(1, 5) == {'done': 5}
+    assert sorted(os.listdir(tmp_path / "interviews")) == [f"{i}.html" for i in range(1, 6)]
+    with open(tmp_path / "interviews" / "3.html", encoding="utf-8") as h:
+        assert h.read() == page(3)
+
+
+def test_pages_go_to_the_store(http_server, tmp_path):
+    http_server.route("/1", (200, {}, page(1)))
+    store = PageStore(str(tmp_path / "interviews_store"))
+    assert make_crawler(http_server, tmp_path, store=store).run(1, 1) == {'done': 1}
+    assert store.get(1) == page(1)
+    assert os.listdir(tmp_path / "interviews") == []
+    store.close()
+
+
+def test_missing_pages_are_not_retried(http_server, tmp_path):
+    http_server.route("/1", (404, {}, "not found"))
+    assert make_crawler(http_server, tmp_path).run(1, 1) == {'missing': 1}
+    assert http_server.hits("/1") == 1
+
+
+def test_failed_pages_are_retried_up_to_max_attempts(http_server, tmp_path):
+    http_server.route("/1", (500, {}, "error"))
+    http_server.route("/2", (500, {}, "error"), (200, {}, page(2)))
+    assert make_crawler(http_server, tmp_path, max_attempts=3).run(1, 2) == {'failed': 1, 'done': 1}
+    assert http_server.hits("/1") == 3
+    assert http_server.hits("/2") == 2
+
+
+def test_fetch_errors_are_logged(tmp_path, capsys):
+    class BrokenFetcher():
+        def fetch(self, url):
+            raise ConnectionError("connection refused")
+
+        def close(self):
+            pass
+
+    crawler = ParallelCrawler(url="http://localhost/{id}", out_dir=str(tmp_path / "interviews"),
+    fetcher_factory=BrokenFetcher, workers=1, min_delay=0, max_delay=0, max_attempts=2)
+    assert crawler.run(1, 1) == {'failed': 1}
+    err = capsys.readouterr().err
+    assert err.count("ConnectionError: connection refused") == 2
+
+
+def test_crawl_resumes_from_the_ledger(http_server, tmp_path):
+    ledger = Ledger(str(tmp_path / "interviews_ledger.jsonl"))
+    ledger.record(1, 'done')
+    ledger.record(2, 'missing')
+    ledger.record(3, 'failed')
+    ledger.close()
+    with open(tmp_path / "interviews_ledger.jsonl", "a") as h:
+        h.write('{"id": 4, "sta') # Cut by a crash
+    for i in range(1, 6):
+        http_server.route(f"/{i}", (200, {}, page(i)))
+
+    assert make_crawler(http_server, tmp_path).run(1, 5) == {'done': 3, 'missing': 1, 'failed': 1}
+    assert [path for _, path, _ in http_server.requests] in (["/4", "/5"], ["/5", "/4"])
+
+    http_server.requests.clear()
+    assert make_crawler(http_server, tmp_path).run(1, 5, retry_failed=True) == {'done': 4, 'missing': 1}
+    assert [path for _, path, _ in http_server.requests] == ["/3"]
+
+
+def test_blocked_page_is_retried_after_a_backoff(http_server, tmp_path):
+    http_server.route("/1", (429, {}, "slow down"), (200, {}, "Our systems have detected"), (200, {}, page(1)))
+    assert make_crawler(http_server, tmp_path, workers=1).run(1, 1) == {'done': 1}
+    assert http_server.hits("/1") == 3
+    assert read_ledger(tmp_path) == [{"id": 1, "status": "done"}]
+
+
+def test_crawl_stops_after_max_blocked(http_server, tmp_path):
+    for i in range(1, 4):
+        http_server.route(f"/{i}", (429, {}, "slow down"))
+    assert make_crawler(http_server, tmp_path, workers=1, max_blocked=2).run(1, 3) == {'pending': 3}
+    assert len(http_server.requests) == 3
+    assert read_ledger(tmp_path) == []
+
+
+def test_block_backs_off_all_the_workers(http_server, tmp_path):
+    http_server.delay = 0.1
+    http_server.route("/1", (429, {}, "slow down"), (200, {}, page(1)))
+    for i in range(2, 5):
+        http_server.route(f"/{i}", (200, {}, page(i)))
+    assert make_crawler(http_server, tmp_path, backoff=0.5).run(1, 4) == {'done': 4}
+    assert http_server.hits("/1") == 2
+    # The two first requests were sent together, the block of the first one holds back the other worker too
+    assert http_server.times[2] - http_server.times[0] >= 0.5
@@ -0,0 +1,26 @@
+import atexit
+import os
+
+import numpy as np
+
+import main
+from main import check_existence
+from page_store import PageStore
+
+atexit.unregister(main.shutdown) # No driver is started by the tests
+
+
+def test_crawled_pages_are_read_from_the_store_and_the_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = PageStore("interviews_store")
+    store.put(2, "<html>2</html>")
+    store.put(3, "<html>3</html>")
+    store.close()
+    os.makedirs("interviews")
+    open("interviews/5.html", "w").close()
+    index = {"interview": (np.array([1, 2, 5, 6]), 4)}
+
+    result = check_existence("interview", start=1, end=6, channel_start=3, index=index)
+    assert result['existing_files'] == [2, 3, 5]
+    assert result['missing_files'] == [1, 6]
+    assert result['missing_in_df'] == [3]
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from models.main_models import FeedbackType, InterviewResult
+from util.feedback_import import IMPORT_STATUS, FeedbackImportReport, PageRecord, check_page_fields, \
+    normalize_company_name, parse_page, payload, validate_records
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "jobguy_interview.html")
+
+
+@pytest.fixture
+def record() -> PageRecord:
+    with open(FIXTURE, "r", encoding="utf-8") as h:
+        return parse_page(("interview", 284, h.read(), "hash"))
+
+
+def test_parse_page_reads_the_fields(record):
+    assert record.error is None
+    assert record.fields['company'] == "شرکت کافه بازار"
+    assert record.fields['title'] == "مصاحبه برنامه نویس"
+    assert record.fields['body'].startswith("دو جلسه مصاحبه داشتم")
+    assert "\n" not in record.fields['body']
+
+
+def test_payload_converts_the_persian_values(record):
+    assert payload(record, 7, None) == {
+        'title': "مصاحبه برنامه نویس",
+        'body': record.fields['body'],
+        'job_title': "برنامه نویس بک اند",
+        'score': 8,
+        'salary': 18.0,
+        'company_id': 7,
+        'int_ts': "12-05-2021",
+        'expected_salary': 20.5,
+        'result': InterviewResult.accepted.name,
+    }
+
+
+def test_validate_records_builds_the_rows(record):
+    report = FeedbackImportReport()
+    companies = {normalize_company_name("کافه بازار"): 7}
+    rows = validate_records([record], companies, {7: {7}}, {}, user_id=1, status=IMPORT_STATUS,
+                            report=report)
+    assert report.errors == {}
+    row, = rows[FeedbackType.interview]
+    assert row['slug'] == 284
+    assert row['feedback']['company_id'] == 7
+    assert row['feedback']['score'] == 8
+    assert row['subtype']['result'] == InterviewResult.accepted
+
+
+def test_pages_without_the_fields_stop_the_import():
+    records = [parse_page(("interview", i, "<html><body><p>other layout</p></body></html>", "hash")) for i in range(3)]
+    assert [record.error for record in records] == ['no_feedback'] * 3
+    with pytest.raises(Exception, match="PAGE_FIELDS"):
+        check_page_fields(records)
+    check_page_fields(records + [PageRecord(type="interview", slug=4, page_hash="hash", fields={'body': "text"})])
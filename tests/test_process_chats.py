@@ -0,0 +1,27 @@
+from process_chats import load_state, parse_export, save_state
+
+MESSAGE = """<div class="message default clearfix" id="message{id}"><div class="body">
+<div class="pull_right date details" title="19.08.2021 12:0{id}:00">12:0{id}</div>
+<div class="text">{text}</div></div></div>"""
+LINK = "شرکت {id}، تجربه مصاحبه را در جاب‌گای بخوانید:<br>https://jobguy.work/interview/{id}"
+
+
+def write_page(path, texts):
+    messages = "".join(MESSAGE.format(id=i, text=text) for i, text in texts.items())
+    with open(path / "messages.html", "w", encoding="utf-8") as h:
+        h.write(f'<html><head><meta charset="utf-8"/></head><body><div class="history">{messages}</div></body></html>')
+
+
+def test_failed_messages_are_parsed_again(tmp_path):
+    write_page(tmp_path, {1: LINK.format(id=1), 2: "no link yet", 3: LINK.format(id=3)})
+    df, errors, last_id, failed_ids = parse_export(str(tmp_path), workers=1)
+    assert df['slug'].tolist() == ['1', '3']
+    assert len(errors) == 1
+    assert (last_id, failed_ids) == (3, [2])
+    save_state(str(tmp_path / "state.json"), last_id, failed_ids)
+
+    write_page(tmp_path, {1: LINK.format(id=1), 2: LINK.format(id=2), 3: LINK.format(id=3), 4: LINK.format(id=4)})
+    after_id, retry_ids = load_state(str(tmp_path / "state.json"))
+    df, errors, last_id, failed_ids = parse_export(str(tmp_path), after_id=after_id, retry_ids=retry_ids, workers=1)
+    assert df['slug'].tolist() == ['2', '4']
+    assert (errors, last_id, failed_ids) == ([], 4, [])
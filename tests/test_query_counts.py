@@ -0,0 +1,54 @@
+"""Number of SQL statements per feedback endpoint. A page of N feedbacks must cost the same number of queries
+for every N, otherwise a relationship is lazy loaded per row. The loaders are called directly, so the cache
+of the endpoints does not hide the queries.
+
+Needs the seeded database of the test config (see util.seeding), the tests are skipped without one."""
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from wsgi import FlaskApp
+from controllers.company import get_company, query_company_feedback_info
+from controllers.stats import company_feedback_stats
+from models.main_models import Company, FeedbackType
+from util.db_operations import assert_max_queries
+from util.pagination import MAX_PAGE_SIZE
+
+COMPANIES = 10
+PAGE_SIZES = [1, 10, MAX_PAGE_SIZE]
+# (name, budget, loader of a company and a page size)
+ENDPOINTS = [
+    ("feedback page", 2, lambda company_id, limit: query_company_feedback_info(company_id=company_id, limit=limit)),
+    ("review page", 2, lambda company_id, limit: query_company_feedback_info(company_id=company_id,
+    feedback_type=FeedbackType.review, limit=limit)),
+    ("interview page", 2, lambda company_id, limit: query_company_feedback_info(company_id=company_id,
+    feedback_type=FeedbackType.interview, limit=limit)),
+    ("single feedback", 1, lambda company_id, limit: query_company_feedback_info(company_id=company_id, offset=1)),
+    ("company profile", 2, lambda company_id, limit: {**get_company(company_id).to_dict(),
+    'feedback_stats': company_feedback_stats(company_id)}),
+]
+
+
+@pytest.fixture(scope="module")
+def session():
+    with FlaskApp.instance().app_context():
+        session = FlaskApp.db_session()
+        try:
+            companies = session.query(func.count(Company.id)).scalar()
+        except SQLAlchemyError:
+            session.remove()
+            pytest.skip("No database to count the queries against")
+        if companies < COMPANIES:
+            session.remove()
+            pytest.skip(f"The database is not seeded, it has {companies} of the {COMPANIES} companies")
+        yield session
+        session.remove()
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+@pytest.mark.parametrize("name, budget, loader", ENDPOINTS, ids=[name for name, _, _ in ENDPOINTS])
+def test_query_budget(session, name, budget, loader, limit):
+    for company_id in range(1, COMPANIES + 1):
+        session.expunge_all() # Nothing may come from the identity map of a previous call
+        with assert_max_queries(session, budget):
+            loader(company_id, limit)
@@ -0,0 +1,121 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from scrap_images import PER_HOST, Checkpoint, get_image, make_session, run
+
+IMAGE = b"\xff\xd8 not really a jpeg \xff\xd9"
+
+
+def test_failed_requests_are_retried(http_server, tmp_path):
+    http_server.route("/a.jpg", (500, {}, b""), (503, {}, b""), (200, {"ETag": '"a"'}, IMAGE))
+    file_name = str(tmp_path / "a.jpg")
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    assert get_image(http_server.url + "/a.jpg", file_name, make_session(), checkpoint) == 'downloaded'
+    assert http_server.hits("/a.jpg") == 3
+    with open(file_name, "rb") as h:
+        assert h.read() == IMAGE
+    assert checkpoint.get(file_name) == {"size": len(IMAGE), "etag": '"a"'}
+    assert not os.path.exists(file_name + ".part")
+
+
+def test_failed_download_keeps_the_old_file(http_server, tmp_path):
+    http_server.route("/a.jpg", (404, {}, b"missing"))
+    file_name = str(tmp_path / "a.jpg")
+    with open(file_name, "wb") as h:
+        h.write(b"old")
+    try:
+        get_image(http_server.url + "/a.jpg", file_name, make_session())
+        assert False, "a 404 must fail"
+    except Exception as e:
+        assert e.args[0] == 'request_failed'
+    with open(file_name, "rb") as h:
+        assert h.read() == b"old"
+
+
+def test_requests_per_host_are_limited(http_server, tmp_path):
+    http_server.delay = 0.05
+    for i in range(PER_HOST * 3):
+        http_server.route(f"/{i}.jpg", (200, {}, IMAGE))
+    session = make_session(pool_size=PER_HOST * 2)
+    with ThreadPoolExecutor(max_workers=PER_HOST * 2) as executor:
+        results = list(executor.map(lambda i: get_image(f"{http_server.url}/{i}.jpg", str(tmp_path / f"{i}.jpg"),
+        session), range(PER_HOST * 3)))
+    assert results == ['downloaded'] * PER_HOST * 3
+    assert 1 < http_server.max_active <= PER_HOST
+
+
+def test_checkpointed_file_is_skipped_without_a_request(http_server, tmp_path):
+    file_name = str(tmp_path / "a.jpg")
+    with open(file_name, "wb") as h:
+        h.write(IMAGE)
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.done(file_name, len(IMAGE), '"a"')
+    assert get_image(http_server.url + "/a.jpg", file_name, make_session(), checkpoint) == 'skipped'
+    assert http_server.requests == []
+
+
+def test_changed_size_is_downloaded_again(http_server, tmp_path):
+    http_server.route("/a.jpg", (200, {}, IMAGE))
+    file_name = str(tmp_path / "a.jpg")
+    with open(file_name, "wb") as h:
+        h.write(b"truncated")
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.done(file_name, len(IMAGE), '"a"')
+    assert get_image(http_server.url + "/a.jpg", file_name, make_session(), checkpoint) == 'downloaded'
+    with open(file_name, "rb") as h:
+        assert h.read() == IMAGE
+
+
+def test_refresh_revalidates_the_etag(http_server, tmp_path):
+    def etag_response(headers):
+        if headers.get("If-None-Match") == '"a"':
+            return 304, {"ETag": '"a"'}, b""
+        return 200, {"ETag": '"a"'}, IMAGE
+
+    http_server.route("/a.jpg", etag_response)
+    file_name = str(tmp_path / "a.jpg")
+    with open(file_name, "wb") as h:
+        h.write(IMAGE)
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.done(file_name, len(IMAGE), '"a"')
+    assert get_image(http_server.url + "/a.jpg", file_name, make_session(), checkpoint, refresh=True) == 'skipped'
+    assert http_server.hits("/a.jpg") == 1
+    checkpoint.done(file_name, len(IMAGE), '"old"')
+    assert get_image(http_server.url + "/a.jpg", file_name, make_session(), checkpoint, refresh=True) == 'downloaded'
+
+
+def test_file_without_checkpoint_is_compared_by_size(http_server, tmp_path):
+    http_server.route("/a.jpg", (200, {"Content-Length": str(len(IMAGE)), "ETag": '"a"'}, IMAGE))
+    http_server.route("/b.jpg", (200, {"Content-Length": str(len(IMAGE)), "ETag": '"b"'}, IMAGE))
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    for name in ["a", "b"]:
+        with open(tmp_path / f"{name}.jpg", "wb") as h:
+            h.write(IMAGE if name == "a" else b"other")
+    assert get_image(http_server.url + "/a.jpg", str(tmp_path / "a.jpg"), make_session(), checkpoint) == 'skipped'
+    assert http_server.hits("/a.jpg", "HEAD") == 1 and http_server.hits("/a.jpg") == 0
+    assert checkpoint.get(str(tmp_path / "a.jpg")) == {"size": len(IMAGE), "etag": '"a"'}
+    assert get_image(http_server.url + "/b.jpg", str(tmp_path / "b.jpg"), make_session(), checkpoint) == 'downloaded'
+
+
+def test_run_resumes_from_the_checkpoint(http_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for company in ["a", "b"]:
+        os.makedirs(f"companies/{company}")
+        with open(f"companies/{company}/info.json", "w") as h:
+            json.dump({"success": True, "data": {"logo": f"/{company}/logo.jpg", "cover": None,
+            "gallery": [{"path": f"/{company}/0.jpg"}]}}, h)
+        http_server.route(f"/{company}/logo.jpg", (200, {}, IMAGE))
+        http_server.route(f"/{company}/0.jpg", (200, {}, IMAGE))
+    http_server.route("/b/0.jpg", (404, {}, b""), (200, {}, IMAGE))
+
+    errors = run(base_url=http_server.url, workers=4)
+    assert errors == {"b": {"gallery_0": "request_failed"}}
+    assert not os.path.exists("companies/b/gallery_0.jpg")
+    with open("scrap_images_checkpoint.json") as h:
+        assert len(json.load(h)) == 3
+
+    http_server.requests.clear()
+    assert run(base_url=http_server.url, workers=4) == {}
+    assert [path for _, path, _ in http_server.requests] == ["/b/0.jpg"]
+    assert len(Checkpoint().files) == 4
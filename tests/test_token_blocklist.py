@@ -0,0 +1,30 @@
+import fakeredis
+import pytest
+
+from util.cache import cache_stats
+from util.token_blocklist import TokenBlocklist
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def blocklist(server):
+    return TokenBlocklist(sync_interval=60, capacity=1000, error_rate=0.01, redis=fakeredis.FakeRedis(server=server))
+
+
+def test_revoked_token_is_refused(blocklist):
+    blocklist.revoke("a", expires_at=None)
+    assert blocklist.is_revoked("a")
+    assert not blocklist.is_revoked("b")
+
+
+def test_revoke_with_redis_down_does_not_raise(server, blocklist):
+    server.connected = False
+    errors = cache_stats[("revoked", 'error')]
+    blocklist.revoke("a", expires_at=None)
+    assert cache_stats[("revoked", 'error')] > errors
+    # Only the local bloom filter knows the token, it is refused while Redis can't be asked
+    assert blocklist.is_revoked("a")
@@ -0,0 +1,46 @@
+from models.main_models import City, Company
+from util.validation import CreateCompany, DeferredChecks
+
+UNIQUE_COLUMNS = [Company.fa_name, Company.en_name, Company.email, Company.national_id, Company.website, Company.phone]
+
+
+def offline_checks() -> DeferredChecks:
+    """Resolved in memory against an empty companies table and one city"""
+    deferred = DeferredChecks(offline=True).know(City, City.id, {1: {1}})
+    for column in UNIQUE_COLUMNS:
+        deferred.know(Company, column, {})
+    return deferred
+
+
+def company(i: int, **fields) -> dict:
+    return {
+        'fa_name': "کافه بازار" + " بازار" * i,
+        'en_name': "Cafe Bazaar" + " Co" * i,
+        'email': f"info{'abc'[i]}@cafebazaar.ir",
+        'national_id': f"{10000000000 + i}",
+        'city_id': 1,
+        'website': f"cafebazaar{i}.ir",
+        'phone': f"21{1000000 + i}",
+        **fields,
+    }
+
+
+def test_fields_of_one_payload_may_share_a_unique_column():
+    payload = company(0, brand_name="کافه بازار")
+    check, = CreateCompany.check_many([payload], offline_checks())
+    assert check.error_bag == {}
+
+
+def test_values_repeated_across_payloads_fail():
+    checks = CreateCompany.check_many([company(0), company(1, email="infoa@cafebazaar.ir"), company(2)],
+                                      offline_checks())
+    assert checks[0].error_bag == {}
+    assert checks[1].error_bag == {
+        'email': {'_unique': "The value infoa@cafebazaar.ir is repeated in the column 'email' of the payloads"}}
+    assert checks[2].error_bag == {}
+
+
+def test_brand_name_repeating_the_name_of_another_payload_fails():
+    checks = CreateCompany.check_many([company(0), company(1, brand_name="کافه بازار")], offline_checks())
+    assert checks[0].error_bag == {}
+    assert list(checks[1].error_bag) == ['brand_name']
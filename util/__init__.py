@@ -1,9 +1,10 @@
 import re
 from enum import Enum
 
+CAPITALS_PATTERN = re.compile(r'(?<!^)(?=[A-Z])')
+
 def cap_to_kebab(name):
-    pattern = re.compile(r'(?<!^)(?=[A-Z])')
-    return pattern.sub('_', name).lower()
+    return CAPITALS_PATTERN.sub('_', name).lower()
 
 
 def pluralize(name:str):
@@ -1,11 +1,15 @@
 import re
 from urllib import response
-from flask import request, jsonify
+from flask import Response, current_app, request, stream_with_context
 from flask_jwt_extended import set_access_cookies, unset_access_cookies
-from typing import Callable, Literal, Optional, Type
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from typing import Callable, Iterator, Literal, Optional, Type
 from functools import wraps
+from itertools import chain, islice
 
 from .exceptions import ResponseException
+from .json_encoder import dumps, json_response
 from .validation import BaseParamsSchema
 
 
@@ -30,8 +34,33 @@ def modify_access_cookies(response, cookie_state: Literal['set','unset'], body:O
         unset_access_cookies(response[0])
     return response
 
+STREAM_CHUNK_SIZE = 200 # Rows per written chunk of a streamed response
+
+def stream_json_envelope(rows: Iterator) -> Iterator[bytes]:
+    """Writes {"msg":"OK","body":[...]} in chunks of rows. The status is already sent when a row fails, so the
+    envelope is closed with an 'error' key instead of breaking the JSON"""
+    yield b'{"msg":"OK","body":['
+    separator = b''
+    chunk = []
+    failed = False
+    try:
+        for row in rows:
+            chunk.append(dumps(row))
+            if len(chunk) == STREAM_CHUNK_SIZE:
+                yield separator + b','.join(chunk)
+                separator = b','
+                chunk = []
+    except Exception:
+        current_app.logger.exception("Streaming the response failed")
+        failed = True
+    if chunk:
+        yield separator + b','.join(chunk)
+    yield b'],"error":"internal error"}' if failed else b']}'
+
 def validate_and_json_response(validator_cls:Optional[Type[BaseParamsSchema]], 
-access_cookie:Optional[Literal['set','unset']] = None, get_params: bool = True):
+access_cookie:Optional[Literal['set','unset']] = None, get_params: bool = True, stream: bool = False):
+    """With 'stream', the controller returns an iterable of serialized rows that is written to the response
+    as it is consumed instead of being built in memory"""
     def decorator(func:Callable) -> Callable:
         @wraps(func) # we need 'wraps' to avoid the error: 'View function mapping is overwriting an existing endpoint function...'
         def val_func(**kwargs):
@@ -41,6 +70,12 @@ access_cookie:Optional[Literal['set','unset']] = None, get_params: bool = True):
             try: 
                 sanitized = validator_cls(**kwargs).validate() if validator_cls is not None else {}
                 body = func(**sanitized)
+                if stream:
+                    rows: Iterator = iter(body)
+                    # The first row runs the query, so its errors still get a proper error response
+                    first = list(islice(rows, 1))
+                    return Response(stream_with_context(stream_json_envelope(chain(first, rows))),
+                    status=200, mimetype='application/json')
                 payload = {'msg':'OK','body':body}
                 code = 200
             except ResponseException as e:
@@ -49,12 +84,18 @@ access_cookie:Optional[Literal['set','unset']] = None, get_params: bool = True):
                     'body': e.to_dict()
                 }
                 code = e.code
+            except (JWTExtendedException, PyJWTError):
+                # e.g. a revoked or expired token of a route that is not checked in the middleware
+                payload = {
+                    'msg': 'Not authorized'
+                }
+                code = 401
             except Exception as e:
                 payload = {
                     'msg': 'internal error'
                 }
                 code = 500
-            response = jsonify(payload), code
+            response = json_response(payload), code
             if access_cookie is not None:
                 return modify_access_cookies(response=response, cookie_state=access_cookie, body=body)
             return response
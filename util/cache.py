@@ -0,0 +1,128 @@
+import json
+from collections import Counter, OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Optional, Union
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from wsgi import FlaskApp
+
+# Bump when the format of the cached payloads changes, so the old entries are never read
+CACHE_VERSION = 1
+
+__stats_lock = Lock()
+cache_stats: Counter = Counter() # (namespace, 'hit' | 'miss' | 'error') -> count
+
+
+def count(namespace: str, event: str):
+    with __stats_lock:
+        cache_stats[(namespace, event)] += 1
+
+
+class ReadThroughCache():
+    """Caches JSON payloads of an entity (e.g. a company) in Redis. A cache with pages keeps many payloads
+    per entity (e.g. feedback pages) under a generation number, so invalidating the entity is a single INCR
+    no matter how many pages are cached. If Redis fails, the payload is loaded from the database"""
+
+    def __init__(self, namespace: str, ttl: int, pages: bool = False, redis: Optional[Redis] = None) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.pages = pages
+        self.__redis = redis
+
+    @property
+    def redis(self) -> Redis:
+        if self.__redis is None:
+            self.__redis = FlaskApp.get_redis()
+        return self.__redis
+
+    def __entity_key(self, entity_id: Union[int, str]) -> str:
+        return f"cache:v{CACHE_VERSION}:{self.namespace}:{entity_id}"
+
+    def __key(self, entity_id: Union[int, str], page: str) -> str:
+        if not self.pages:
+            return self.__entity_key(entity_id)
+        generation = self.redis.get(self.__entity_key(entity_id) + ":generation")
+        return f"{self.__entity_key(entity_id)}:g{int(generation or 0)}:{page}"
+
+    def get_or_load(self, entity_id: Union[int, str], loader: Callable[[], Any], page: str = "") -> Any:
+        try:
+            key = self.__key(entity_id, page)
+            cached = self.redis.get(key)
+        except RedisError:
+            count(self.namespace, 'error')
+            return loader()
+        if cached is not None:
+            count(self.namespace, 'hit')
+            return json.loads(cached)
+        count(self.namespace, 'miss')
+        value = loader()
+        try:
+            self.redis.set(key, json.dumps(value), ex=self.ttl)
+        except RedisError:
+            count(self.namespace, 'error')
+        return value
+
+    def invalidate(self, entity_id: Union[int, str]):
+        key = self.__entity_key(entity_id)
+        try:
+            if self.pages:
+                # The pages of the old generation are left to expire
+                self.redis.incr(key + ":generation")
+            else:
+                self.redis.delete(key)
+        except RedisError:
+            count(self.namespace, 'error')
+
+    def stats(self) -> dict:
+        return {event: cache_stats[(self.namespace, event)] for event in ['hit', 'miss', 'error']}
+
+
+class MemoryTTLCache():
+    """In-process LRU version of ReadThroughCache for small, hot payloads (e.g. the users of the tokens).
+    It is per worker, so invalidating it only reaches the current process and the short TTL bounds how long
+    the other workers may serve a stale payload"""
+
+    def __init__(self, namespace: str, ttl: int, max_size: int = 10000) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_size = max_size
+        self.__entries: OrderedDict = OrderedDict() # entity_id -> (expires_at, value)
+        self.__lock = Lock()
+
+    def get_or_load(self, entity_id: Union[int, str], loader: Callable[[], Any], page: str = "") -> Any:
+        key = (entity_id, page)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self.__entries.move_to_end(key)
+                count(self.namespace, 'hit')
+                return entry[1]
+        count(self.namespace, 'miss')
+        value = loader()
+        with self.__lock:
+            self.__entries[key] = (monotonic() + self.ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+        return value
+
+    def invalidate(self, entity_id: Union[int, str]):
+        with self.__lock:
+            for key in [key for key in self.__entries if key[0] == entity_id]:
+                del self.__entries[key]
+
+    def stats(self) -> dict:
+        return {event: cache_stats[(self.namespace, event)] for event in ['hit', 'miss', 'error']}
+
+
+config = FlaskApp.instance().config
+company_cache = ReadThroughCache("company", ttl=config['CACHE_TTL_COMPANY'])
+company_feedbacks_cache = ReadThroughCache("company_feedbacks", ttl=config['CACHE_TTL_FEEDBACKS'], pages=True)
+user_cache: Optional[Union[ReadThroughCache, MemoryTTLCache]] = None
+if config['USER_CACHE'] == 'redis':
+    user_cache = ReadThroughCache("user", ttl=config['USER_CACHE_TTL'])
+elif config['USER_CACHE'] == 'memory':
+    user_cache = MemoryTTLCache("user", ttl=config['USER_CACHE_TTL'], max_size=config['USER_CACHE_SIZE'])
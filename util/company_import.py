@@ -0,0 +1,176 @@
+import json
+import os
+from argparse import ArgumentParser
+from dataclasses import dataclass, field
+from itertools import islice
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+from wsgi import FlaskApp
+from models.main_models import City, Company
+from models.schema import CompanyMainImport, CompanyInfoImport
+from .db_operations import safe_commit
+from .validation import create_dir_name, remove_bad_persian_letters
+
+session = FlaskApp.db_session()
+
+# Keys of the scraped 'data' object that are named differently from the fields of the import schemas
+KEY_ALIASES: Dict[str, str] = {}
+
+
+@dataclass
+class CompanyRecord():
+    dir_name: str
+    main: dict = field(default_factory=dict)
+    info: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class ImportReport():
+    read: int = 0
+    inserted: int = 0
+    skipped: int = 0 # Valid records that already exist in the table
+    errors: Dict[str, dict] = field(default_factory=dict)
+    seconds: float = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds > 0 else 0
+
+    def __str__(self) -> str:
+        return f"read: {self.read}, inserted: {self.inserted}, skipped: {self.skipped}, errors: {len(self.errors)}"\
+            f" in {self.seconds:.2f}s ({self.rows_per_second:.0f} rows/s)"
+
+
+def __payload(data: dict, schema) -> dict:
+    payload = {}
+    for plan in schema.compile():
+        value = data.get(KEY_ALIASES.get(plan.name, plan.name))
+        if value is not None:
+            payload[plan.name] = value
+    return payload
+
+
+def iter_company_records(path: str = "companies") -> Iterator[CompanyRecord]:
+    """Lazily reads the info.json of every company directory in 'path'"""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            record = CompanyRecord(dir_name=entry.name)
+            try:
+                with open(os.path.join(entry.path, "info.json"), "r") as h:
+                    info = json.load(h)
+            except (OSError, ValueError):
+                record.error = 'no_file'
+                yield record
+                continue
+            data = info.get("data")
+            if not info.get("success") or type(data) != dict:
+                record.error = 'unsuccessful_request'
+                yield record
+                continue
+            record.main = __payload(data, CompanyMainImport)
+            record.info = {**__payload(data, CompanyInfoImport), "dirname": create_dir_name(entry.name)}
+            yield record
+
+
+def city_index() -> Dict[str, int]:
+    """Maps the normalized persian name of the cities to their id. The first city wins for repeated names"""
+    index: Dict[str, int] = {}
+    for fa_name, city_id in session.query(City.fa_name, City.id).order_by(City.id):
+        index.setdefault(remove_bad_persian_letters(fa_name).strip(), city_id)
+    return index
+
+
+def validate_records(records: List[CompanyRecord], cities: Dict[str, int], industry_id: int,
+default_city_id: Optional[int], report: ImportReport) -> List[dict]:
+    """Validates a batch of records and returns the rows of the valid ones. Invalid optional fields are
+    dropped from the row but are still reported"""
+    mains = CompanyMainImport.check_many(record.main for record in records)
+    infos = CompanyInfoImport.check_many(record.info for record in records)
+    rows = []
+    for record, main, info in zip(records, mains, infos):
+        errors = {**main.error_bag, **{f"info.{key}": value for key, value in info.error_bag.items()}}
+        city_id = default_city_id
+        city_slug = main.sanitized.get('city_slug')
+        if city_slug is not None:
+            city_id = cities.get(city_slug.strip(), default_city_id)
+        if city_id is None:
+            errors['city_slug'] = {"_has_city": f"No city found for {city_slug}"}
+        if len(errors) > 0:
+            report.errors[record.dir_name] = errors
+        if not main.only_optional_errors_exist or not info.only_optional_errors_exist or city_id is None:
+            continue
+        sanitized_info = dict(info.sanitized)
+        rows.append({
+            'fa_name': main.sanitized['fa_name'],
+            'en_name': main.sanitized['en_name'],
+            'phone': main.sanitized.get('phone'),
+            'website': main.sanitized.get('website'),
+            'dirname': sanitized_info.pop('dirname'),
+            'city_id': city_id,
+            'industry_id': main.sanitized.get('industy_id', industry_id),
+            'info': sanitized_info,
+        })
+    return rows
+
+
+def insert_rows(rows: List[dict], chunk_size: int) -> int:
+    """Writes the rows with multi-row INSERT ... ON CONFLICT DO NOTHING statements and returns the number of
+    inserted rows"""
+    inserted = 0
+    for i in range(0, len(rows), chunk_size):
+        statement = insert(Company.__table__).values(rows[i:i + chunk_size]).on_conflict_do_nothing()\
+            .returning(Company.__table__.c.id)
+        inserted += len(session.execute(statement).fetchall())
+    safe_commit(session=session)
+    return inserted
+
+
+def batches(records: Iterable[CompanyRecord], batch_size: int) -> Iterator[List[CompanyRecord]]:
+    iterator = iter(records)
+    batch = list(islice(iterator, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batch_size))
+
+
+def run(path: str = "companies", batch_size: int = 2000, chunk_size: int = 500, industry_id: int = 1,
+default_city_id: Optional[int] = None) -> ImportReport:
+    report = ImportReport()
+    start = perf_counter()
+    cities = city_index()
+    for batch in batches(iter_company_records(path), batch_size):
+        report.read += len(batch)
+        valid = []
+        for record in batch:
+            if record.error is not None:
+                report.errors[record.dir_name] = {"_file": record.error}
+            else:
+                valid.append(record)
+        rows = validate_records(valid, cities, industry_id, default_city_id, report)
+        inserted = insert_rows(rows, chunk_size) if len(rows) > 0 else 0
+        report.inserted += inserted
+        report.skipped += len(rows) - inserted
+        report.seconds = perf_counter() - start
+        print(report)
+    report.seconds = perf_counter() - start
+    return report
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Imports the scraped companies/*/info.json files into the companies table")
+    parser.add_argument("path", nargs="?", default="companies")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--industry-id", type=int, default=1)
+    parser.add_argument("--default-city-id", type=int, default=None)
+    args = parser.parse_args()
+    report = run(path=args.path, batch_size=args.batch_size, chunk_size=args.chunk_size,
+    industry_id=args.industry_id, default_city_id=args.default_city_id)
+    with open("import_errors.json", "w+") as h:
+        json.dump(report.errors, h, ensure_ascii=False)
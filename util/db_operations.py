@@ -1,5 +1,7 @@
-from typing import Callable, List, Union
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Union
 from psycopg2.errors import InFailedSqlTransaction
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from models.base_model import Base
 
@@ -41,4 +43,26 @@ def remove_from_db_dec(session:Session):
             session.delete(model)
             safe_commit(session)
         return del_and_commit
-    return decorator
\ No newline at end of file
+    return decorator
+
+@contextmanager
+def count_queries(session:Session) -> Iterator[List[str]]:
+    """Collects the SQL statements that are sent through the engine of the session inside the block"""
+    statements: List[str] = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@contextmanager
+def assert_max_queries(session:Session, max_queries:int) -> Iterator[List[str]]:
+    """Fails if the block sends more than 'max_queries' statements, e.g. when a relationship is lazy loaded per row"""
+    with count_queries(session) as statements:
+        yield statements
+    if len(statements) > max_queries:
+        raise AssertionError(f"{len(statements)} queries were emitted, expected at most {max_queries}:\n"
+            + "\n".join(statements))
@@ -26,6 +26,11 @@ class ResponseException(BaseException):
 
 
 
+class Overloaded(ResponseException):
+    def __init__(self, message="Server is busy, please try again later") -> None:
+        super().__init__(code=503, message=message, error="Overloaded")
+
+
 class ValidationException(ResponseException):
     error_bag: Optional[dict]
 
@@ -71,3 +76,9 @@ class NotAuthorized(MiddlewareException):
     def __init__(self, message="Not Authorized") -> None:
         super().__init__(message=message)
 
+class TooManyRequests(MiddlewareException):
+    retry_after: int
+
+    def __init__(self, retry_after: int, message="Too many attempts, please try again later") -> None:
+        self.retry_after = retry_after
+        super().__init__(code=429, message=message, error="Too many requests")
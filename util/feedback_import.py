@@ -0,0 +1,424 @@
+import hashlib
+import json
+import os
+import re
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from queue import Queue
+from threading import Thread
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Type
+
+from lxml import etree, html
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from wsgi import FlaskApp
+from controllers.stats import COUNTED_STATUSES
+from models.main_models import Company, Feedback, FeedbackStatus, FeedbackType, Interview, InterviewResult, Review
+from services.dataset import DATASET_DIR, read_dataset
+from services.page_store import PageStore
+from .company_import import ImportReport, batches
+from .db_operations import safe_commit
+from .validation import BaseParamsSchema, DeferredChecks, RegisterInterview, RegisterReview, \
+    remove_bad_persian_letters, remove_inside_parantheses
+
+session = FlaskApp.db_session()
+
+SOURCE = "jobguy"
+# The feedbacks are all added by one importing user. Only one of them per company and type could be 'show' or
+# 'waiting' (the 'unique_shown_feedback' index), so they are imported with a status outside of it
+IMPORT_STATUS = FeedbackStatus.hidden
+DATE_FORMAT = "%d-%m-%Y" # The date format of RegisterReview and RegisterInterview
+DONE = None # Sent through a queue after the last item
+# The classes of the fields on the feedback pages of jobguy.work. No crawled page is kept in the repository and
+# they are not confirmed against one: 'check_page_fields' stops an import whose pages don't have them
+PAGE_FIELDS = {
+    'company': 'company-name',
+    'title': 'feedback-title',
+    'body': 'feedback-body',
+    'job_title': 'job-title',
+    'score': 'feedback-score',
+    'salary': 'salary',
+    'expected_salary': 'expected-salary',
+    'date': 'feedback-date',
+    'result': 'interview-result',
+}
+RESULT_LABELS = {
+    'قبول شدم': InterviewResult.accepted,
+    'پذیرفته شدم': InterviewResult.accepted,
+    'پیشنهاد را رد کردم': InterviewResult.rejected,
+    'رد شدم': InterviewResult.failed,
+    'لغو شد': InterviewResult.cancelled,
+    'جوابی ندادند': InterviewResult.ghosted,
+}
+PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫", "01234567890123456789.") # With the Arabic decimal separator
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+COMPANY_AFFIXES = re.compile(r"^(?:شرکت|گروه)\s+|\s+(?:corp|co|inc|ltd|group)\.?$")
+SCHEMAS: Dict[FeedbackType, Type[BaseParamsSchema]] = {
+    FeedbackType.review: RegisterReview,
+    FeedbackType.interview: RegisterInterview,
+}
+MODELS = {FeedbackType.review: Review, FeedbackType.interview: Interview}
+# Not updated when a page changes: moderation and ownership are changed through the API only
+KEPT_COLUMNS = ['status', 'user_id']
+
+
+@dataclass
+class PageRecord():
+    type: str
+    slug: int
+    page_hash: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.type}/{self.slug}"
+
+
+@dataclass
+class FeedbackImportReport(ImportReport):
+    unchanged: int = 0 # Pages whose content was imported before
+    updated: int = 0 # Imported feedbacks whose page changed
+
+    def __str__(self) -> str:
+        return f"read: {self.read}, unchanged: {self.unchanged}, inserted: {self.inserted}, updated: {self.updated},"\
+            f" skipped: {self.skipped}, errors: {len(self.errors)} in {self.seconds:.2f}s"\
+            f" ({self.rows_per_second:.0f} rows/s)"
+
+
+def normalize_company_name(name: str) -> str:
+    """The form of the company names that the pages are matched with"""
+    name = remove_inside_parantheses(remove_bad_persian_letters(name)).translate(PERSIAN_DIGITS)
+    name = " ".join(name.replace("ي", "ی").replace("ك", "ک").lower().split())
+    return COMPANY_AFFIXES.sub("", name).strip()
+
+
+def company_index() -> Dict[str, int]:
+    """Maps the normalized persian and english names of the companies to their id. The first company wins for
+    repeated names"""
+    index: Dict[str, int] = {}
+    for fa_name, en_name, company_id in session.query(Company.fa_name, Company.en_name, Company.id).order_by(Company.id):
+        for name in (fa_name, en_name):
+            if name:
+                index.setdefault(normalize_company_name(name), company_id)
+    return index
+
+
+def chat_index(path: str = DATASET_DIR) -> Dict[Tuple[str, int], Tuple[str, datetime]]:
+    """(type, slug) -> (title, time) of the chat messages. Only these columns of the dataset are read"""
+    if not os.path.isdir(path):
+        return {}
+    df = read_dataset(path, columns=['type', 'slug', 'title', 'timestamp']).dropna(subset=['slug'])
+    return {(str(feedback_type), int(slug)): (title, timestamp)
+            for feedback_type, slug, title, timestamp in zip(df['type'], df['slug'], df['title'], df['timestamp'])}
+
+
+def is_counted(status: Optional[FeedbackStatus]) -> bool:
+    """Whether the feedback is in the company stats, like 'contribution' sees it"""
+    return (FeedbackStatus.waiting if status is None else status) in COUNTED_STATUSES
+
+
+def imported_pages() -> Dict[Tuple[str, int], Tuple[int, str, Optional[FeedbackStatus]]]:
+    """(type, slug) -> (feedback id, page hash, status) of the feedbacks imported before"""
+    table = Feedback.__table__
+    statement = select(table.c.id, table.c.type, table.c.details['slug'].as_integer(),
+                       table.c.details['page_hash'].astext, table.c.status)\
+        .where(table.c.details['source'].astext == SOURCE)
+    return {(feedback_type.name, slug): (feedback_id, page_hash, status)
+            for feedback_id, feedback_type, slug, page_hash, status in session.execute(statement)}
+
+
+def iter_pages(feedback_type: str, path: str) -> Iterator[Tuple[int, str]]:
+    """The crawled pages of a type, from its page store ({type}s_store) or else its {type}s/{id}.html files"""
+    store_path = os.path.join(path, f"{feedback_type}s_store")
+    if os.path.isdir(store_path):
+        store = PageStore(store_path)
+        try:
+            yield from store.iter_pages()
+        finally:
+            store.close()
+        return
+    directory = os.path.join(path, f"{feedback_type}s")
+    if not os.path.isdir(directory):
+        return
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stem, _, ext = entry.name.partition(".")
+            if ext == "html" and stem.isdigit():
+                with open(entry.path, "r", encoding="utf-8") as h:
+                    yield int(stem), h.read()
+
+
+def parse_page(page: Tuple[str, int, str, str]) -> PageRecord:
+    """Runs in the worker processes. Reads the text of the PAGE_FIELDS of a page"""
+    feedback_type, slug, source, page_hash = page
+    record = PageRecord(type=feedback_type, slug=slug, page_hash=page_hash)
+    try:
+        document = html.fromstring(source)
+    except (etree.ParserError, ValueError):
+        record.error = 'bad_html'
+        return record
+    for name, class_name in PAGE_FIELDS.items():
+        found = document.find_class(class_name)
+        if len(found) > 0:
+            record.fields[name] = " ".join(found[0].text_content().split())
+    if 'body' not in record.fields:
+        record.error = 'no_feedback'
+    return record
+
+
+def check_page_fields(records: List[PageRecord]):
+    """Raises when no page of a batch has a feedback body, i.e. the PAGE_FIELDS don't match the crawled pages
+    and the import would only report 'no_feedback' errors"""
+    if len(records) > 0 and all(record.error == 'no_feedback' for record in records):
+        raise Exception(f"None of {len(records)} pages has the PAGE_FIELDS, check them against a crawled page")
+
+
+def to_number(text: Optional[str]) -> Optional[float]:
+    match = NUMBER.search(text.translate(PERSIAN_DIGITS)) if text else None
+    return float(match.group()) if match is not None else None
+
+
+def to_date(text: Optional[str], fallback: Optional[datetime]) -> Optional[str]:
+    """The date of the page in DATE_FORMAT, or the time of its chat message"""
+    if text:
+        text = text.translate(PERSIAN_DIGITS)
+        for date_format in (DATE_FORMAT, "%Y-%m-%d"):
+            try:
+                return datetime.strptime(text[:10], date_format).strftime(DATE_FORMAT)
+            except ValueError:
+                continue
+    return fallback.strftime(DATE_FORMAT) if fallback is not None and fallback == fallback else None # NaT != NaT
+
+
+def to_result(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    for label, result in RESULT_LABELS.items():
+        if label in text:
+            return result.name
+    return text if text in InterviewResult.__members__ else None
+
+
+def payload(record: PageRecord, company_id: Optional[int], chat: Optional[Tuple[str, datetime]]) -> dict:
+    """The inputs of the Register schema of the record's type. Missing values are left out for the schema to report"""
+    fields = record.fields
+    date = to_date(fields.get('date'), chat[1] if chat is not None else None)
+    score = to_number(fields.get('score'))
+    values: Dict[str, Any] = {
+        'title': fields.get('title'),
+        'body': fields.get('body'),
+        'job_title': fields.get('job_title'),
+        'score': int(score) if score is not None else None,
+        'salary': to_number(fields.get('salary')),
+        'company_id': company_id,
+    }
+    if record.type == FeedbackType.review.name:
+        values['start_ts'] = date
+    else:
+        values['int_ts'] = date
+        values['expected_salary'] = to_number(fields.get('expected_salary'))
+        values['result'] = to_result(fields.get('result'))
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def validate_records(records: List[PageRecord], companies: Dict[str, int], known_companies: Dict[Any, Set[int]],
+chat: Dict[Tuple[str, int], Tuple[str, datetime]], user_id: int, status: FeedbackStatus,
+report: FeedbackImportReport) -> Dict[FeedbackType, List[dict]]:
+    """Validates a batch of parsed pages without the database and returns the rows of the valid ones by type.
+    The company of a page is its company field, or the title of its chat message"""
+    rows: Dict[FeedbackType, List[dict]] = {feedback_type: [] for feedback_type in SCHEMAS}
+    for feedback_type, schema in SCHEMAS.items():
+        typed = [record for record in records if record.type == feedback_type.name]
+        names = []
+        company_ids = []
+        payloads = []
+        for record in typed:
+            message = chat.get((record.type, record.slug))
+            names.append(record.fields.get('company') or (message[0].split("،")[0].split(",")[0] if message else ""))
+            company_ids.append(companies.get(normalize_company_name(names[-1])))
+            payloads.append(payload(record, company_ids[-1], message))
+        deferred = DeferredChecks(offline=True).know(Company, Company.id, known_companies)
+        checks = schema.check_many(payloads, deferred)
+        for record, name, company_id, check in zip(typed, names, company_ids, checks):
+            errors = dict(check.error_bag)
+            if company_id is None:
+                errors['company_id'] = {"_has_company": f"No company found for '{name}'"}
+            if len(errors) > 0:
+                report.errors[record.key] = errors
+            if not check.only_optional_errors_exist or company_id is None:
+                continue
+            sanitized = check.sanitized
+            subtype = {'start_ts': sanitized['start_ts'], 'end_ts': sanitized.get('end_ts')} \
+                if feedback_type == FeedbackType.review else \
+                {'int_ts': sanitized['int_ts'], 'expected_salary': sanitized['expected_salary'], 'result': sanitized['result']}
+            rows[feedback_type].append({
+                'slug': record.slug,
+                'feedback': {
+                    'title': sanitized['title'],
+                    'body': sanitized['body'],
+                    'job_title': sanitized['job_title'],
+                    'score': sanitized['score'],
+                    'salary': sanitized['salary'],
+                    'company_id': company_id,
+                    'user_id': user_id,
+                    'type': feedback_type,
+                    'status': status,
+                    'details': {'source': SOURCE, 'slug': record.slug, 'page_hash': record.page_hash},
+                },
+                'subtype': subtype,
+            })
+    return rows
+
+
+def update_rows(table, rows: List[dict]):
+    """One executemany UPDATE of the rows by their 'id'"""
+    columns = [key for key in rows[0] if key != 'id']
+    statement = update(table).where(table.c.id == bindparam('_id'))\
+        .values({column: bindparam(f"_{column}") for column in columns})
+    session.execute(statement, [{f"_{key}": value for key, value in row.items()} for row in rows])
+
+
+def write_rows(feedback_type: FeedbackType, rows: List[dict],
+imported: Dict[Tuple[str, int], Tuple[int, str, Optional[FeedbackStatus]]], chunk_size: int, report: FeedbackImportReport):
+    """Inserts the new feedbacks with multi-row INSERTs into the feedbacks table and then into the table of their
+    type, and updates the ones whose page changed. Commits once.
+    Only feedbacks outside the stats are updated, so their score, salary and company never need an
+    'apply_feedback_change'. The published and waiting ones are left to the moderators"""
+    table = Feedback.__table__
+    subtable = MODELS[feedback_type].__table__
+    new = [row for row in rows if (feedback_type.name, row['slug']) not in imported]
+    changed = [row for row in rows if (feedback_type.name, row['slug']) in imported]
+    for i in range(0, len(new), chunk_size):
+        chunk = new[i:i + chunk_size]
+        statement = insert(table).values([row['feedback'] for row in chunk])\
+            .returning(table.c.id, table.c.details['slug'].as_integer())
+        ids = {slug: feedback_id for feedback_id, slug in session.execute(statement)}
+        session.execute(insert(subtable).values([{**row['subtype'], 'id': ids[row['slug']]} for row in chunk]))
+    updated = []
+    if len(changed) > 0:
+        feedback_ids = [imported[(feedback_type.name, row['slug'])][0] for row in changed]
+        # Locked until the commit and checked again, the feedbacks may have been moderated since the start
+        statuses = dict(session.execute(select(table.c.id, table.c.status).where(table.c.id.in_(feedback_ids))
+                                        .with_for_update()).all())
+        updated = [(row, feedback_id) for row, feedback_id in zip(changed, feedback_ids)
+                   if feedback_id in statuses and not is_counted(statuses[feedback_id])]
+    if len(updated) > 0:
+        update_rows(table, [{**{key: value for key, value in row['feedback'].items() if key not in KEPT_COLUMNS},
+                             'id': feedback_id} for row, feedback_id in updated])
+        update_rows(subtable, [{**row['subtype'], 'id': feedback_id} for row, feedback_id in updated])
+    safe_commit(session=session)
+    report.inserted += len(new)
+    report.updated += len(updated)
+    report.skipped += len(changed) - len(updated)
+
+
+def queue_items(queue: Queue) -> Iterator[Any]:
+    """The items of a queue until DONE. An exception of the stage before is raised here"""
+    while True:
+        item = queue.get()
+        if item is DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def read_stage(path: str, imported: Dict[Tuple[str, int], Tuple[int, str, Optional[FeedbackStatus]]], batch_size: int,
+outbox: Queue, report: FeedbackImportReport):
+    """Sends the pages whose content hash differs from their imported one, in batches. Changed pages of
+    feedbacks in the stats are not parsed, 'write_rows' would skip them"""
+    try:
+        def pages():
+            for feedback_type in SCHEMAS:
+                for slug, source in iter_pages(feedback_type.name, path):
+                    report.read += 1
+                    page_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+                    previous = imported.get((feedback_type.name, slug))
+                    if previous is not None and previous[1] == page_hash:
+                        report.unchanged += 1
+                        continue
+                    if previous is not None and is_counted(previous[2]):
+                        report.skipped += 1
+                        continue
+                    yield feedback_type.name, slug, source, page_hash
+        for batch in batches(pages(), batch_size):
+            outbox.put(batch)
+        outbox.put(DONE)
+    except Exception as e:
+        outbox.put(e)
+
+
+def parse_stage(inbox: Queue, outbox: Queue, workers: Optional[int]):
+    """Parses the batches of pages in a process pool"""
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in queue_items(inbox):
+                outbox.put(list(pool.map(parse_page, batch, chunksize=16)))
+        outbox.put(DONE)
+    except Exception as e:
+        outbox.put(e)
+
+
+def run(user_id: int, path: str = ".", dataset: str = DATASET_DIR, status: FeedbackStatus = IMPORT_STATUS,
+batch_size: int = 1000, chunk_size: int = 500, workers: Optional[int] = None, queue_size: int = 4) -> FeedbackImportReport:
+    """Reads the crawled pages -> parses them in worker processes -> validates and inserts them. The stages run
+    at the same time and are connected by queues of at most 'queue_size' batches, so a slow database holds the
+    reading back instead of filling the memory"""
+    if status in COUNTED_STATUSES:
+        raise ValueError(f"Feedbacks can't be imported as {status.name}, see IMPORT_STATUS")
+    report = FeedbackImportReport()
+    start = perf_counter()
+    companies = company_index()
+    known_companies: Dict[Any, Set[int]] = {company_id: {company_id} for company_id in set(companies.values())}
+    chat = chat_index(dataset)
+    imported = imported_pages()
+    pages_queue: Queue = Queue(maxsize=queue_size)
+    records_queue: Queue = Queue(maxsize=queue_size)
+    stages = [Thread(target=read_stage, args=(path, imported, batch_size, pages_queue, report), daemon=True),
+              Thread(target=parse_stage, args=(pages_queue, records_queue, workers), daemon=True)]
+    for stage in stages:
+        stage.start()
+    checked = False
+    for records in queue_items(records_queue):
+        if not checked:
+            check_page_fields(records)
+            checked = True
+        parsed = []
+        for record in records:
+            if record.error is not None:
+                report.errors[record.key] = {"_page": record.error}
+            else:
+                parsed.append(record)
+        rows = validate_records(parsed, companies, known_companies, chat, user_id, status, report)
+        for feedback_type, typed_rows in rows.items():
+            if len(typed_rows) > 0:
+                write_rows(feedback_type, typed_rows, imported, chunk_size, report)
+        report.seconds = perf_counter() - start
+        print(report)
+    for stage in stages:
+        stage.join()
+    report.seconds = perf_counter() - start
+    return report
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Imports the crawled interview and review pages as feedbacks")
+    parser.add_argument("user_id", type=int, help="Id of the user the feedbacks are added by")
+    parser.add_argument("path", nargs="?", default=".", help="Directory of the interviews(_store) and reviews(_store)")
+    parser.add_argument("--dataset", default=DATASET_DIR, help="Parquet dataset of the chat messages")
+    parser.add_argument("--status", default=IMPORT_STATUS.name,
+                        choices=[s.name for s in FeedbackStatus if s not in COUNTED_STATUSES])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=4)
+    args = parser.parse_args()
+    report = run(user_id=args.user_id, path=args.path, dataset=args.dataset, status=FeedbackStatus[args.status],
+    batch_size=args.batch_size, chunk_size=args.chunk_size, workers=args.workers, queue_size=args.queue_size)
+    with open("feedback_import_errors.json", "w+") as h:
+        json.dump(report.errors, h, ensure_ascii=False)
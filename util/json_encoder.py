@@ -0,0 +1,51 @@
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+from flask import current_app, json
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError: # orjson is optional, the standard library encoder is used without it
+    orjson = None
+
+# orjson writes datetimes as RFC 3339 by itself, they are passed to 'default' to keep the timestamps of the API
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def default(obj):
+    """Types that the API returns but JSON doesn't have. BaseEnums are strings for both encoders"""
+    if isinstance(obj, datetime):
+        return obj.timestamp()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class AppJSONEncoder(JSONEncoder):
+    """The standard library encoder of the app (jsonify, flask.json.dumps) with the same types as orjson"""
+    def default(self, o):
+        try:
+            return default(o)
+        except TypeError:
+            return super().default(o)
+
+
+def use_orjson() -> bool:
+    return orjson is not None and current_app.config.get('JSON_ENCODER') == 'orjson'
+
+
+def dumps(obj) -> bytes:
+    if use_orjson():
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    return json.dumps(obj).encode()
+
+
+def json_response(payload, status: int = 200):
+    """Replaces jsonify for the responses of the API, encoded with the backend selected in BaseConfig.JSON_ENCODER"""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,36 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, Tuple
+
+from .exceptions import InternalException
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values: Any) -> str:
+    """Creates an opaque token out of the sort key values of the last row of a page"""
+    values = tuple(value.isoformat() if type(value) == datetime else value for value in values)
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, length: int) -> list:
+    """Reverts 'encode_cursor'. Datetimes are returned as their iso format"""
+    try:
+        values = json.loads(urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode()))
+    except (ValueError, TypeError):
+        raise InternalException(error="Invalid cursor")
+    if type(values) != list or len(values) != length:
+        raise InternalException(error="Invalid cursor")
+    return values
+
+
+def decode_datetime_cursor(token: str) -> Tuple[datetime, int]:
+    """Decodes the cursor of the pages that are sorted by (datetime, id)"""
+    [date, last_id] = decode_cursor(token, 2)
+    try:
+        return datetime.fromisoformat(date), int(last_id)
+    except (ValueError, TypeError):
+        raise InternalException(error="Invalid cursor")
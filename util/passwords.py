@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from threading import BoundedSemaphore
+from typing import Callable, Optional, TypeVar
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError
+
+from wsgi import FlaskApp
+from .exceptions import Overloaded
+
+T = TypeVar("T")
+
+config = FlaskApp.instance().config
+hasher = PasswordHasher(time_cost=config['ARGON2_TIME_COST'], memory_cost=config['ARGON2_MEMORY_COST'],
+parallelism=config['ARGON2_PARALLELISM'], hash_len=config['ARGON2_HASH_LEN'], salt_len=config['ARGON2_SALT_LEN'])
+
+# argon2 releases the GIL while hashing, so threads hash in parallel without blocking the request threads
+__executor = ThreadPoolExecutor(max_workers=config['PASSWORD_HASH_WORKERS'], thread_name_prefix="argon2")
+__slots = BoundedSemaphore(config['PASSWORD_HASH_WORKERS'] + config['PASSWORD_HASH_QUEUE'])
+__dummy_hash: Optional[str] = None
+
+
+def run_in_pool(func: Callable[..., T], *args) -> T:
+    """Runs a hash in the pool and waits for it. When all the workers and queue slots are taken, the request
+    is rejected right away instead of piling up behind the others"""
+    if not __slots.acquire(blocking=False):
+        raise Overloaded
+    try:
+        future = __executor.submit(func, *args)
+    except Exception:
+        __slots.release()
+        raise
+    # The slot is freed when the hash is done, a timed out hash still holds its thread until then
+    future.add_done_callback(lambda _: __slots.release())
+    try:
+        return future.result(timeout=config['PASSWORD_HASH_TIMEOUT'])
+    except TimeoutError:
+        raise Overloaded
+
+
+def hash_password(password: str) -> str:
+    return run_in_pool(hasher.hash, password)
+
+
+def __verify(hash: str, password: str) -> bool:
+    try:
+        return hasher.verify(hash, password)
+    except (VerificationError, InvalidHash):
+        return False
+
+
+def verify_password(hash: str, password: str) -> bool:
+    return run_in_pool(__verify, hash, password)
+
+
+def needs_rehash(hash: str) -> bool:
+    """Whether the hash was made with other costs than the current config"""
+    return hasher.check_needs_rehash(hash)
+
+
+def dummy_verify(password: str):
+    """Costs as much as a verification, so unknown emails can't be told apart by the response time"""
+    global __dummy_hash
+    if __dummy_hash is None:
+        __dummy_hash = hasher.hash("dummy password")
+    verify_password(__dummy_hash, password)
@@ -0,0 +1,92 @@
+from collections import deque
+from threading import Lock
+from time import time
+from typing import Deque, Dict, Optional, Tuple
+from uuid import uuid4
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from wsgi import FlaskApp
+from .cache import count
+from .exceptions import TooManyRequests
+
+
+class RedisWindow():
+    """Sliding window of the attempts of a key as a sorted set of their timestamps. Shared by all the workers"""
+
+    def __init__(self, redis: Optional[Redis] = None) -> None:
+        self.__redis = redis
+
+    @property
+    def redis(self) -> Redis:
+        if self.__redis is None:
+            self.__redis = FlaskApp.get_redis()
+        return self.__redis
+
+    def hit(self, key: str, window: int) -> Tuple[int, float]:
+        """Records an attempt and returns the attempts in the window and the time of the oldest one"""
+        now = time()
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zremrangebyscore(key, 0, now - window)
+        pipe.zadd(key, {f"{now}:{uuid4().hex[:8]}": now})
+        pipe.zcard(key)
+        pipe.zrange(key, 0, 0, withscores=True)
+        pipe.expire(key, window)
+        _, _, attempts, oldest, _ = pipe.execute()
+        return attempts, oldest[0][1] if len(oldest) > 0 else now
+
+
+class MemoryWindow():
+    """Per process version of RedisWindow for tests and single worker setups"""
+
+    def __init__(self) -> None:
+        self.__attempts: Dict[str, Deque[float]] = {}
+        self.__lock = Lock()
+
+    def hit(self, key: str, window: int) -> Tuple[int, float]:
+        now = time()
+        with self.__lock:
+            attempts = self.__attempts.setdefault(key, deque())
+            while len(attempts) > 0 and attempts[0] <= now - window:
+                attempts.popleft()
+            attempts.append(now)
+            if len(self.__attempts) > 100000: # Drops the keys whose windows are over
+                for old_key in [k for k, v in self.__attempts.items() if v[-1] <= now - window]:
+                    del self.__attempts[old_key]
+            return len(attempts), attempts[0]
+
+
+class SlidingWindowLimiter():
+    """Allows 'limit' attempts per key in any 'window' seconds. If Redis fails, the attempts are allowed"""
+
+    def __init__(self, namespace: str, limit: int, window: int, backend=None) -> None:
+        self.namespace = namespace
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+
+    def check(self, key: str):
+        try:
+            attempts, oldest = self.backend.hit(f"rate:{self.namespace}:{key}", self.window)
+        except RedisError:
+            count(f"rate:{self.namespace}", 'error')
+            return
+        if attempts > self.limit:
+            raise TooManyRequests(retry_after=max(1, int(oldest + self.window - time()) + 1))
+
+
+config = FlaskApp.instance().config
+window_backend = RedisWindow() if config['RATE_LIMIT_BACKEND'] == 'redis' else MemoryWindow()
+
+
+def login_limiters(per_email: Optional[int] = None, per_ip: Optional[int] = None,
+window: Optional[int] = None, namespace: str = "login") -> Tuple[SlidingWindowLimiter, SlidingWindowLimiter]:
+    """The (email, ip) limiters of a login route. The values that are not given come from the config"""
+    window = config['LOGIN_LIMIT_WINDOW'] if window is None else window
+    return (
+        SlidingWindowLimiter(f"{namespace}:email", config['LOGIN_LIMIT_PER_EMAIL'] if per_email is None else per_email,
+        window, window_backend),
+        SlidingWindowLimiter(f"{namespace}:ip", config['LOGIN_LIMIT_PER_IP'] if per_ip is None else per_ip,
+        window, window_backend)
+    )
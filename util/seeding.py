@@ -1,7 +1,6 @@
 import json
 from datetime import datetime, timedelta
 from wsgi import FlaskApp
-from argon2 import PasswordHasher
 from random import randint, choice
 from factory import Factory, Sequence, LazyAttribute
 from faker import Faker
@@ -10,9 +9,10 @@ from .db_operations import add_to_db
 from models.main_models import FeedbackStatus, FeedbackType, Interview, InterviewResult, User, Company, \
 Review, UserType, Province, City, Industry
 from .validation import create_dir_name
+from .passwords import hasher
 
 session = FlaskApp.db_session()
-ph = PasswordHasher()
+seed_password = hasher.hash("12345678") # Hashed once, every seeded user has the same password
 fake_fa = Faker(locale='fa_IR')
 fake_en = Faker()
 number = 90
@@ -46,7 +46,7 @@ class EmployeeFactory(Factory):
 
     name = LazyAttribute(lambda _: fake_fa.unique.name())
     email = LazyAttribute(lambda _: fake_en.unique.email())
-    password = ph.hash("12345678")
+    password = seed_password
     type = UserType.employee
     is_verified = LazyAttribute(lambda _:fake_en.boolean())
 
@@ -135,9 +135,9 @@ def assign_feedback(type:FeedbackType,user_id:int):
     
 def run():
     create_constant_tables()
-    employee =  User(name="jobguy",password=ph.hash("12345678"),type=UserType.employee,email="me@jobguy.com")
-    manager = User(name="badman",password=ph.hash("12345678"),type=UserType.manager,email="manager@choscorp.ir", is_verified=True)
-    admin = User(name="admin",password=ph.hash("12345678"),type=UserType.admin,email="admin@karestan.ir", is_verified=True)
+    employee =  User(name="jobguy",password=seed_password,type=UserType.employee,email="me@jobguy.com")
+    manager = User(name="badman",password=seed_password,type=UserType.manager,email="manager@choscorp.ir", is_verified=True)
+    admin = User(name="admin",password=seed_password,type=UserType.admin,email="admin@karestan.ir", is_verified=True)
     models = [manager, employee, admin]
     for i in range(number):
         models += [EmployeeFactory(), CompanyFactory()]
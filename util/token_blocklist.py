@@ -0,0 +1,134 @@
+from datetime import timedelta
+from hashlib import blake2b
+from math import ceil, log
+from threading import Lock
+from time import time
+from typing import Optional
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from wsgi import FlaskApp
+from .cache import count
+
+config = FlaskApp.instance().config
+LOG_KEY = "revoked:log" # Sorted set of the revoked jtis scored by the time of revocation
+
+
+class BloomFilter():
+    """Set membership without false negatives in a fixed bit array. With 'capacity' items, at most
+    'error_rate' of the checked items that were never added are reported as present"""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.size = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * log(2)))
+        self.bits = bytearray(ceil(self.size / 8))
+        self.count = 0
+
+    def __positions(self, item: str):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # Double hashing: the k positions are h1 + i * h2
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self.__positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(item))
+
+
+class TokenBlocklist():
+    """Revoked JWTs by their jti. Every revocation is a Redis key that expires with the token, plus an entry of
+    the revocation log that the workers read every 'sync_interval' seconds into a local bloom filter. Checking
+    a token that is not revoked usually costs no Redis hit, the others cost one. A revocation made by another
+    worker is seen by this one after at most 'sync_interval' seconds"""
+
+    def __init__(self, sync_interval: float, capacity: int, error_rate: float, redis: Optional[Redis] = None) -> None:
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.__redis = redis
+        self.__bloom: Optional[BloomFilter] = None
+        self.__synced_at = 0.0
+        self.__lock = Lock()
+
+    @property
+    def redis(self) -> Redis:
+        if self.__redis is None:
+            self.__redis = FlaskApp.get_redis()
+        return self.__redis
+
+    @staticmethod
+    def key(jti: str) -> str:
+        return f"revoked:{jti}"
+
+    @staticmethod
+    def retention() -> Optional[float]:
+        """Seconds after which every revoked token has expired by itself, None if the tokens never expire"""
+        expires = config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+        return expires.total_seconds() if isinstance(expires, timedelta) else None
+
+    def revoke(self, jti: str, expires_at: Optional[int] = None):
+        now = time()
+        pipe = self.redis.pipeline(transaction=True)
+        if expires_at is None:
+            pipe.set(self.key(jti), 1)
+        else:
+            pipe.set(self.key(jti), 1, ex=max(1, int(expires_at - now) + 1))
+        pipe.zadd(LOG_KEY, {jti: now})
+        retention = self.retention()
+        if retention is not None:
+            pipe.zremrangebyscore(LOG_KEY, 0, now - retention)
+        try:
+            pipe.execute()
+        except RedisError:
+            # The logout still goes through. The token is only refused by this worker, once its bloom filter
+            # holds the jti and Redis can't tell otherwise
+            count("revoked", 'error')
+        with self.__lock:
+            if self.__bloom is None:
+                self.__bloom = BloomFilter(self.capacity, self.error_rate)
+            self.__bloom.add(jti)
+
+    def __sync(self):
+        now = time()
+        if self.__bloom is not None and now - self.__synced_at < self.sync_interval:
+            return
+        with self.__lock:
+            if self.__bloom is not None and now - self.__synced_at < self.sync_interval:
+                return
+            # A full bloom filter is rebuilt from the log, which only holds the revocations of unexpired tokens
+            rebuild = self.__bloom is None or self.__bloom.count >= self.capacity
+            # Overlapping the previous sync a little covers the revocations of the same moment
+            since = 0 if rebuild else self.__synced_at - 1
+            jtis = self.redis.zrangebyscore(LOG_KEY, since, "+inf")
+            bloom = BloomFilter(self.capacity, self.error_rate) if rebuild else self.__bloom
+            for jti in jtis:
+                bloom.add(jti.decode() if isinstance(jti, bytes) else jti) # type: ignore # the bloom exists here
+            self.__bloom = bloom
+            self.__synced_at = now
+
+    def is_revoked(self, jti: str) -> bool:
+        try:
+            self.__sync()
+        except RedisError:
+            count("revoked", 'error')
+            if self.__bloom is None: # Nothing is known about the revocations until Redis is back
+                return False
+        if jti not in self.__bloom: # type: ignore # set by the sync
+            return False
+        try:
+            return self.redis.exists(self.key(jti)) > 0
+        except RedisError:
+            # The bloom filter says it may be revoked and it can't be checked, so it is refused
+            count("revoked", 'error')
+            return True
+
+
+token_blocklist = TokenBlocklist(sync_interval=config['TOKEN_BLOCKLIST_SYNC_INTERVAL'],
+capacity=config['TOKEN_BLOCKLIST_CAPACITY'], error_rate=config['TOKEN_BLOCKLIST_ERROR_RATE'])
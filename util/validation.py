@@ -1,13 +1,18 @@
+from collections import defaultdict
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+from inspect import signature
 import re
-from typing import Dict, Iterable, Literal, Optional, Tuple, Type, Callable, Any, Union 
+from typing import Dict, Iterable, List, Literal, Optional, Set, Tuple, Type, Callable, Any, Union 
 from sqlalchemy import Column
 
 from .exceptions import InternalException, ValidationException
+from .pagination import MAX_PAGE_SIZE, decode_cursor, decode_datetime_cursor
 from models.base_model import Base
-from models.main_models import City, Company, FeedbackType, Interview, InterviewResult, Review, User, UserType
+from models.main_models import City, Company, Feedback, FeedbackStatus, FeedbackType, Interview, InterviewResult, Review, \
+    User, UserType
 from wsgi import FlaskApp
 from controllers.auth import get_current_user
 
@@ -15,15 +20,39 @@ from controllers.auth import get_current_user
 
 db_session = FlaskApp.db_session()
 
+# Patterns are compiled once at import. Use them through PATTERNS instead of compiling them in the functions
+PATTERNS = {
+    'bad_persian_letters': re.compile(r"[ؤئًٌٍَِّْ»ة»ءٰٔٓأأإأ\u200f]"),
+    'symbols': re.compile(r"[\\\/\r\+@^&%$#!]"),
+    'int': re.compile(r"^\d+$"),
+    'float': re.compile(r"^\d+\.\d+$"),
+    'parantheses': re.compile(r"\s*\(.*\)"),
+    'open_parantheses': re.compile(r"\s*\(.*\("),
+    'close_parantheses': re.compile(r"\s*\).*\)"),
+    'dir_separators': re.compile(r"[\s\-]"),
+    'multi_space': re.compile(r"\s{2,}"),
+    'ir_mobile': re.compile(r"09\d{9}"),
+    'strong_pass': re.compile(r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[#@_%?*!])[A-Za-z\d#@_%?*!]{8,}$"),
+    'email': re.compile(r"^([a-z1-9]+_?\.?[a-z1-9]+)@([a-z_-]{3,})\.([a-z]{2,6})$"),
+    'fa_text': re.compile(r"^[۱-۹آ-ی\s\d\.]+$"),
+    'fa_company_name': re.compile(r"^[۱-۹آ-ی\s\d\.\-\*,،]+$"),
+    'en_text': re.compile(r"^[A-Za-z\s\d\-.]+$"),
+    'en_company_name': re.compile(r"^[A-Za-z\s\d\-.&!',@]+$"),
+    'en_dirname': re.compile(r"^[a-z\d\_]+$"),
+    'float_text': re.compile(r"^\d*\.\d+$"),
+    'website': re.compile(r"^(www\.)?[a-z\d_]{3,}(\.[a-z]{2,10}){0,3}\.[a-z]{2,6}$"),
+    'user_name': re.compile(r"[a-z\d]+_?[a-z\d]+"),
+}
+
 # In GET requests we cant have int or float as values, but we can check whether the input (if string)
                 # is numeric and if true, we can cast it to the required type
 def parse_int_float(strx, type_class):
     if type(strx) != str:
         return strx
     if type_class == int:
-        match = re.compile(r"^\d+$").match(strx)
+        match = PATTERNS['int'].match(strx)
     elif type_class == float:
-        match = re.compile(r"^\d+\.\d+$").match(strx)
+        match = PATTERNS['float'].match(strx)
     else:
         raise InternalException(error=f"{__name__} conversion function, invalid type supplied")
     if match is None:
@@ -38,6 +67,15 @@ def convert_to_feedback_type(route_name):
     else:
         raise InternalException(error="Invalid feedback type provided")
 
+def convert_to_bool(strx):
+    if type(strx) == bool:
+        return strx
+    if str(strx).lower() in ['true', '1']:
+        return True
+    elif str(strx).lower() in ['false', '0']:
+        return False
+    raise InternalException(error=f"Cannot convert {strx} to type {bool}")
+
 def convert_to_datetime(date:str,format:str):
     try:
         return datetime.strptime(date,format)
@@ -45,30 +83,22 @@ def convert_to_datetime(date:str,format:str):
         raise InternalException(error=e.args[0])
 
 def remove_bad_persian_letters(strx:str) -> str:
-    bad_reg = re.compile(r"[ؤئًٌٍَِّْ»ة»ءٰٔٓأأإأ\u200f]")
-    s = bad_reg.sub("",strx)
-    s = re.sub(r"[\u200c]"," ",s)
-    return s
+    return PATTERNS['bad_persian_letters'].sub("",strx).replace("\u200c"," ")
 
 def remove_inside_parantheses(strx:str) -> str:
-    reg1 = re.compile(r"\s*\(.*\)")
-    reg2 = re.compile(r"\s*\(.*\(")
-    reg3 = re.compile(r"\s*\).*\)")
-    s = reg1.sub("",strx)
-    s = reg2.sub("",s)
-    s = reg3.sub("",s)
+    s = PATTERNS['parantheses'].sub("",strx)
+    s = PATTERNS['open_parantheses'].sub("",s)
+    s = PATTERNS['close_parantheses'].sub("",s)
     return s
 
 def create_dir_name(strx:str):
-    s = strx.lower()
-    s = re.sub(r"[\s\-]","_",s)
-    s = re.sub(r"[\\\/\r\+@^&%$#!]","",s)
-    return s
+    s = PATTERNS['dir_separators'].sub("_",strx.lower())
+    return PATTERNS['symbols'].sub("",s)
     
 def create_en_name(strx:str):
-    s = re.sub(r"[\-\_]"," ",strx)
-    s = re.sub(r"[\\\/\r\+@^&%$#!]","",s)
-    s = re.sub(r"\s{2,}"," ",s)
+    s = strx.replace("-"," ").replace("_"," ")
+    s = PATTERNS['symbols'].sub("",s)
+    s = PATTERNS['multi_space'].sub(" ",s)
     s = s.split(" ")
     s = " ".join([st.capitalize() for st in s])
     return s
@@ -105,12 +135,86 @@ class ModelField():
                 return True
         return False
 
+@dataclass
+class PendingCheck():
+    """A database check whose result is only known after DeferredChecks is resolved"""
+    model: Type[Base]
+    column: Column
+    value: Any
+    message: str
+    must_exist: bool # True for id checks, False for uniqueness checks
+    except_id: int = 0
+    failed: Optional[bool] = None
+    owner: Any = None # The schema instance (payload) the check belongs to
+
+
+class DeferredChecks():
+    """Collects the database checks of a validation pass (one payload or many in bulk mode) and
+    resolves them with one IN (...) query per model and column. The checks of a column whose values are
+    given with 'know' are resolved in memory. In 'offline' mode every check must be known, the database
+    is never queried"""
+    CHUNK_SIZE = 5000
+
+    def __init__(self, offline: bool = False) -> None:
+        self.pending: Dict[Tuple[Type[Base], str], List[PendingCheck]] = defaultdict(list)
+        self.known: Dict[Tuple[Type[Base], str], Dict[Any, Set[int]]] = {}
+        self.offline = offline
+
+    def know(self, model: Type[Base], column: Column, values: Dict[Any, Set[int]]):
+        """Sets the values of a column (value -> ids of the rows that have it) that the checks are resolved against"""
+        self.known[(model, column.key)] = values
+        return self
+
+    def defer(self, check: PendingCheck) -> PendingCheck:
+        self.pending[(check.model, check.column.key)].append(check)
+        return check
+
+    def __query(self, model: Type[Base], column: Column, values: list) -> Dict[Any, Set[int]]:
+        if self.offline:
+            raise InternalException(error=f"No known values of {model.__name__}.{column.key} in offline mode")
+        found = defaultdict(set)
+        for i in range(0, len(values), self.CHUNK_SIZE):
+            rows = db_session.query(column, model.id).filter(column.in_(values[i:i + self.CHUNK_SIZE])).all() # type: ignore
+            for value, m_id in rows:
+                found[value].add(m_id)
+        return found
+
+    def resolve(self):
+        for (model, key), checks in self.pending.items():
+            column = checks[0].column
+            found = self.known.get((model, key))
+            if found is None:
+                found = self.__query(model, column, list({check.value for check in checks}))
+            claims: Dict[Any, List[PendingCheck]] = defaultdict(list) # Unique values claimed before, in bulk mode
+            for check in checks:
+                exists = len(found.get(check.value, set()) - {check.except_id}) > 0
+                check.failed = exists != check.must_exist
+                if not check.must_exist:
+                    # Only another payload claiming the value for another row is a duplicate. The fields of one
+                    # payload may share a column (e.g. brand_name and fa_name)
+                    repeated = any(other.owner is not check.owner and (check.except_id == 0 or
+                                   other.except_id != check.except_id) for other in claims[check.value])
+                    if repeated and not check.failed:
+                        check.failed = True
+                        check.message = f"The value {check.value} is repeated in the column '{key}' of the payloads"
+                    claims[check.value].append(check)
+        self.pending.clear()
+
+
+# The DeferredChecks of the validation pass that is running in the current context (if any)
+deferred_checks: ContextVar[Optional[DeferredChecks]] = ContextVar('deferred_checks', default=None)
+
+
 class Validators:
     @staticmethod
     def sql_model_id(x, model: Type[Base]):
+        message = f"Entry with id={x} does not exist!"
+        deferred = deferred_checks.get()
+        if deferred is not None:
+            return deferred.defer(PendingCheck(model=model, column=model.id, value=x, message=message, must_exist=True)) # type: ignore
         m_id = x
         if db_session.query(model).get(m_id) is None: # type: ignore
-            return f"Entry with id={x} does not exist!"
+            return message
         return None
 
     # @staticmethod
@@ -122,6 +226,22 @@ class Validators:
     #     if doc is None:
     #         return f"Entry with {x} does not exist!"
 
+    @staticmethod
+    def cursor(x):
+        try:
+            decode_cursor(x, 2)
+        except InternalException:
+            return "Invalid cursor"
+        return None
+
+    @staticmethod
+    def datetime_cursor(x):
+        try:
+            decode_datetime_cursor(x)
+        except InternalException:
+            return "Invalid cursor"
+        return None
+
     @staticmethod
     def datetime_format(x, datetime_format):
         try:
@@ -144,11 +264,16 @@ class Validators:
 
     @staticmethod
     def ir_mobile(x):
-        if re.compile(r"09\d{9}").match(x) is None:
+        if PATTERNS['ir_mobile'].match(x) is None:
             return f"Invalid mobile number format.Correct format must be: 09XXXXXXXXX"
         return None
     @staticmethod
     def is_unique(x, main_column:Column, model:Type[Base], except_id = 0, filters: Optional[Dict[Column, Any]] = None):
+        message = f"The value {x} exists in the column '{main_column.name}' of table '{model.__tablename__}'" # type: ignore # ignoring __tablename__ error
+        deferred = deferred_checks.get()
+        if deferred is not None and filters is None:
+            return deferred.defer(PendingCheck(model=model, column=main_column, value=x, message=message, must_exist=False,
+            except_id=except_id))
         q = db_session.query(model)
         q = q.filter(main_column == x)
         q = q.filter(model.id != except_id) # type: ignore # ignore warning of not existing id in Base (model)
@@ -156,73 +281,65 @@ class Validators:
             for col,val in filters.items():
                 q = q.filter(col == val)
         if q.count() > 0:
-            return f"The value {x} exists in the column '{main_column.name}' of table '{model.__tablename__}'" # type: ignore # ignoring __tablename__ error
+            return message
         return None
     @staticmethod
     def strong_pass(x):
-        pass_regex = re.compile(r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[#@_%?*!])[A-Za-z\d#@_%?*!]{8,}$")
-        if pass_regex.match(x) is None:
+        if PATTERNS['strong_pass'].match(x) is None:
             return f"The password must contain at least one lower and upper case, digit and special characters"\
                 "(#@_%?*!)"
     @staticmethod
     def email(x):
-        regex = re.compile(r"^([a-z1-9]+_?\.?[a-z1-9]+)@([a-z_-]{3,})\.([a-z]{2,6})$")
-        if not regex.match(x):
+        if not PATTERNS['email'].match(x):
             return "Invalid email address"
         return None
 
     @staticmethod
     def fa_text(x):
-        regex = re.compile(r"^[۱-۹آ-ی\s\d\.]+$")
-        if not regex.match(x):
+        if not PATTERNS['fa_text'].match(x):
             return "Text must only contain farsi letters, digits, space and english digits"
         return None
 
     @staticmethod
     def fa_company_name(x):
-        regex = re.compile(r"^[۱-۹آ-ی\s\d\.\-\*,،]+$")
-        if not regex.match(x):
+        if not PATTERNS['fa_company_name'].match(x):
             return "Text must only contain farsi letters, digits, space and english digits"
         return None
 
     @staticmethod
     def en_text(x):
-        regex = re.compile(r"^[A-Za-z\s\d\-.]+$")
-        if not regex.match(x):
+        if not PATTERNS['en_text'].match(x):
             return "Text must only contain english letters, digits, space and dash"
         return None
 
     @staticmethod
     def en_company_name(x):
-        regex = re.compile(r"^[A-Za-z\s\d\-.&!',@]+$")
-        if not regex.match(x):
+        if not PATTERNS['en_company_name'].match(x):
             return "Text must only contain english letters, digits, space and dash"
         return None
 
     @staticmethod
     def en_dirname(x):
-        regex = re.compile(r"^[a-z\d\_]+$")
-        if not regex.match(x):
+        if not PATTERNS['en_dirname'].match(x):
             return "Text must only contain lowercase, digits and/or underline"
         return None
 
     @staticmethod
     def int_text(x):
-        if not re.match(r"^\d+$",x):
+        if not PATTERNS['int'].match(x):
             return "Text must only contain integers"
         return None
 
     @staticmethod
     def float_text(x):
-        if not re.match(r"^\d*\.\d+$",x):
+        if not PATTERNS['float_text'].match(x):
             return "Text must only contain floating point numbers"
         return None
 
     @staticmethod
     def website(x):
         # Up to 3 long subdomains are supported e.g. www.shitless.someone.co.ir
-        regex =  re.compile(r"^(www\.)?[a-z\d_]{3,}(\.[a-z]{2,10}){0,3}\.[a-z]{2,6}$")
-        if not regex.match(x):
+        if not PATTERNS['website'].match(x):
             return "Invalid website address"
         return None
 
@@ -252,9 +369,42 @@ class Validators:
             return f"Date must be after {date}"
         return None
 
-class BaseParamsSchema:
+@dataclass(frozen=True)
+class FieldPlan():
+    """The compiled form of a ModelField. It holds everything 'check' needs for one field, so the
+    schema's fields are built only once per class instead of once per request"""
+    name: str
+    field_type: Type
+    optional: bool
+    preconverter: Optional[Callable]
+    nested: Optional[Type['BaseParamsSchema']]
+    evals: Tuple[Tuple[str, Callable, bool], ...] # (eval name, function, whether it needs the inputs)
+    postconverter: Optional[Callable]
+
+    @classmethod
+    def compile(cls, name:str, field: ModelField) -> 'FieldPlan':
+        nested = field.field_type if issubclass(field.field_type, BaseParamsSchema) else None
+        evals = tuple((func_name, func, 'inputs' in signature(func).parameters) for func_name, func in field.eval.items())
+        return cls(name=name, field_type=field.field_type, optional=field.optional, preconverter=field.preconverter,
+        nested=nested, evals=evals, postconverter=field.postconverter)
+
+
+class SchemaMeta(type):
+    """Instantiating a schema binds the inputs to the compiled plan of its class. The fields that are
+    declared in the schema's __init__ are only built once, when the plan is compiled"""
+
+    def __call__(cls, **kwargs):
+        plan = cls.compile() # type: ignore # compile is defined in BaseParamsSchema
+        instance = cls.__new__(cls)
+        BaseParamsSchema.__init__(instance, **kwargs)
+        instance.plan = plan
+        return instance
+
+
+class BaseParamsSchema(metaclass=SchemaMeta):
 
     inputs: dict
+    plan: Tuple[FieldPlan, ...] = ()
     error_bag: dict = {}
     has_errors: Optional[bool] = None
     sanitized: dict = {}
@@ -269,6 +419,25 @@ class BaseParamsSchema:
         self.has_errors = None
         self.only_optional_errors_exist = True
 
+    @classmethod
+    def compile(cls) -> Tuple[FieldPlan, ...]:
+        """Builds the fields of the schema once (by running its __init__ without inputs) and caches them
+        as an ordered tuple of FieldPlans. Evals that need the other inputs of the payload must accept
+        them as the 'inputs' keyword instead of reading 'self.inputs'"""
+        plan = cls.__dict__.get('_compiled_plan')
+        if plan is None:
+            prototype = type.__call__(cls)
+            plan = tuple(FieldPlan.compile(name, field) for name, field in prototype.get_fields() if not field.ignore)
+            cls._compiled_plan = plan
+        return plan
+
+    @classmethod
+    def compile_subclasses(cls):
+        """Compiles every schema that is defined so far. Called at the end of the modules that define schemas"""
+        for subclass in cls.__subclasses__():
+            subclass.compile()
+            subclass.compile_subclasses()
+
     def get_fields(self) -> Iterable[Tuple[str, ModelField]]:
         for key, value in self.__dict__.items():
             if type(value) == ModelField:
@@ -278,14 +447,14 @@ class BaseParamsSchema:
         if len(self.inputs) < 1:
             raise ValidationException(message="Payload cannot be empty")
 
-    def __check_presence(self, name:str, field: ModelField):
+    def __check_presence(self, field: FieldPlan):
         """Check if required and present"""
-        if name not in self.inputs and not field.optional:
+        if field.name not in self.inputs and not field.optional:
             raise InternalException(error = {"_required":"Missing required param"})
 
-    def __get_or_preconvert(self, name:str, field: ModelField):
+    def __get_or_preconvert(self, field: FieldPlan):
         """Get value and if it has converter, return the converted value. Otherwise, return the original value"""
-        val = self.inputs.get(name)
+        val = self.inputs.get(field.name)
         if val is not None and field.preconverter is not None:
             try:
                 return field.preconverter(val)
@@ -294,45 +463,50 @@ class BaseParamsSchema:
         else:
             return val
 
-    def __check_nested(self, name:str, inp:dict, field:ModelField):
-        if not issubclass(field.field_type, BaseParamsSchema):
+    def __check_nested(self, inp:dict, field:FieldPlan):
+        if field.nested is None:
             return None
         if type(inp) != dict:
             raise InternalException(error="Params supplied for nested must be dict")
         if self.level > self.MAX_LEVEL:
             raise InternalException({"_depth":"Maximum depth level reached for nested values"})
-        instance = field.field_type(**inp)
+        instance = field.nested(**inp)
         instance.level = self.level + 1
         val_instance = instance.check()
-        self.children[name] = val_instance
+        self.children[field.name] = val_instance
         if val_instance.only_optional_errors_exist:
             return val_instance.sanitized
         else:
             raise InternalException(error=val_instance.error_bag)
 
     @staticmethod
-    def __type_check(value, field:ModelField):
+    def __type_check(value, field:FieldPlan):
         """Check the type of the original or converted value"""
         if type(value) != field.field_type:
                 raise InternalException(error={"_type":f"Invalid type. Expected {field.field_type}"})
         return None
 
-    @staticmethod
-    def __perform_evaluations(value, field:ModelField):
-        """Perform the evaluations that are defined in 'eval' """
+    def __perform_evaluations(self, value, field:FieldPlan):
+        """Perform the evaluations that are defined in 'eval'. Deferred database checks are kept
+        in place of their messages until they are resolved"""
         errors = {}
-        for func_name,func in field.eval.items():
+        for func_name, func, needs_inputs in field.evals:
             try:
-                msg = func(x=value)
+                msg = func(x=value, inputs=self.inputs) if needs_inputs else func(x=value)
             except Exception as e:
                 msg = e.args[0]
             if msg is not None:
                 errors[func_name] = msg
-        if len(errors) > 0:
+        pending = [msg for msg in errors.values() if type(msg) == PendingCheck]
+        for check in pending:
+            check.owner = self
+        if len(pending) > 0:
+            self.__deferred_fields.append((field, errors))
+        if len(errors) > len(pending):
             raise InternalException(error=errors)
 
     @staticmethod
-    def __postconvert(value, field: ModelField):
+    def __postconvert(value, field: FieldPlan):
         if value is not None and field.postconverter is not None:
             try:
                 return field.postconverter(value)
@@ -340,49 +514,92 @@ class BaseParamsSchema:
                 raise InternalException(error={"_postconversion":f"{e.error}"})
         return value
 
-    def check(self):
-        self.inputs_check()
+    def evaluate(self, deferred: DeferredChecks):
+        """Runs the plan against the inputs. The database checks are collected in 'deferred' and
+        their results are applied by 'finish' after 'deferred' is resolved"""
         error_bag = {}
         sanitized_input = {}
         only_optional = True
+        self.__deferred_fields: List[Tuple[FieldPlan, dict]] = []
+        self.inputs_check()
 
-        for name, field in self.get_fields():
-            if field.ignore:
-                continue
-            try:
-                self.__check_presence(name,field)
-                value  = self.__get_or_preconvert(name, field)
-                if value is None:
-                    continue
-                sanitized_nested = self.__check_nested(name, value, field)
-                if sanitized_nested is None:
-                    self.__type_check(value, field)
-                    self.__perform_evaluations(value, field)
-                    value = self.__postconvert(value, field)
-                    self.__type_check(value,field)
+        token = deferred_checks.set(deferred)
+        try:
+            for field in self.plan:
+                name = field.name
+                try:
+                    self.__check_presence(field)
+                    value  = self.__get_or_preconvert(field)
                     if value is None:
                         continue
-                else:
-                    value = sanitized_nested
-            except InternalException as e:
-                # TODO Nested only_optional_errors must be added. ony optinals must be checked recursively
-                error_bag[name] = e.error
-                if not field.optional:
-                    only_optional = False
-                continue
-            sanitized_input[name] = value
-        
-        
+                    sanitized_nested = self.__check_nested(value, field)
+                    if sanitized_nested is None:
+                        self.__type_check(value, field)
+                        self.__perform_evaluations(value, field)
+                        value = self.__postconvert(value, field)
+                        self.__type_check(value,field)
+                        if value is None:
+                            continue
+                    else:
+                        value = sanitized_nested
+                except InternalException as e:
+                    # TODO Nested only_optional_errors must be added. ony optinals must be checked recursively
+                    error_bag[name] = e.error
+                    if not field.optional:
+                        only_optional = False
+                    continue
+                sanitized_input[name] = value
+        finally:
+            deferred_checks.reset(token)
+
+        self.error_bag = error_bag
         self.sanitized = sanitized_input
         self.only_optional_errors_exist = only_optional
+        return self
 
-        if len(error_bag) > 0:
-            self.error_bag = error_bag
-            self.has_errors = True
-        else:
-            self.has_errors = False
+    def finish(self):
+        """Replaces the resolved database checks with their messages and sets the final state of the check"""
+        for field, errors in self.__deferred_fields:
+            for func_name, msg in list(errors.items()):
+                if type(msg) == PendingCheck:
+                    if msg.failed:
+                        errors[func_name] = msg.message
+                    else:
+                        del errors[func_name]
+            if len(errors) > 0:
+                self.error_bag[field.name] = errors
+                self.sanitized.pop(field.name, None)
+                if not field.optional:
+                    self.only_optional_errors_exist = False
+        self.__deferred_fields = []
+        self.has_errors = len(self.error_bag) > 0
         return self
 
+    def check(self):
+        deferred = DeferredChecks()
+        self.evaluate(deferred)
+        deferred.resolve()
+        return self.finish()
+
+    @classmethod
+    def check_many(cls, payloads: Iterable[dict], deferred: Optional[DeferredChecks] = None) -> List['BaseParamsSchema']:
+        """Bulk mode of 'check'. The database checks of all the payloads are resolved together, by 'deferred'
+        if it is given (e.g. an offline one). A payload that fails 'inputs_check' gets its message in the
+        '_payload' key of its error bag"""
+        deferred = DeferredChecks() if deferred is None else deferred
+        instances = []
+        for payload in payloads:
+            instance = cls(**payload)
+            try:
+                instance.evaluate(deferred)
+            except ValidationException as e:
+                instance.error_bag = {"_payload": e.message}
+                instance.sanitized = {}
+                instance.only_optional_errors_exist = False
+            instances.append(instance)
+        deferred.resolve()
+        return [instance.finish() for instance in instances]
+
     def validate(self):
         if self.has_errors is None: # if has_errors is None, that would indicate that checking process is not started
             self.check()
@@ -424,7 +641,7 @@ class CreateUser(BaseParamsSchema):
             field_type=str,
             optional=False,
             eval= {
-                "_lower_case": lambda x: None if re.match(r"[a-z\d]+_?[a-z\d]+",x) else "User name must only contain lower case letters, numbers and underline",
+                "_lower_case": lambda x: None if PATTERNS['user_name'].match(x) else "User name must only contain lower case letters, numbers and underline",
                 "_bigger": lambda x: "The length of user name must be bigger than 5" if len(x) < 5 else None
             })
         self.password = ModelField(
@@ -609,6 +826,7 @@ class GetFeedbacks(BaseParamsSchema):
     feedback_type: ModelField
     offset: ModelField
     limit: ModelField
+    cursor: ModelField
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
@@ -651,10 +869,111 @@ class GetFeedbacks(BaseParamsSchema):
             field_type=int,
             optional= True,
             eval={
-                "_bigger": lambda x: "The limit value must be bigger than zero" if x < 0 else None
+                "_bigger": lambda x: "The limit value must be bigger than zero" if x < 1 else None,
+                "_smaller": lambda x: f"The limit value can't be bigger than {MAX_PAGE_SIZE}" if x > MAX_PAGE_SIZE else None
             }            
         )
 
+        self.cursor = ModelField(
+            field_type=str,
+            optional= True,
+            eval={
+                "_format": lambda x: Validators.datetime_cursor(x)
+            }
+        )
+
+class QueryCompanies(BaseParamsSchema):
+    name: ModelField
+    city_id: ModelField
+    province_id: ModelField
+    industry_id: ModelField
+    is_verified: ModelField
+    min_score: ModelField
+    max_score: ModelField
+    sort: ModelField
+    cursor: ModelField
+    limit: ModelField
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+
+        self.name = ModelField(
+            field_type=str,
+            optional= True,
+            eval={
+                "_bigger": lambda x: "The length of name must be bigger than 2" if len(x.strip()) < 2 else None,
+                "_smaller": lambda x: "The length of name can't be bigger than 60" if len(x) > 60 else None,
+            }
+        )
+
+        self.city_id = ModelField(
+            field_type=int,
+            optional= True
+        )
+
+        self.province_id = ModelField(
+            field_type=int,
+            optional= True
+        )
+
+        self.industry_id = ModelField(
+            field_type=int,
+            optional= True
+        )
+
+        self.is_verified = ModelField(
+            field_type=bool,
+            optional= True,
+            preconverter= convert_to_bool
+        )
+
+        self.min_score = ModelField(
+            field_type=int,
+            optional= True,
+            eval={
+                "_between": lambda x: "The score must be btween 0 and 10" if x < 0 or x > 10 else None
+            }
+        )
+
+        self.max_score = ModelField(
+            field_type=int,
+            optional= True,
+            eval={
+                "_between": lambda x: "The score must be btween 0 and 10" if x < 0 or x > 10 else None,
+                "_order": lambda x, inputs: "max_score can't be smaller than min_score"
+                if parse_int_float(inputs.get('min_score', 0), int) > x else None
+            }
+        )
+
+        self.sort = ModelField(
+            field_type=str,
+            optional= True,
+            eval={
+                "_in": lambda x: Validators.is_in(x, ['newest', 'score', 'name'])
+            }
+        )
+
+        self.cursor = ModelField(
+            field_type=str,
+            optional= True,
+            eval={
+                "_format": lambda x: Validators.cursor(x)
+            }
+        )
+
+        self.limit = ModelField(
+            field_type=int,
+            optional= True,
+            eval={
+                "_bigger": lambda x: "The limit value must be bigger than zero" if x < 1 else None,
+                "_smaller": lambda x: f"The limit value can't be bigger than {MAX_PAGE_SIZE}" if x > MAX_PAGE_SIZE else None
+            }
+        )
+
+    def inputs_check(self):
+        """An empty query lists all the companies"""
+        return None
+
 class RegisterFeedback(BaseParamsSchema):
     title : ModelField
     body : ModelField
@@ -757,7 +1076,7 @@ class RegisterReview(RegisterFeedback):
             optional= True, # If false is given, thye are still employed
             eval={
                 "_before_now": lambda x: Validators.date_compare(x,format= date_fmt, date=None, order='before'),
-                "_after_start": lambda x: Validators.date_compare(x,format= date_fmt, date=self.inputs['start_ts'], order='after')
+                "_after_start": lambda x, inputs: Validators.date_compare(x,format= date_fmt, date=inputs['start_ts'], order='after')
             },
             preconverter= lambda x: convert_to_datetime(x, date_fmt)
         )
@@ -771,8 +1090,9 @@ class EditReview(RegisterReview):
         for _, attr in self.get_fields():
             attr.optional = True
 
-        if "start_ts" not in self.inputs and "end_ts" in self.inputs:
-            del self.end_ts.eval["_after_start"]
+        # Without a new start_ts, end_ts can't be compared to it
+        after_start = self.end_ts.eval["_after_start"]
+        self.end_ts.eval["_after_start"] = lambda x, inputs: after_start(x, inputs) if "start_ts" in inputs else None
 
         self.company_id.ignore = True
 
@@ -846,4 +1166,61 @@ class EditInterView(RegisterInterview):
         )
     def inputs_check(self):
         if len(self.inputs) < 2 or "id" not in self.inputs:
-            raise ValidationException(message="Payload must contain the field id and at least one other field to edit")
\ No newline at end of file
+            raise ValidationException(message="Payload must contain the field id and at least one other field to edit")
+
+class ExportFeedbacks(BaseParamsSchema):
+    company_id: ModelField
+    feedback_type: ModelField
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+
+        self.company_id = ModelField(
+            field_type=int,
+            optional= False,
+            eval={
+                "_has_id": lambda x: Validators.sql_model_id(x, Company)
+            }
+        )
+
+        self.feedback_type = ModelField(
+            field_type=FeedbackType,
+            optional= False,
+            eval={
+                "_in": lambda x: Validators.is_in(x,list(FeedbackType.__members__.values()))
+            },
+            preconverter= convert_to_feedback_type
+        )
+
+class ChangeFeedbackStatus(BaseParamsSchema):
+    feedback_id: ModelField
+    status: ModelField
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+
+        def convert_to_feedback_status(status:str):
+            try:
+                return FeedbackStatus[status]
+            except:
+                return None
+
+        self.feedback_id = ModelField(
+            field_type=int,
+            optional=False,
+            eval= {
+                "_has_id": lambda x: Validators.sql_model_id(x, Feedback)
+            }
+        )
+
+        self.status = ModelField(
+            field_type=FeedbackStatus,
+            optional=False,
+            eval={
+                "_in": lambda x: Validators.is_in(x,list(FeedbackStatus.__members__.values()))
+            },
+            preconverter= convert_to_feedback_status
+        )
+
+
+BaseParamsSchema.compile_subclasses()
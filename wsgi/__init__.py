@@ -1,8 +1,8 @@
 from os.path import dirname
-from flask import Flask, jsonify
+from flask import Flask
 from typing import Literal, Optional, Callable, Any
 from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import scoped_session, sessionmaker
 from pathlib import Path
 from redis import Redis
 from flask_jwt_extended import JWTManager
@@ -12,7 +12,8 @@ from werkzeug.wsgi import get_path_info
 from conf import ProductionConfig, TestConfig, DevConfig
 from base_conf import BaseConfig, ProtoConfig, MAIN_ENV
 from models.main_models import Base
-from util.exceptions import MiddlewareException
+from util.exceptions import MiddlewareException, TooManyRequests
+from util.json_encoder import AppJSONEncoder, json_response
 
 path = dirname(__file__)
 
@@ -23,7 +24,7 @@ class FlaskApp(Flask):
     env:Literal['production','dev','test'] = MAIN_ENV
     runtime_config: ProtoConfig
     __psql_engine = None
-    __psql_session: Optional[Session] = None
+    __psql_session: Optional[scoped_session] = None
     __jwt: Optional[JWTManager] = None
 
     @classmethod
@@ -50,12 +51,16 @@ class FlaskApp(Flask):
         cls.runtime_config = cls.__config__init()
         cls.__app = cls(cls.runtime_config.APP_NAME, instance_relative_config=True)
         cls.__app.config.from_object(cls.runtime_config)
+        cls.__app.json_encoder = AppJSONEncoder
         CORS(cls.__app)
         cls.__create_dirs()
         cls.__redis = Redis(host=cls.runtime_config.REDIS_HOST, port=cls.runtime_config.REDIS_PORT)
-        cls.__psql_engine = create_engine(cls.runtime_config.SQLALCHEMY_DATABASE_URI)
+        cls.__psql_engine = create_engine(cls.runtime_config.SQLALCHEMY_DATABASE_URI,
+        pool_size=cls.runtime_config.SQLALCHEMY_POOL_SIZE, max_overflow=cls.runtime_config.SQLALCHEMY_MAX_OVERFLOW,
+        pool_pre_ping=cls.runtime_config.SQLALCHEMY_POOL_PRE_PING, pool_recycle=cls.runtime_config.SQLALCHEMY_POOL_RECYCLE)
         cls.__jwt = cls.__jwt_auth_init()
         cls.__app.before_request(cls.register_middleware)
+        cls.__app.teardown_appcontext(cls.shutdown_session)
         return cls.__app
 
     @staticmethod
@@ -66,10 +71,13 @@ class FlaskApp(Flask):
             try:
                 middleware_func()
             except MiddlewareException as e:
-                return jsonify({
+                response = json_response({
                     "msg": e.message,
                     "body": e.to_dict()
-                }), 400
+                }, e.code)
+                if isinstance(e, TooManyRequests):
+                    response.headers["Retry-After"] = str(e.retry_after)
+                return response
 
     @classmethod
     def context(cls):
@@ -98,17 +106,19 @@ class FlaskApp(Flask):
         return cls
 
     @classmethod
-    def db_session(cls):
+    def db_session(cls) -> scoped_session:
+        """Returns the session registry. It can be used as a session and proxies every call to the session of
+        the current thread, which lives until the end of the app context of the request"""
         cls.instance()
         if cls.__psql_session is None:
-            cls.__psql_session = Session(cls.__psql_engine)
+            cls.__psql_session = scoped_session(sessionmaker(bind=cls.__psql_engine))
         return cls.__psql_session
 
-    # TODO Replace with proper Flask app teardown method
     @classmethod
-    def terminate(cls):
+    def shutdown_session(cls, exception=None):
+        """Closes the session of the current request and returns its connection to the pool"""
         if cls.__psql_session is not None:
-            cls.__psql_session.close_all()
+            cls.__psql_session.remove()
 
     @classmethod
     def create_tables(cls):